@@ -0,0 +1,76 @@
+"""Screens directory trees for images that carry LSB steganography from any tool.
+
+Each image is run through chi-square, RS and sample pair analysis on a
+process pool. One JSON object is written per file, as NDJSON, in the order
+the files finish, with the estimated embedding rate, the verdict and the
+seconds the analysis took. A summary goes to stderr at the end.
+
+Usage: python analyze.py PATH [PATH ...] [--workers N] [--sample SHARE] [--suspicious-only] [--output results.ndjson]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool
+
+from PIL import Image
+
+# The shared engine is the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stegoshield.cli import EXTENSIONS, iter_files  # noqa: E402
+from stegoshield import analyze  # noqa: E402
+
+# Lossy files have no LSB message left to find
+LOSSY_EXTENSIONS = {'.jpg', '.jpeg'}
+
+
+def analyze_file(path, sample=None):
+    """Analyses one file and returns its NDJSON entry; unreadable files get an 'error' entry."""
+    try:
+        return {"path": path, **analyze(path, sample=sample)}
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return {"path": path, "suspicious": False, "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help="files or directories to analyse")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--extensions', nargs='+', default=sorted(EXTENSIONS - LOSSY_EXTENSIONS),
+                        help="file extensions to analyse inside directories")
+    parser.add_argument('--sample', type=float, help="analyse only this share (0-1] of each image's rows")
+    parser.add_argument('--suspicious-only', action='store_true', help="only report suspicious files")
+    parser.add_argument('--output', help="write NDJSON here instead of stdout")
+    args = parser.parse_args()
+    if args.sample is not None and not 0 < args.sample <= 1:
+        parser.error("--sample must be a share between 0 and 1")
+    extensions = {e.lower() if e.startswith('.') else f".{e.lower()}" for e in args.extensions}
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    analysed = suspicious = errors = 0
+    pixels = 0
+    start = time.perf_counter()
+    try:
+        with Pool(args.workers) as pool:
+            for entry in pool.imap_unordered(partial(analyze_file, sample=args.sample),
+                                             iter_files(args.paths, extensions)):
+                analysed += 1
+                suspicious += entry["suspicious"]
+                errors += "error" in entry
+                pixels += entry.get("width", 0) * entry.get("height", 0)
+                if entry["suspicious"] or not args.suspicious_only:
+                    out.write(json.dumps(entry) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Analysed {analysed} files ({pixels / 1e6:.1f} MP) in {elapsed:.2f}s "
+          f"({pixels / 1e6 / max(elapsed, 1e-9):.1f} MP/s): {suspicious} suspicious, {errors} unreadable.",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
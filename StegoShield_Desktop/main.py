@@ -2,14 +2,187 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from PIL import Image, ImageTk
 import os
-from steganography import encode_message, decode_message, encode_image, decode_image
+import queue
+import sys
+import threading
+from collections import OrderedDict
+# The shared engine is the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Only the constants are imported up front; the engine, and NumPy with it,
+# loads on first use
+import stegoshield  # noqa: E402
+from stegoshield import MAX_LSB_DEPTH, PNG_PROFILES  # noqa: E402
 import help as help_text
 
+# Largest size of the images in a preview dialog
+PREVIEW_SIZE = (350, 350)
+
+def make_thumbnail(img, size=PREVIEW_SIZE):
+    """Returns a copy of an image scaled to fit within `size`, keeping its aspect ratio.
+
+    A JPEG that has not been decoded yet is decoded straight at a reduced
+    scale. Large images are then shrunk by a whole factor with reduce(),
+    which is cheap, to within twice the target size, and only that small
+    image gets the final LANCZOS pass. `img` itself is left unchanged once
+    loaded.
+    """
+    # A no-op for other formats and for images already loaded
+    img.draft('RGB' if img.mode == 'RGB' else None, (size[0] * 2, size[1] * 2))
+    if img.mode == '1':
+        img = img.convert('L')
+    elif img.mode in ('P', 'PA'):
+        img = img.convert('RGBA' if img.mode == 'PA' or 'transparency' in img.info else 'RGB')
+    elif img.mode.startswith('I;16'):
+        img = img.convert('I')
+
+    scale = min(size[0] / img.width, size[1] / img.height, 1)
+    thumb_size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    factor = min(img.width // (2 * thumb_size[0]), img.height // (2 * thumb_size[1]))
+    if factor > 1:
+        img = img.reduce(factor)
+    thumb = img.resize(thumb_size, Image.Resampling.LANCZOS)
+
+    if thumb.mode == 'I':
+        # 16-bit greyscale is shown at 8 bits
+        thumb = thumb.point(lambda v: v / 256).convert('L')
+    elif thumb.mode not in ('L', 'RGB', 'RGBA'):
+        thumb = thumb.convert('RGBA' if 'A' in thumb.mode else 'RGB')
+    return thumb
+
+class ThumbnailCache:
+    """Keeps the preview thumbnails of recently used files, keyed by path and modification time."""
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, image=None):
+        """Returns the thumbnail of the file at `path`.
+
+        On a miss it is made from `image`, the file already decoded, if given,
+        or else from the file opened just for the thumbnail.
+        """
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if image is None:
+            with Image.open(path) as img:
+                thumb = make_thumbnail(img)
+        else:
+            thumb = make_thumbnail(image)
+        with self._lock:
+            self._entries[key] = thumb
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return thumb
+
+class Cancelled(Exception):
+    """Raised from a progress callback to stop the operation that called it."""
+
+class TaskStatus(ttk.Frame):
+    """A status line, progress bar and Cancel button that run one operation at a time off the Tk thread.
+
+    The operation runs on a worker thread and never touches Tk itself: it
+    records its progress through the callback it is given and hands its
+    result back through a queue, which the Tk thread polls with after().
+    """
+    POLL_MS = 50
+
+    def __init__(self, parent, idle_text="Ready."):
+        super().__init__(parent)
+        self.idle_text = idle_text
+        self.status = tk.StringVar(value=idle_text)
+        self.bar = ttk.Progressbar(self, maximum=1.0, length=180)
+        self.cancel_button = ttk.Button(self, text="Cancel", command=self.cancel, state="disabled")
+        ttk.Label(self, textvariable=self.status).pack(side="left", padx=5)
+        self.cancel_button.pack(side="right", padx=5)
+        self.bar.pack(side="right", padx=5)
+
+        self._results = queue.Queue()
+        self._cancel = threading.Event()
+        self._fraction = None
+        self._handlers = None
+        self._after_id = None
+
+    @property
+    def busy(self):
+        return self._handlers is not None
+
+    def run(self, text, work, on_done, on_error):
+        """Runs `work(progress)` on a worker thread, then `on_done(result)` or `on_error(exception)` on the Tk thread.
+
+        The bar spins until `progress` is first called with a fraction done.
+        Calling `progress` after Cancel is pressed raises Cancelled, which
+        ends the operation quietly.
+        """
+        if self.busy:
+            messagebox.showinfo("Please Wait", "Another operation is still running.", parent=self)
+            return
+        self._handlers = (on_done, on_error)
+        self._cancel.clear()
+        self._fraction = None
+        self.status.set(text)
+        self.cancel_button.configure(state="normal")
+        self.bar.configure(mode="indeterminate", value=0)
+        self.bar.start(15)
+        threading.Thread(target=self._work, args=(work,), daemon=True).start()
+        self._after_id = self.after(self.POLL_MS, self._poll)
+
+    def cancel(self):
+        self._cancel.set()
+        self.status.set("Cancelling...")
+
+    def _report(self, fraction):
+        # Called on the worker thread
+        if self._cancel.is_set():
+            raise Cancelled()
+        self._fraction = fraction
+
+    def _work(self, work):
+        try:
+            self._results.put((True, work(self._report)))
+        except Exception as e:
+            self._results.put((False, e))
+
+    def _poll(self):
+        fraction = self._fraction
+        if fraction is not None:
+            if str(self.bar.cget("mode")) == "indeterminate":
+                self.bar.stop()
+                self.bar.configure(mode="determinate")
+            self.bar.configure(value=fraction)
+        try:
+            ok, result = self._results.get_nowait()
+        except queue.Empty:
+            self._after_id = self.after(self.POLL_MS, self._poll)
+            return
+
+        on_done, on_error = self._handlers
+        self._handlers = self._after_id = None
+        self.bar.stop()
+        self.bar.configure(mode="determinate", value=0)
+        self.cancel_button.configure(state="disabled")
+        self.status.set("Cancelled." if isinstance(result, Cancelled) else self.idle_text)
+        if ok:
+            on_done(result)
+        elif not isinstance(result, Cancelled):
+            on_error(result)
+
+    def destroy(self):
+        # A window closed mid-operation stops the worker at its next progress report
+        self._cancel.set()
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        super().destroy()
+
 class StegoApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("StegoShield Desktop")
-        self.geometry("600x450")
+        self.geometry("600x490")
 
         # --- Style Configuration ---
         style = ttk.Style(self)
@@ -25,6 +198,11 @@ class StegoApp(tk.Tk):
         header_frame.pack(fill="x")
         ttk.Label(header_frame, text="StegoShield", style="Header.TLabel").pack()
 
+        # Encodes and decodes run in the background and report here
+        self.task_status = TaskStatus(self)
+        self.thumbnails = ThumbnailCache()
+        self.task_status.pack(fill="x", side="bottom", padx=10, pady=(0, 10))
+
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both", padx=10, pady=10)
 
@@ -42,6 +220,13 @@ class StegoApp(tk.Tk):
         self.notebook.add(frame, text=tab_name)
         return frame
 
+    def create_depth_picker(self, frame, row):
+        """Adds a 'Bits per Channel' picker to an encode tab and returns its variable."""
+        lsb_depth = tk.IntVar(value=1)
+        ttk.Label(frame, text="Bits per Channel:").grid(row=row, column=0, sticky="w", padx=5, pady=5)
+        ttk.Spinbox(frame, from_=1, to=MAX_LSB_DEPTH, textvariable=lsb_depth, width=5, state="readonly").grid(row=row, column=1, sticky="w")
+        return lsb_depth
+
     # --- TAB 1: ENCODE TEXT ---
     def create_encode_text_tab(self):
         frame = self.create_tab_frame("Encode Text")
@@ -56,7 +241,9 @@ class StegoApp(tk.Tk):
         ttk.Label(frame, text="Secret Message:").grid(row=2, column=0, sticky="w", padx=5, pady=5)
         ttk.Entry(frame, textvariable=message, width=50).grid(row=2, column=1, sticky="ew")
 
-        ttk.Button(frame, text="Preview & Hide Message", command=lambda: self.perform_encode_text(carrier_path.get(), message.get())).grid(row=3, column=1, pady=20)
+        lsb_depth = self.create_depth_picker(frame, row=3)
+
+        ttk.Button(frame, text="Preview & Hide Message", command=lambda: self.perform_encode_text(carrier_path.get(), message.get(), lsb_depth.get())).grid(row=4, column=1, pady=20)
         frame.columnconfigure(1, weight=1)
 
     # --- TAB 2: DECODE TEXT ---
@@ -88,7 +275,9 @@ class StegoApp(tk.Tk):
         ttk.Entry(frame, textvariable=secret_path, width=50).grid(row=2, column=1, sticky="ew")
         ttk.Button(frame, text="Browse...", command=lambda: self.browse_file(secret_path)).grid(row=2, column=2, padx=5)
 
-        ttk.Button(frame, text="Preview & Hide Image", command=lambda: self.perform_encode_image(carrier_path.get(), secret_path.get())).grid(row=3, column=1, pady=20)
+        lsb_depth = self.create_depth_picker(frame, row=3)
+
+        ttk.Button(frame, text="Preview & Hide Image", command=lambda: self.perform_encode_image(carrier_path.get(), secret_path.get(), lsb_depth.get())).grid(row=4, column=1, pady=20)
         frame.columnconfigure(1, weight=1)
 
     # --- TAB 4: DECODE IMAGE ---
@@ -169,71 +358,78 @@ class StegoApp(tk.Tk):
             counter += 1
         return os.path.join(base_dir, filename)
 
-    def perform_encode_text(self, carrier_path, message):
+    def perform_encode_text(self, carrier_path, message, lsb_depth=1):
         if not carrier_path or not message:
             messagebox.showerror("Error", "Carrier image and message must be provided.")
             return
-        try:
-            # Generate the default output path with the "encoded" prefix
-            suggested_path = self.generate_output_path(carrier_path, "encoded")
-            
-            original_image = Image.open(carrier_path)
-            encoded_image = encode_message(carrier_path, message)
-
-            self.show_preview_dialog(
-                original_image, 
-                encoded_image, 
-                "Preview: Encoded Text",
-                initial_path=suggested_path
-            )
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to encode message: {e}")
+        # Generate the default output path with the "encoded" prefix
+        suggested_path = self.generate_output_path(carrier_path, "encoded")
+
+        def work(progress):
+            # The carrier is decoded once, for both the embedding and its thumbnail
+            carrier = Image.open(carrier_path)
+            carrier.load()
+            progress(0.0)
+            encoded_image = stegoshield.encode_message(carrier, message, lsb_depth=lsb_depth, progress=progress)
+            return self.thumbnails.get(carrier_path, carrier), make_thumbnail(encoded_image), encoded_image
+
+        self.task_status.run(
+            "Hiding message...", work,
+            lambda result: self.show_preview_dialog(*result[:2], "Preview: Encoded Text", save_image=result[2],
+                                                    initial_path=suggested_path),
+            lambda e: messagebox.showerror("Error", f"Failed to encode message: {e}"))
 
     def perform_decode_text(self, encoded_path):
         if not encoded_path:
             messagebox.showerror("Error", "Please select an encoded image file.")
             return
-        try:
-            result = decode_message(encoded_path)
-            messagebox.showinfo("Decoded Message", result)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to decode message: {e}")
+        self.task_status.run(
+            "Extracting message...", lambda progress: stegoshield.decode_message(encoded_path, progress=progress),
+            lambda result: messagebox.showinfo("Decoded Message", result),
+            lambda e: messagebox.showerror("Error", f"Failed to decode message: {e}"))
 
-    def perform_encode_image(self, carrier_path, secret_path):
+    def perform_encode_image(self, carrier_path, secret_path, lsb_depth=1):
         if not carrier_path or not secret_path:
             messagebox.showerror("Error", "Both carrier and secret images must be selected.")
             return
-        try:
-            # Generate the default output path with the "encoded" prefix
-            suggested_path = self.generate_output_path(carrier_path, "encoded")
-            
-            original_image = Image.open(carrier_path)
-            encoded_image = encode_image(carrier_path, secret_path)
-
-            self.show_preview_dialog(
-                original_image, 
-                encoded_image, 
-                "Preview: Encoded Image",
-                initial_path=suggested_path
-            )
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to encode image: {e}")
-    
+        # Generate the default output path with the "encoded" prefix
+        suggested_path = self.generate_output_path(carrier_path, "encoded")
+
+        def work(progress):
+            carrier = Image.open(carrier_path)
+            carrier.load()
+            progress(0.0)
+            encoded_image = stegoshield.encode_image(carrier, secret_path, lsb_depth=lsb_depth, progress=progress)
+            return self.thumbnails.get(carrier_path, carrier), make_thumbnail(encoded_image), encoded_image
+
+        self.task_status.run(
+            "Hiding image...", work,
+            lambda result: self.show_preview_dialog(*result[:2], "Preview: Encoded Image", save_image=result[2],
+                                                    initial_path=suggested_path),
+            lambda e: messagebox.showerror("Error", f"Failed to encode image: {e}"))
+
     def perform_decode_image(self, encoded_path):
         if not encoded_path:
             messagebox.showerror("Error", "Please select an encoded image file.")
             return
-        try:
-            encoded_img = Image.open(encoded_path)
-            secret_img = decode_image(encoded_path)
-            self.show_preview_dialog(encoded_img, secret_img, "Preview: Extracted Image", allow_save=False)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to decode image: {e}")
 
-    def show_preview_dialog(self, img1, img2, title, allow_save=True, initial_path=""):
+        def work(progress):
+            # Decoding reads only the rows holding the payload, so the
+            # encoded image's thumbnail comes from the cache or its own decode
+            secret_img = stegoshield.decode_image(encoded_path, progress=progress)
+            return self.thumbnails.get(encoded_path), make_thumbnail(secret_img)
+
+        self.task_status.run(
+            "Extracting image...", work,
+            lambda previews: self.show_preview_dialog(*previews, "Preview: Extracted Image"),
+            lambda e: messagebox.showerror("Error", f"Failed to decode image: {e}"))
+
+    def show_preview_dialog(self, preview1, preview2, title, save_image=None, initial_path=""):
+        """Shows two thumbnails side by side, with a Save button for `save_image` if one is given."""
+        allow_save = save_image is not None
         dialog = tk.Toplevel(self)
         dialog.title(title)
-        dialog.geometry("800x475")
+        dialog.geometry("800x515")
         dialog.transient(self)
         dialog.grab_set()
 
@@ -244,14 +440,13 @@ class StegoApp(tk.Tk):
         frame = ttk.Frame(dialog, padding=10)
         frame.pack(fill="both", expand=True)
 
-        for idx, (img, t) in enumerate(zip([img1, img2], titles)):
+        for idx, (img, t) in enumerate(zip([preview1, preview2], titles)):
             col_frame = ttk.Frame(frame)
             col_frame.grid(row=0, column=idx, padx=10, pady=5, sticky="n")
             
             ttk.Label(col_frame, text=t, font=("Segoe UI", 12, "bold")).pack(pady=(0, 10))
             
-            img_resized = img.resize((350, 350), Image.Resampling.LANCZOS)
-            tk_img = ImageTk.PhotoImage(img_resized)
+            tk_img = ImageTk.PhotoImage(img)
             
             label = ttk.Label(col_frame, image=tk_img)
             label.image = tk_img
@@ -260,8 +455,13 @@ class StegoApp(tk.Tk):
         frame.columnconfigure(0, weight=1)
         frame.columnconfigure(1, weight=1)
         
+        save_status = TaskStatus(dialog, idle_text="")
+        if allow_save:
+            save_status.pack(fill="x", side="bottom", padx=10, pady=(0, 10))
         button_frame = ttk.Frame(dialog, padding=(0, 10, 0, 0))
         button_frame.pack(fill="x", side="bottom")
+        # 'fast' suits quick previews and re-saves; 'small' suits files kept for archival
+        png_profile = tk.StringVar(value="default")
 
         def save_action():
             # Use the generated path to set the initial directory and filename
@@ -276,15 +476,28 @@ class StegoApp(tk.Tk):
                 filetypes=[("PNG files", "*.png"), ("All Files", "*.*")]
             )
             if path:
-                try:
-                    img2.save(path, "PNG")
-                    messagebox.showinfo("Success", f"Image saved successfully to:\n{path}", parent=dialog)
+                profile = png_profile.get()
+
+                def saved(seconds):
+                    messagebox.showinfo("Success", f"Image saved successfully to:\n{path}\n\nPNG written in {seconds:.2f} s.", parent=dialog)
                     dialog.destroy()
-                except Exception as e:
-                    messagebox.showerror("Save Error", f"Failed to save image: {e}", parent=dialog)
+
+                def write(progress):
+                    try:
+                        return stegoshield.save_png(save_image, path, profile, os.cpu_count() or 1, progress)
+                    except Exception:
+                        # Leave no half-written PNG behind after a failed or cancelled save
+                        if os.path.exists(path):
+                            os.remove(path)
+                        raise
+
+                save_status.run("Saving PNG...", write, saved,
+                                lambda e: messagebox.showerror("Save Error", f"Failed to save image: {e}", parent=dialog))
 
         if allow_save:
             ttk.Button(button_frame, text="Save Image...", command=save_action).pack(side="left", padx=20)
+            ttk.Label(button_frame, text="PNG Compression:").pack(side="left")
+            ttk.Combobox(button_frame, textvariable=png_profile, values=list(PNG_PROFILES), width=8, state="readonly").pack(side="left", padx=5)
             ttk.Button(button_frame, text="Exit", command=dialog.destroy).pack(side="right", padx=20)
         else:
             ttk.Button(button_frame, text="Close", command=dialog.destroy).pack()
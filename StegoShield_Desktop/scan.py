@@ -0,0 +1,65 @@
+"""Scans directory trees for images that carry StegoShield payloads.
+
+Each file is probed on a process pool: only the image header and the rows
+holding the payload header are read, and JPEG files are skipped without
+decoding. One JSON object is written per file, as NDJSON, in the order the
+files finish. A summary goes to stderr at the end.
+
+Usage: python scan.py PATH [PATH ...] [--workers N] [--found-only] [--output results.ndjson]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from PIL import Image
+
+# The shared engine is the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from stegoshield import probe  # noqa: E402
+from stegoshield.cli import CHUNK_SIZE, EXTENSIONS, iter_files  # noqa: E402
+
+
+def probe_file(path):
+    """Probes one file and returns its NDJSON entry; unreadable files get an 'error' entry."""
+    try:
+        return {"path": path, **probe(path)}
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return {"path": path, "plausible": False, "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('paths', nargs='+', help="files or directories to scan")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--extensions', nargs='+', default=sorted(EXTENSIONS),
+                        help="file extensions to probe inside directories")
+    parser.add_argument('--found-only', action='store_true', help="only report files that carry a payload")
+    parser.add_argument('--output', help="write NDJSON here instead of stdout")
+    args = parser.parse_args()
+    extensions = {e.lower() if e.startswith('.') else f".{e.lower()}" for e in args.extensions}
+
+    out = open(args.output, 'w') if args.output else sys.stdout
+    scanned = found = errors = 0
+    start = time.perf_counter()
+    try:
+        with Pool(args.workers) as pool:
+            for entry in pool.imap_unordered(probe_file, iter_files(args.paths, extensions), CHUNK_SIZE):
+                scanned += 1
+                found += entry["plausible"]
+                errors += "error" in entry
+                if entry["plausible"] or not args.found_only:
+                    out.write(json.dumps(entry) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scanned {scanned} files in {elapsed:.2f}s ({scanned / max(elapsed, 1e-9):.0f} files/s): "
+          f"{found} with payloads, {errors} unreadable.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
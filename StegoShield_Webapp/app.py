@@ -1,36 +1,110 @@
+import base64
+import io
 import os
-import uuid
-from flask import Flask, render_template, request, send_from_directory, url_for, flash, redirect # type: ignore
+import sys
+import time
+from tempfile import SpooledTemporaryFile
+from flask import Flask, Request, render_template, request, send_file, url_for, flash, redirect, make_response # type: ignore
 from PIL import Image # type: ignore
-from steganography import encode_message, decode_message, encode_image, decode_image
+# The shared engine is the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+# Only the constants and the output store are imported up front; the engine,
+# and NumPy with it, loads on first use
+import stegoshield  # noqa: E402
+from stegoshield import MAX_LSB_DEPTH, PNG_PROFILES, OutputStore  # noqa: E402
 import help as help_text 
 from markupsafe import Markup, escape
 
+class SpoolingRequest(Request):
+    """Keeps uploaded files in memory until they pass the spill-to-disk threshold."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=app.config['SPILL_THRESHOLD'], mode='w+b',
+                                    dir=app.config['UPLOAD_FOLDER'])
+
 app = Flask(__name__)
+app.request_class = SpoolingRequest
 app.secret_key = 'supersecretkey'  # Required for flashing messages
 
 # --- Configuration ---
+# Uploads are processed in memory; only files larger than SPILL_THRESHOLD are
+# spilled to anonymous temporary files in UPLOAD_FOLDER. Results are kept in
+# OUTPUT_FOLDER under the SHA-256 of their bytes, so the result page links to
+# a URL whose content never changes: it is served with a strong ETag, answers
+# Range requests and may be cached for OUTPUT_MAX_AGE seconds. The least
+# recently viewed results are removed once OUTPUT_MAX_BYTES is exceeded.
 UPLOAD_FOLDER = 'static/uploads'
-OUTPUT_FOLDER = 'static/outputs'
+OUTPUT_FOLDER = 'outputs'
+OUTPUT_MAX_BYTES = 1024 * 1024 * 1024
+OUTPUT_MAX_AGE = 365 * 24 * 3600
+SPILL_THRESHOLD = 32 * 1024 * 1024
+PREVIEW_SIZE = 512
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp', 'gif'}
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
+app.config['OUTPUT_MAX_AGE'] = OUTPUT_MAX_AGE
+output_store = OutputStore(OUTPUT_FOLDER, OUTPUT_MAX_BYTES)
+app.config['SPILL_THRESHOLD'] = SPILL_THRESHOLD
+
+# Output PNGs use the 'fast' profile unless the form picks another, and are
+# deflated on PNG_WORKERS threads.
+PNG_COMPRESS_LEVEL = 'fast'
+PNG_WORKERS = os.cpu_count() or 1
+app.config['PNG_COMPRESS_LEVEL'] = PNG_COMPRESS_LEVEL
+app.config['PNG_WORKERS'] = PNG_WORKERS
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_file(file_storage):
-    """Saves a file with a unique name and returns its path."""
+def upload_stream(file_storage):
+    """Returns the stream of an uploaded file if it has an allowed extension."""
     if file_storage and allowed_file(file_storage.filename):
-        filename = f"{uuid.uuid4()}_{file_storage.filename}"
-        path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file_storage.save(path)
-        return path
+        return file_storage.stream
     return None
 
+def preview_data_uri(stream):
+    """Renders a small PNG preview of an uploaded image as a data: URI."""
+    stream.seek(0)
+    img = Image.open(stream)
+    img.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+
+def form_lsb_depth():
+    """Reads the optional `lsb_depth` form field; returns None if it is not a valid depth."""
+    try:
+        lsb_depth = int(request.form.get('lsb_depth', 1))
+    except ValueError:
+        return None
+    return lsb_depth if 1 <= lsb_depth <= MAX_LSB_DEPTH else None
+
+def form_compress_level():
+    """Reads the optional `compress_level` form field (a profile name or 0-9); returns None if invalid."""
+    value = request.form.get('compress_level', app.config['PNG_COMPRESS_LEVEL'])
+    try:
+        return stegoshield.png_compress_level(int(value) if str(value).isdigit() else value)
+    except ValueError:
+        return None
+
+# Descriptions of the stages in a `timings` dict, for Server-Timing headers
+STAGE_DESCRIPTIONS = {
+    'payload': "Building the payload",
+    'decode': "Decoding the carrier",
+    'embed': "Embedding",
+    'png': "PNG output",
+    'store': "Storing the output",
+}
+
+def with_server_timing(page, timings):
+    """Wraps a rendered page in a response whose Server-Timing header has one metric per stage of `timings`."""
+    response = make_response(page)
+    response.headers['Server-Timing'] = ', '.join(
+        f'{stage};dur={seconds * 1000:.1f};desc="{STAGE_DESCRIPTIONS.get(stage, stage)}"'
+        for stage, seconds in timings.items())
+    return response
+
 # Custom filter to convert newlines to <br> tags
 @app.template_filter('nl2br')
 def nl2br(value):
@@ -57,6 +131,19 @@ def decode_image_page():
 def help_page():
     return render_template('help.html', help=help_text)
 
+@app.route('/outputs/<digest>.png')
+def output_file(digest):
+    """Serves a stored result, answering conditional and Range requests; `?download=NAME` saves it as NAME."""
+    path = output_store.path(digest)
+    if path is None:
+        return "This result has expired. Please run the operation again.", 404
+    download_name = request.args.get('download') or None
+    response = send_file(path, mimetype='image/png', as_attachment=download_name is not None,
+                         download_name=download_name, etag=digest, max_age=app.config['OUTPUT_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 
 # --- Processing Logic ---
 @app.route('/encode-text', methods=['POST'])
@@ -72,24 +159,37 @@ def handle_encode_text():
         flash("Please select a carrier image and enter a message.", "error")
         return redirect(url_for('index'))
 
-    carrier_path = save_file(carrier_file)
-    if not carrier_path:
+    carrier_stream = upload_stream(carrier_file)
+    if not carrier_stream:
         flash("Invalid file type. Please use PNG, JPG, JPEG, or BMP.", "error")
         return redirect(url_for('index'))
 
-    try:
-        encoded_image_obj = encode_message(carrier_path, message)
-        output_filename = f"encoded_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        encoded_image_obj.save(output_path, "PNG")
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        flash(f"Bits per channel must be between 1 and {MAX_LSB_DEPTH}.", "error")
+        return redirect(url_for('index'))
+    compress_level = form_compress_level()
+    if compress_level is None:
+        flash(f"PNG compression must be one of {', '.join(PNG_PROFILES)} or 0-9.", "error")
+        return redirect(url_for('index'))
 
-        return render_template("result.html",
+    try:
+        timings = {}
+        with output_store.temp_path() as output_path:
+            stegoshield.encode_message_to_file(carrier_stream, message, output_path, workers=app.config['PNG_WORKERS'],
+                                               lsb_depth=lsb_depth, compress_level=compress_level, timings=timings)
+            start = time.perf_counter()
+            digest = output_store.put_file(output_path)
+            timings['store'] = time.perf_counter() - start
+
+        page = render_template("result.html",
                                title="Text Encoded Successfully",
-                               original_image=url_for('static', filename=os.path.relpath(carrier_path, 'static')),
-                               processed_image=url_for('static', filename=os.path.relpath(output_path, 'static')),
+                               original_image=preview_data_uri(carrier_stream),
+                               processed_image=url_for('output_file', digest=digest),
                                original_title="Original Carrier Image",
                                processed_title="Image with Hidden Message (Stego Image)",
-                               download_url=url_for('static', filename=os.path.relpath(output_path, 'static')))
+                               download_url=url_for('output_file', digest=digest, download='stego_image.png'))
+        return with_server_timing(page, timings)
     except Exception as e:
         flash(f"An error occurred during encoding: {e}", "error")
         return redirect(url_for('index'))
@@ -105,13 +205,13 @@ def handle_decode_text():
         flash("No file selected.", "error")
         return redirect(url_for('decode_text_page'))
 
-    encoded_path = save_file(encoded_file)
-    if not encoded_path:
+    encoded_stream = upload_stream(encoded_file)
+    if not encoded_stream:
         flash("Invalid file type.", "error")
         return redirect(url_for('decode_text_page'))
 
     try:
-        secret_message = decode_message(encoded_path)
+        secret_message = stegoshield.decode_message(encoded_stream)
         return render_template("result.html",
                                title="Message Extracted Successfully",
                                secret_message=secret_message)
@@ -132,26 +232,39 @@ def handle_encode_image():
         flash("Please select both a carrier and a secret image.", "error")
         return redirect(url_for('encode_image_page'))
 
-    carrier_path = save_file(carrier_file)
-    secret_path = save_file(secret_file)
+    carrier_stream = upload_stream(carrier_file)
+    secret_stream = upload_stream(secret_file)
 
-    if not carrier_path or not secret_path:
+    if not carrier_stream or not secret_stream:
         flash("Invalid file type for one or both images.", "error")
         return redirect(url_for('encode_image_page'))
 
-    try:
-        encoded_image_obj = encode_image(carrier_path, secret_path)
-        output_filename = f"encoded_image_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        encoded_image_obj.save(output_path, "PNG")
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        flash(f"Bits per channel must be between 1 and {MAX_LSB_DEPTH}.", "error")
+        return redirect(url_for('encode_image_page'))
+    compress_level = form_compress_level()
+    if compress_level is None:
+        flash(f"PNG compression must be one of {', '.join(PNG_PROFILES)} or 0-9.", "error")
+        return redirect(url_for('encode_image_page'))
 
-        return render_template("result.html",
+    try:
+        timings = {}
+        with output_store.temp_path() as output_path:
+            stegoshield.encode_image_to_file(carrier_stream, secret_stream, output_path, workers=app.config['PNG_WORKERS'],
+                                             lsb_depth=lsb_depth, compress_level=compress_level, timings=timings)
+            start = time.perf_counter()
+            digest = output_store.put_file(output_path)
+            timings['store'] = time.perf_counter() - start
+
+        page = render_template("result.html",
                                title="Image Hidden Successfully",
-                               original_image=url_for('static', filename=os.path.relpath(carrier_path, 'static')),
-                               processed_image=url_for('static', filename=os.path.relpath(output_path, 'static')),
+                               original_image=preview_data_uri(carrier_stream),
+                               processed_image=url_for('output_file', digest=digest),
                                original_title="Original Carrier Image",
                                processed_title="Image with Hidden Image (Stego Image)",
-                               download_url=url_for('static', filename=os.path.relpath(output_path, 'static')))
+                               download_url=url_for('output_file', digest=digest, download='stego_image.png'))
+        return with_server_timing(page, timings)
     except Exception as e:
         flash(f"An error occurred during image encoding: {e}", "error")
         return redirect(url_for('encode_image_page'))
@@ -167,21 +280,22 @@ def handle_decode_image():
         flash("No file selected.", "error")
         return redirect(url_for('decode_image_page'))
 
-    encoded_path = save_file(encoded_file)
-    if not encoded_path:
+    encoded_stream = upload_stream(encoded_file)
+    if not encoded_stream:
         flash("Invalid file type.", "error")
         return redirect(url_for('decode_image_page'))
 
     try:
-        secret_image_obj = decode_image(encoded_path)
-        output_filename = f"extracted_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        secret_image_obj.save(output_path, "PNG")
+        secret_image_obj = stegoshield.decode_image(encoded_stream)
+        with output_store.temp_path() as output_path:
+            stegoshield.save_png(secret_image_obj, output_path, app.config['PNG_COMPRESS_LEVEL'],
+                                 app.config['PNG_WORKERS'])
+            digest = output_store.put_file(output_path)
 
         return render_template("result.html",
                                title="Image Extracted Successfully",
-                               original_image=url_for('static', filename=os.path.relpath(encoded_path, 'static')),
-                               processed_image=url_for('static', filename=os.path.relpath(output_path, 'static')),
+                               original_image=preview_data_uri(encoded_stream),
+                               processed_image=url_for('output_file', digest=digest),
                                original_title="Encoded Carrier Image",
                                processed_title="Extracted Secret Image")
     except Exception as e:
@@ -55,7 +55,10 @@ text_rules_restrictions = (
     "• Secret Image Size Restriction: This is the most important rule. The secret image must be "
     "significantly smaller than the carrier image.\n"
     "   - Rule of Thumb: You need at least 8 pixels in the carrier image to hide just 1 pixel "
-    "of the secret image.\n"
+    "of the secret image. Secret images are compressed first, so smooth or simple images need fewer.\n"
+    "   - Bits per Channel: Raising this setting from 1 up to 4 multiplies the capacity by the same "
+    "amount (2 bits needs 4 carrier pixels per secret pixel, 4 bits only 2), at the cost of changes that "
+    "are easier to spot. Decoding detects the setting automatically.\n"
     "   - If you choose a secret image that is too large for the carrier, the application will show an "
     "error message.\n\n"
     
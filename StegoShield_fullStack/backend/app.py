@@ -1,141 +1,848 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file, Response, abort, g, make_response, redirect, url_for
 from flask_cors import CORS
 from PIL import Image
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tempfile import SpooledTemporaryFile
+import base64
+import io
+import json
 import os
-import uuid
+import shutil
+import sys
+import time
+import zipfile
 
-# Import the core steganography functions and help text
-from steganography import encode_message, decode_message, encode_image, decode_image
+# Import the core steganography functions and help text; the shared engine
+# is the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+# Only the constants and the output store are imported up front; the engine,
+# and NumPy with it, loads on first use
+import stegoshield  # noqa: E402
+from stegoshield import MAX_LSB_DEPTH, PNG_PROFILES, OutputStore  # noqa: E402
+from jobs import JobQueue, DONE
+from cache import ResultCache, content_key
+from uploads import UploadStore, UploadLimitError
+from metrics import Registry, SIZE_BUCKETS
 import help as help_text
 
+class SpoolingRequest(Request):
+    """Keeps uploaded files in memory until they pass the spill-to-disk threshold."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return new_spooled_file()
+
 app = Flask(__name__)
-# Enable CORS to allow requests from the React frontend
-CORS(app)
+app.request_class = SpoolingRequest
+# Enable CORS to allow requests from the React frontend, and let it read timings
+CORS(app, expose_headers=['Server-Timing'])
 
 # --- Configuration ---
+# Uploads and outputs live in memory; only files larger than SPILL_THRESHOLD
+# are spilled to anonymous temporary files in UPLOAD_FOLDER.
 UPLOAD_FOLDER = 'uploads'
+SPILL_THRESHOLD = 32 * 1024 * 1024
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp', 'gif', 'svg', }
+app.config['SPILL_THRESHOLD'] = SPILL_THRESHOLD
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'bmp', 'webp', 'gif', 'svg', 'tif', 'tiff', }
+
+# Batch items are processed concurrently on a shared pool
+BATCH_WORKERS = os.cpu_count() or 1
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+# Jobs run on their own local pool; jobs whose uploads total less than
+# SYNC_JOB_THRESHOLD bytes are run inline and answered immediately.
+JOB_WORKERS = os.cpu_count() or 1
+SYNC_JOB_THRESHOLD = 2 * 1024 * 1024
+app.config['SYNC_JOB_THRESHOLD'] = SYNC_JOB_THRESHOLD
+job_queue = JobQueue(workers=JOB_WORKERS)
+
+# Decode results are cached by a hash of the uploaded bytes. The in-memory
+# tier holds up to DECODE_CACHE_BYTES; set DECODE_CACHE_DIR to a directory
+# to also keep up to DECODE_CACHE_DISK_BYTES of results on disk.
+DECODE_CACHE_BYTES = 64 * 1024 * 1024
+DECODE_CACHE_DIR = None
+DECODE_CACHE_DISK_BYTES = 1024 * 1024 * 1024
+decode_cache = ResultCache(DECODE_CACHE_BYTES, DECODE_CACHE_DIR, DECODE_CACHE_DISK_BYTES)
+
+# PNG outputs use the 'fast' profile unless a request asks for another one
+# with the `compress_level` field. Single requests and jobs deflate their
+# output on PNG_WORKERS threads; batch items already run side by side.
+PNG_COMPRESS_LEVEL = 'fast'
+PNG_WORKERS = os.cpu_count() or 1
+app.config['PNG_COMPRESS_LEVEL'] = PNG_COMPRESS_LEVEL
+app.config['PNG_WORKERS'] = PNG_WORKERS
+
+# Large carriers can be sent as resumable chunked uploads in CHUNKED_UPLOAD_DIR,
+# in chunks of at most UPLOAD_CHUNK_BYTES, and then used by id in any number
+# of requests until they go UPLOAD_TTL seconds without being used. Space is
+# reserved for an upload when it starts, so at most UPLOAD_PENDING_MAX
+# unfinished uploads holding UPLOAD_PENDING_MAX_BYTES may exist at once, and
+# those left untouched for UPLOAD_PENDING_TTL seconds are dropped.
+CHUNKED_UPLOAD_DIR = os.path.join(UPLOAD_FOLDER, 'chunked')
+UPLOAD_MAX_BYTES = 4 * 1024 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 16 * 1024 * 1024
+UPLOAD_TTL = 24 * 3600
+UPLOAD_PENDING_MAX = 32
+UPLOAD_PENDING_MAX_BYTES = 8 * 1024 * 1024 * 1024
+UPLOAD_PENDING_TTL = 3600
+upload_store = UploadStore(CHUNKED_UPLOAD_DIR, UPLOAD_MAX_BYTES, UPLOAD_CHUNK_BYTES, UPLOAD_TTL,
+                           UPLOAD_PENDING_MAX, UPLOAD_PENDING_MAX_BYTES, UPLOAD_PENDING_TTL)
+
+# Encode and decode-image results are kept in OUTPUT_DIR under the SHA-256 of
+# their bytes and served from /api/outputs/<digest>.png. That URL never
+# changes meaning, so it is sent with a strong ETag, answers Range requests
+# and may be cached for OUTPUT_MAX_AGE seconds. The least recently fetched
+# outputs are removed once OUTPUT_MAX_BYTES is exceeded.
+OUTPUT_DIR = os.path.join(UPLOAD_FOLDER, 'outputs')
+OUTPUT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+OUTPUT_MAX_AGE = 365 * 24 * 3600
+app.config['OUTPUT_MAX_AGE'] = OUTPUT_MAX_AGE
+output_store = OutputStore(OUTPUT_DIR, OUTPUT_MAX_BYTES)
+
+# Request and per-stage timings, upload and payload sizes, errors and requests
+# in flight are exposed in the Prometheus text format at /api/metrics. Every
+# series is labelled with the Flask endpoint (the handler's name); jobs are
+# labelled 'job:<operation>'. Stages are 'parse' (multipart parsing and
+# spooling), the engine's 'payload', 'decode', 'embed' and 'png', the decode
+# cache's 'hash' and 'extract', 'store' (hashing the output into the output
+# store) and 'send'. See benchmarks/bench_metrics.py for their overhead.
+metrics = Registry()
+request_seconds = metrics.histogram('stegoshield_request_duration_seconds',
+                                    "Time from receiving a request to its response, by endpoint.", ('endpoint',))
+requests_total = metrics.counter('stegoshield_requests_total', "Responses sent, by endpoint and status code.",
+                                 ('endpoint', 'status'))
+stage_seconds = metrics.histogram('stegoshield_stage_duration_seconds', "Time spent in each stage of a request.",
+                                  ('endpoint', 'stage'))
+upload_bytes = metrics.histogram('stegoshield_upload_bytes', "Size of uploaded images, by endpoint and form field.",
+                                 ('endpoint', 'field'), SIZE_BUCKETS)
+payload_bytes = metrics.histogram('stegoshield_payload_bytes',
+                                  "Size of the messages and secret images hidden or extracted, by endpoint.",
+                                  ('endpoint',), SIZE_BUCKETS)
+errors_total = metrics.counter('stegoshield_errors_total', "Errors, by endpoint and exception type.",
+                               ('endpoint', 'exception'))
+requests_in_flight = metrics.gauge('stegoshield_requests_in_flight', "Requests being handled, by endpoint.",
+                                   ('endpoint',))
 
 def allowed_file(filename):
     """Checks if the uploaded file has an allowed extension."""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_file(file_storage):
-    """Saves an uploaded file with a unique name to prevent conflicts."""
+def new_spooled_file():
+    """Creates a file that stays in memory until it grows past SPILL_THRESHOLD."""
+    return SpooledTemporaryFile(max_size=app.config['SPILL_THRESHOLD'], mode='w+b',
+                                dir=app.config['UPLOAD_FOLDER'])
+
+def upload_stream(file_storage):
+    """Returns the stream of an uploaded file if it has an allowed extension."""
     if file_storage and allowed_file(file_storage.filename):
-        # Generate a unique filename to avoid overwriting files
-        filename = f"{uuid.uuid4()}_{file_storage.filename}"
-        path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file_storage.save(path)
-        return path
+        return file_storage.stream
     return None
 
+def has_upload(field):
+    """Checks whether a request names a file for `field`, sent with it or as a chunked upload id."""
+    if request.form.get(f'{field}_upload'):
+        return True
+    return field in request.files and request.files[field].filename != ''
+
+def open_chunked_upload(upload_id):
+    """Opens a finalized chunked upload for reading, or returns None if there is no such upload."""
+    upload = upload_store.get(upload_id)
+    if upload is None or not upload.finalized:
+        return None
+    return upload.open()
+
+def request_upload(field):
+    """Returns the stream of the file a request gives for `field`, or None if it is not an allowed type.
+
+    The file is either sent with the request or, once a chunked upload is
+    finalized, named by its id in the `<field>_upload` form field. An id
+    with no finalized upload ends the request with a 404.
+    """
+    upload_id = request.form.get(f'{field}_upload')
+    if not upload_id:
+        stream = upload_stream(request.files.get(field))
+    else:
+        stream = open_chunked_upload(upload_id)
+        if stream is None:
+            abort(make_response(jsonify({"error": f"No finalized upload with id '{upload_id}'."}), 404))
+        g.setdefault('upload_streams', []).append(stream)
+    if stream:
+        observe_upload(request.endpoint, field, stream)
+    return stream
+
+def observe_upload(endpoint, field, stream):
+    """Records the size of an uploaded file; the stream is left at its start."""
+    upload_bytes.observe(stream.seek(0, os.SEEK_END), endpoint, field)
+    stream.seek(0)
+
+def observe_stages(endpoint, timings):
+    """Records the seconds spent in each stage of a `timings` dict."""
+    for stage, seconds in timings.items():
+        stage_seconds.observe(seconds, endpoint, stage)
+
+def count_error(e, endpoint=None):
+    """Counts a handled exception against an endpoint, by default the current request's."""
+    errors_total.inc(endpoint or request.endpoint, type(e).__name__)
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    requests_in_flight.inc(request.endpoint or 'unmatched')
+    if request.mimetype == 'multipart/form-data':
+        # Parse the form now, so its cost is recorded apart from the handler's
+        with stage_seconds.time(request.endpoint or 'unmatched', 'parse'):
+            request.files
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or 'unmatched'
+    request_seconds.observe(time.perf_counter() - g.request_start, endpoint)
+    requests_total.inc(endpoint, str(response.status_code))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    requests_in_flight.dec(request.endpoint or 'unmatched')
+    if exc is not None:
+        count_error(exc, request.endpoint or 'unmatched')
+
+@app.teardown_request
+def close_upload_streams(exc):
+    """Closes the chunked uploads a request opened."""
+    for stream in g.pop('upload_streams', []):
+        stream.close()
+
+def form_lsb_depth():
+    """Reads the optional `lsb_depth` form field; returns None if it is not a valid depth."""
+    try:
+        lsb_depth = int(request.form.get('lsb_depth', 1))
+    except ValueError:
+        return None
+    return lsb_depth if 1 <= lsb_depth <= MAX_LSB_DEPTH else None
+
+LSB_DEPTH_ERROR = f"Bits per channel (lsb_depth) must be between 1 and {MAX_LSB_DEPTH}."
+
+def form_compress_level():
+    """Reads the optional `compress_level` form field (a profile name or 0-9); returns None if invalid."""
+    value = request.form.get('compress_level', app.config['PNG_COMPRESS_LEVEL'])
+    try:
+        return stegoshield.png_compress_level(int(value) if str(value).isdigit() else value)
+    except ValueError:
+        return None
+
+COMPRESS_LEVEL_ERROR = f"Compression level (compress_level) must be one of {', '.join(PNG_PROFILES)} or 0-9."
+
+def form_key():
+    """Reads the optional `key` form field that scatters a payload; returns None if it is absent or empty."""
+    return request.form.get('key') or None
+
+# Descriptions of the stages in a `timings` dict, for Server-Timing headers
+STAGE_DESCRIPTIONS = {
+    'payload': "Building the payload",
+    'decode': "Decoding the carrier",
+    'embed': "Embedding",
+    'png': "PNG output",
+    'hash': "Hashing the upload",
+    'extract': "Extracting",
+    'store': "Storing the output",
+    'analyze': "Steganalysis",
+}
+
+def server_timing(timings):
+    """Formats a Server-Timing header with one metric per stage of a `timings` dict."""
+    return ', '.join(f'{stage};dur={seconds * 1000:.1f};desc="{STAGE_DESCRIPTIONS.get(stage, stage)}"'
+                     for stage, seconds in timings.items())
+
+def store_output(output, timings):
+    """Puts an output file in the store, adding the time taken to `timings` as 'store'; returns its digest."""
+    start = time.perf_counter()
+    digest = output_store.put(output)
+    timings['store'] = time.perf_counter() - start
+    return digest
+
+def output_response(digest, timings=None):
+    """Answers with a 303 redirect to a stored output's permanent URL.
+
+    With `format=json`, the answer is instead a JSON object holding the URL
+    and the request's per-stage `timings` in seconds, which are also sent
+    in a Server-Timing header. A redirect is followed by the client before
+    any of its headers can be read, so timings are only reported this way.
+    """
+    url = url_for('get_output', digest=digest)
+    if request.values.get('format') != 'json':
+        return redirect(url, 303)
+    response = jsonify({"url": url, "digest": digest, "timings": timings or {}})
+    if timings:
+        response.headers['Server-Timing'] = server_timing(timings)
+        response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+def cached_decode(stream, operation, decode, scatter_key=None, timings=None):
+    """Returns `decode(stream)` as bytes, reusing the result for identical uploads.
+
+    A payload's scatter key is part of the cache key, so a result is only
+    ever served to a request that gave the same key. The seconds spent
+    hashing the upload and, on a miss, decoding it are stored in an optional
+    `timings` dict as 'hash' and 'extract'.
+    """
+    start = time.perf_counter()
+    key = content_key(stream, operation if scatter_key is None else f"{operation}\0{scatter_key}")
+    result = decode_cache.get(key)
+    hashed = time.perf_counter()
+    if result is None:
+        result = decode(stream)
+        decode_cache.put(key, result)
+        if timings is not None:
+            timings['extract'] = time.perf_counter() - hashed
+    if timings is not None:
+        timings['hash'] = hashed - start
+    return result
+
+def decode_text_cached(stream, key=None, timings=None):
+    """Extracts a hidden message, served from the decode cache when possible."""
+    return cached_decode(stream, 'decode-text', lambda s: stegoshield.decode_message(s, key=key).encode('utf-8'),
+                         key, timings).decode('utf-8')
+
+def decode_image_cached(stream, key=None, timings=None):
+    """Extracts a hidden image into a PNG output file, served from the decode cache when possible."""
+    def decode_png(s):
+        buffer = io.BytesIO()
+        stegoshield.save_png(stegoshield.decode_image(s, key=key), buffer, app.config['PNG_COMPRESS_LEVEL'], app.config['PNG_WORKERS'])
+        return buffer.getvalue()
+
+    output = new_spooled_file()
+    output.write(cached_decode(stream, 'decode-image', decode_png, key, timings))
+    return output
+
 # --- API Endpoints ---
 
 @app.route('/api/encode-text', methods=['POST'])
 def handle_encode_text():
     """API endpoint to hide a text message in an image."""
-    if 'carrier' not in request.files or 'message' not in request.form:
+    if not has_upload('carrier') or 'message' not in request.form:
         return jsonify({"error": "Carrier image and message are required."}), 400
 
-    carrier_file = request.files['carrier']
     message = request.form['message']
-
-    if carrier_file.filename == '' or not message:
+    if not message:
         return jsonify({"error": "Please provide both a carrier image and a message."}), 400
 
-    carrier_path = save_file(carrier_file)
-    if not carrier_path:
+    carrier_stream = request_upload('carrier')
+    if not carrier_stream:
         return jsonify({"error": "Invalid file type. Please use PNG, JPG, or BMP."}), 400
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        return jsonify({"error": LSB_DEPTH_ERROR}), 400
+    compress_level = form_compress_level()
+    if compress_level is None:
+        return jsonify({"error": COMPRESS_LEVEL_ERROR}), 400
 
     try:
-        encoded_image_obj = encode_message(carrier_path, message)
-        output_filename = f"encoded_text_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-        encoded_image_obj.save(output_path, "PNG")
-        
-        # Send the processed image back to the client for download
-        return send_file(output_path, as_attachment=True, download_name=output_filename)
+        output = new_spooled_file()
+        timings = {}
+        stegoshield.encode_message_to_file(carrier_stream, message, output, workers=app.config['PNG_WORKERS'],
+                                           lsb_depth=lsb_depth, compress_level=compress_level, key=form_key(),
+                                           timings=timings)
+        with output:
+            digest = store_output(output, timings)
+        observe_stages(request.endpoint, timings)
+        payload_bytes.observe(len(message.encode('utf-8')), request.endpoint)
+
+        # Point the client at the processed image's permanent URL
+        return output_response(digest, timings)
     except Exception as e:
+        count_error(e)
         return jsonify({"error": f"An error occurred during encoding: {e}"}), 500
 
 @app.route('/api/decode-text', methods=['POST'])
 def handle_decode_text():
     """API endpoint to extract a text message from an image."""
-    if 'encoded' not in request.files:
+    if not has_upload('encoded'):
         return jsonify({"error": "Please select an image to decode."}), 400
 
-    encoded_file = request.files['encoded']
-    if encoded_file.filename == '':
-        return jsonify({"error": "No file selected."}), 400
-
-    encoded_path = save_file(encoded_file)
-    if not encoded_path:
+    encoded_stream = request_upload('encoded')
+    if not encoded_stream:
         return jsonify({"error": "Invalid file type."}), 400
 
     try:
-        secret_message = decode_message(encoded_path)
+        timings = {}
+        secret_message = decode_text_cached(encoded_stream, form_key(), timings)
+        observe_stages(request.endpoint, timings)
+        payload_bytes.observe(len(secret_message.encode('utf-8')), request.endpoint)
         return jsonify({"message": secret_message})
     except Exception as e:
+        count_error(e)
         return jsonify({"error": f"Failed to decode message: {e}"}), 500
 
 @app.route('/api/encode-image', methods=['POST'])
 def handle_encode_image():
     """API endpoint to hide an image within another image."""
-    if 'carrier' not in request.files or 'secret' not in request.files:
-        return jsonify({"error": "Both carrier and secret images are required."}), 400
-
-    carrier_file = request.files['carrier']
-    secret_file = request.files['secret']
-
-    if carrier_file.filename == '' or secret_file.filename == '':
+    if not has_upload('carrier') or not has_upload('secret'):
         return jsonify({"error": "Please select both a carrier and a secret image."}), 400
 
-    carrier_path = save_file(carrier_file)
-    secret_path = save_file(secret_file)
+    carrier_stream = request_upload('carrier')
+    secret_stream = request_upload('secret')
 
-    if not carrier_path or not secret_path:
+    if not carrier_stream or not secret_stream:
         return jsonify({"error": "Invalid file type for one or both images."}), 400
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        return jsonify({"error": LSB_DEPTH_ERROR}), 400
+    compress_level = form_compress_level()
+    if compress_level is None:
+        return jsonify({"error": COMPRESS_LEVEL_ERROR}), 400
 
     try:
-        encoded_image_obj = encode_image(carrier_path, secret_path)
-        output_filename = f"encoded_image_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-        encoded_image_obj.save(output_path, "PNG")
-        
-        return send_file(output_path, as_attachment=True, download_name=output_filename)
+        output = new_spooled_file()
+        timings = {}
+        stegoshield.encode_image_to_file(carrier_stream, secret_stream, output, workers=app.config['PNG_WORKERS'],
+                                         lsb_depth=lsb_depth, compress_level=compress_level, key=form_key(),
+                                         timings=timings)
+        with output:
+            digest = store_output(output, timings)
+        observe_stages(request.endpoint, timings)
+        payload_bytes.observe(secret_stream.seek(0, os.SEEK_END), request.endpoint)
+
+        return output_response(digest, timings)
     except ValueError as e:
         # Catch specific value errors (e.g., secret image too large)
+        count_error(e)
         return jsonify({"error": str(e)}), 400
     except Exception as e:
+        count_error(e)
         return jsonify({"error": f"An error occurred during image encoding: {e}"}), 500
 
 @app.route('/api/decode-image', methods=['POST'])
 def handle_decode_image():
     """API endpoint to extract a hidden image from a carrier."""
-    if 'encoded' not in request.files:
+    if not has_upload('encoded'):
         return jsonify({"error": "Please select an image to decode."}), 400
 
-    encoded_file = request.files['encoded']
-    if encoded_file.filename == '':
-        return jsonify({"error": "No file selected."}), 400
-
-    encoded_path = save_file(encoded_file)
-    if not encoded_path:
+    encoded_stream = request_upload('encoded')
+    if not encoded_stream:
         return jsonify({"error": "Invalid file type."}), 400
 
     try:
-        secret_image_obj = decode_image(encoded_path)
-        output_filename = f"extracted_image_{uuid.uuid4()}.png"
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-        secret_image_obj.save(output_path, "PNG")
-        
-        return send_file(output_path, as_attachment=True, download_name=output_filename)
+        timings = {}
+        with decode_image_cached(encoded_stream, form_key(), timings) as output:
+            payload_bytes.observe(output.tell(), request.endpoint)
+            digest = store_output(output, timings)
+        observe_stages(request.endpoint, timings)
+
+        return output_response(digest, timings)
     except Exception as e:
+        count_error(e)
         return jsonify({"error": f"Failed to decode image: {e}"}), 500
 
+@app.route('/api/outputs/<digest>.png', methods=['GET'])
+def get_output(digest):
+    """API endpoint to fetch a stored output, answering conditional and Range requests.
+
+    Add `download=NAME` to have the browser save it as NAME.
+    """
+    path = output_store.path(digest)
+    if path is None:
+        return jsonify({"error": "Unknown or expired output."}), 404
+    download_name = request.args.get('download') or None
+    with stage_seconds.time(request.endpoint, 'send'):
+        response = send_file(path, mimetype='image/png', as_attachment=download_name is not None,
+                             download_name=download_name, etag=digest, max_age=app.config['OUTPUT_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/api/probe', methods=['POST'])
+def handle_probe():
+    """API endpoint to check whether an image carries a payload without decoding it."""
+    if not has_upload('encoded'):
+        return jsonify({"error": "Please select an image to probe."}), 400
+
+    encoded_stream = request_upload('encoded')
+    if not encoded_stream:
+        return jsonify({"error": "Invalid file type."}), 400
+
+    try:
+        return jsonify(stegoshield.probe(encoded_stream, form_key()))
+    except Exception as e:
+        count_error(e)
+        return jsonify({"error": f"Failed to read image: {e}"}), 500
+
+@app.route('/api/analyze', methods=['POST'])
+def handle_analyze():
+    """API endpoint to screen any image for LSB steganography with chi-square, RS and SPA analysis."""
+    if not has_upload('image'):
+        return jsonify({"error": "Please select an image to analyze."}), 400
+
+    image_stream = request_upload('image')
+    if not image_stream:
+        return jsonify({"error": "Invalid file type."}), 400
+
+    try:
+        sample = float(request.form['sample']) if request.form.get('sample') else None
+    except ValueError:
+        return jsonify({"error": "Sample must be a share between 0 and 1."}), 400
+
+    try:
+        result = stegoshield.analyze(image_stream, sample=sample)
+    except ValueError as e:
+        count_error(e)
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        count_error(e)
+        return jsonify({"error": f"Failed to analyze image: {e}"}), 500
+    response = jsonify(result)
+    response.headers['Server-Timing'] = server_timing({'analyze': result['seconds']})
+    response.headers['Timing-Allow-Origin'] = '*'
+    return response
+
+# --- Batch API ---
+
+class ChunkBuffer:
+    """A write-only file object that hands back everything written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def spool_upload(file_storage):
+    """Copies an upload into a spooled file of its own so it outlives the request."""
+    stream = upload_stream(file_storage)
+    if not stream:
+        return None
+    spooled = new_spooled_file()
+    shutil.copyfileobj(stream, spooled)
+    spooled.seek(0)
+    return spooled
+
+def run_batch(file_list, task):
+    """Copies a batch of uploads and starts `task(stream)` for each on the batch pool.
+
+    Uploads are copied before the response starts streaming, while the
+    request is still open. The returned generator yields
+    (index, filename, result, error) as each item finishes, so one bad file
+    only produces an error entry for that item.
+    """
+    endpoint = request.endpoint
+    futures = {}
+    rejected = []
+    for index, file_storage in enumerate(file_list):
+        stream = spool_upload(file_storage)
+        if stream:
+            futures[batch_executor.submit(task, stream)] = (index, file_storage.filename, stream)
+        else:
+            rejected.append((index, file_storage.filename, None, "Invalid file type."))
+
+    def results():
+        yield from rejected
+        for future in as_completed(futures):
+            index, filename, stream = futures[future]
+            stream.close()
+            try:
+                yield index, filename, future.result(), None
+            except Exception as e:
+                count_error(e, endpoint)
+                yield index, filename, None, str(e)
+
+    return results()
+
+def stream_ndjson(results):
+    """Streams batch results as one JSON object per line, PNG outputs inlined as base64."""
+    for index, filename, result, error in results:
+        entry = {"index": index, "filename": filename}
+        if error:
+            entry["error"] = error
+        else:
+            fields, output = result
+            entry.update(fields)
+            if output:
+                with output:
+                    output.seek(0)
+                    entry["png"] = base64.b64encode(output.read()).decode()
+        yield json.dumps(entry) + "\n"
+
+def stream_zip(results):
+    """Streams batch results as a ZIP of PNG outputs plus a manifest.ndjson entry per item."""
+    buffer = ChunkBuffer()
+    manifest = []
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+        for index, filename, result, error in results:
+            entry = {"index": index, "filename": filename}
+            if error:
+                entry["error"] = error
+            else:
+                fields, output = result
+                entry.update(fields)
+                if output:
+                    entry["output"] = f"{index:04d}_{os.path.splitext(filename)[0]}.png"
+                    with output, archive.open(entry["output"], 'w') as member:
+                        output.seek(0)
+                        shutil.copyfileobj(output, member)
+            manifest.append(entry)
+            yield buffer.drain()
+        archive.writestr("manifest.ndjson", "".join(json.dumps(entry) + "\n" for entry in manifest))
+    yield buffer.drain()
+
+def batch_response(results, default_format):
+    """Builds a streamed ZIP or NDJSON response, chosen by the `format` form field."""
+    output_format = request.form.get('format', default_format)
+    if output_format == 'zip':
+        return Response(stream_zip(results), mimetype='application/zip',
+                        headers={"Content-Disposition": "attachment; filename=batch_results.zip"})
+    return Response(stream_ndjson(results), mimetype='application/x-ndjson')
+
+@app.route('/api/batch/encode-text', methods=['POST'])
+def handle_batch_encode_text():
+    """API endpoint to hide one text message in many carrier images."""
+    carrier_files = request.files.getlist('carriers')
+    message = request.form.get('message', '')
+    if not carrier_files or not message:
+        return jsonify({"error": "Carrier images and a message are required."}), 400
+    if request.form.get('format', 'zip') not in ('zip', 'ndjson'):
+        return jsonify({"error": "Format must be 'zip' or 'ndjson'."}), 400
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        return jsonify({"error": LSB_DEPTH_ERROR}), 400
+    compress_level = form_compress_level()
+    if compress_level is None:
+        return jsonify({"error": COMPRESS_LEVEL_ERROR}), 400
+    key = form_key()
+
+    def encode_item(carrier_stream):
+        output = new_spooled_file()
+        png_seconds = stegoshield.encode_message_to_file(carrier_stream, message, output, lsb_depth=lsb_depth,
+                                                         compress_level=compress_level, key=key)
+        return {"png_ms": round(png_seconds * 1000, 1)}, output
+
+    return batch_response(run_batch(carrier_files, encode_item), 'zip')
+
+@app.route('/api/batch/decode', methods=['POST'])
+def handle_batch_decode():
+    """API endpoint to extract hidden text or images from many encoded images."""
+    encoded_files = request.files.getlist('encoded')
+    payload_type = request.form.get('type', 'text')
+    if not encoded_files:
+        return jsonify({"error": "Please select images to decode."}), 400
+    if payload_type not in ('text', 'image'):
+        return jsonify({"error": "Type must be 'text' or 'image'."}), 400
+    if request.form.get('format', 'ndjson') not in ('zip', 'ndjson'):
+        return jsonify({"error": "Format must be 'zip' or 'ndjson'."}), 400
+    key = form_key()
+
+    def decode_item(encoded_stream):
+        if payload_type == 'text':
+            return {"message": decode_text_cached(encoded_stream, key)}, None
+        return {}, decode_image_cached(encoded_stream, key)
+
+    return batch_response(run_batch(encoded_files, decode_item), 'ndjson')
+
+# --- Chunked Uploads API ---
+
+def chunked_upload_or_404(upload_id):
+    """Returns the chunked upload with the given id, or ends the request with a 404."""
+    upload = upload_store.get(upload_id)
+    if upload is None:
+        abort(make_response(jsonify({"error": "Unknown or expired upload."}), 404))
+    return upload
+
+@app.route('/api/uploads', methods=['POST'])
+def handle_create_upload():
+    """API endpoint to start a resumable chunked upload of `size` bytes and return its id."""
+    filename = request.form.get('filename', '')
+    if not allowed_file(filename):
+        return jsonify({"error": "Invalid file type. Please use PNG, JPG, BMP or TIFF."}), 400
+    try:
+        size = int(request.form.get('size', ''))
+    except ValueError:
+        return jsonify({"error": "Upload size (size) must be a whole number of bytes."}), 400
+    try:
+        upload = upload_store.create(size, filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 413
+    except UploadLimitError as e:
+        return jsonify({"error": str(e)}), 429
+    except OSError as e:
+        return jsonify({"error": f"Could not allocate the upload: {e}"}), 507
+    return jsonify(upload.to_dict()), 201
+
+@app.route('/api/uploads/<upload_id>', methods=['PUT'])
+def handle_upload_chunk(upload_id):
+    """API endpoint to write the request body into an upload at the `offset` query parameter."""
+    upload = chunked_upload_or_404(upload_id)
+    length = request.content_length
+    if length is None:
+        return jsonify({"error": "Chunks need a Content-Length."}), 411
+    if length > upload.chunk_size:
+        return jsonify({"error": f"Chunks may be at most {upload.chunk_size} bytes."}), 413
+    try:
+        offset = int(request.args.get('offset', ''))
+    except ValueError:
+        return jsonify({"error": "Chunk offset (offset) must be a whole number of bytes."}), 400
+    if upload.finalized:
+        return jsonify({"error": "Upload is already finalized."}), 409
+    try:
+        written = upload.write(offset, request.stream, length)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if written < length:
+        return jsonify({"error": "Chunk ended early; query the upload for what arrived.", **upload.to_dict()}), 400
+    return jsonify(upload.to_dict())
+
+@app.route('/api/uploads/<upload_id>', methods=['GET'])
+def get_upload_status(upload_id):
+    """API endpoint to report the byte ranges of an upload received so far."""
+    return jsonify(chunked_upload_or_404(upload_id).to_dict())
+
+@app.route('/api/uploads/<upload_id>/finalize', methods=['POST'])
+def handle_finalize_upload(upload_id):
+    """API endpoint to finish a fully received upload, optionally checking its `sha256` digest."""
+    upload = chunked_upload_or_404(upload_id)
+    try:
+        upload.finalize(request.form.get('sha256'))
+    except ValueError as e:
+        return jsonify({"error": str(e), **upload.to_dict()}), 409
+    return jsonify(upload.to_dict())
+
+@app.route('/api/uploads/<upload_id>', methods=['DELETE'])
+def handle_delete_upload(upload_id):
+    """API endpoint to discard an upload."""
+    if not upload_store.delete(upload_id):
+        return jsonify({"error": "Unknown or expired upload."}), 404
+    return '', 204
+
+# --- Jobs API ---
+
+# Upload fields each job operation needs
+JOB_OPERATIONS = {
+    'encode-text': ('carrier',),
+    'decode-text': ('encoded',),
+    'encode-image': ('carrier', 'secret'),
+    'decode-image': ('encoded',),
+}
+
+def job_task(operation, streams, message, lsb_depth=1, compress_level=PNG_COMPRESS_LEVEL, key=None):
+    """Builds the task that performs a job operation on its spooled uploads.
+
+    Its stages and errors are recorded under the endpoint 'job:<operation>'.
+    """
+    endpoint = f"job:{operation}"
+
+    def task(job):
+        timings = {}
+        try:
+            job.report(0.1)
+            if operation == 'decode-text':
+                secret_message = decode_text_cached(streams['encoded'], key, timings)
+                payload_bytes.observe(len(secret_message.encode('utf-8')), endpoint)
+                return {"message": secret_message}, None
+            if operation == 'decode-image':
+                with decode_image_cached(streams['encoded'], key, timings) as output, \
+                        stage_seconds.time(endpoint, 'store'):
+                    payload_bytes.observe(output.tell(), endpoint)
+                    return {}, output_store.put(output)
+
+            output = new_spooled_file()
+            options = dict(workers=app.config['PNG_WORKERS'], lsb_depth=lsb_depth, compress_level=compress_level,
+                           progress=job.report, key=key, timings=timings)
+            if operation == 'encode-text':
+                payload_bytes.observe(len(message.encode('utf-8')), endpoint)
+                png_seconds = stegoshield.encode_message_to_file(streams['carrier'], message, output, **options)
+            else:
+                payload_bytes.observe(streams['secret'].seek(0, os.SEEK_END), endpoint)
+                png_seconds = stegoshield.encode_image_to_file(streams['carrier'], streams['secret'], output, **options)
+            with output, stage_seconds.time(endpoint, 'store'):
+                return {"png_ms": round(png_seconds * 1000, 1)}, output_store.put(output)
+        except Exception as e:
+            count_error(e, endpoint)
+            raise
+        finally:
+            observe_stages(endpoint, timings)
+            for stream in streams.values():
+                stream.close()
+    return task
+
+@app.route('/api/jobs', methods=['POST'])
+def handle_create_job():
+    """API endpoint to start an encode or decode job and return its id."""
+    operation = request.form.get('operation', '')
+    if operation not in JOB_OPERATIONS:
+        return jsonify({"error": f"Operation must be one of: {', '.join(JOB_OPERATIONS)}."}), 400
+
+    message = request.form.get('message', '')
+    if operation == 'encode-text' and not message:
+        return jsonify({"error": "Please provide a message to hide."}), 400
+    lsb_depth = form_lsb_depth()
+    if lsb_depth is None:
+        return jsonify({"error": LSB_DEPTH_ERROR}), 400
+    compress_level = form_compress_level()
+    if compress_level is None:
+        return jsonify({"error": COMPRESS_LEVEL_ERROR}), 400
+
+    streams = {}
+    for field in JOB_OPERATIONS[operation]:
+        # Jobs outlive the request, so they get their own copy or handle of each file
+        upload_id = request.form.get(f'{field}_upload')
+        file_storage = request.files.get(field)
+        if upload_id:
+            stream = open_chunked_upload(upload_id)
+        else:
+            stream = spool_upload(file_storage) if file_storage and file_storage.filename else None
+        if not stream:
+            for opened in streams.values():
+                opened.close()
+            return jsonify({"error": f"A valid '{field}' image is required."}), 400
+        observe_upload(request.endpoint, field, stream)
+        streams[field] = stream
+
+    total_size = sum(stream.seek(0, os.SEEK_END) for stream in streams.values())
+    task = job_task(operation, streams, message, lsb_depth, compress_level, form_key())
+    if total_size <= app.config['SYNC_JOB_THRESHOLD']:
+        job = job_queue.run_inline(operation, task)
+        return jsonify(job.to_dict()), 200
+
+    job = job_queue.submit(operation, task)
+    return jsonify(job.to_dict()), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """API endpoint to report a job's status and progress."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """API endpoint to fetch the output of a finished job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    if job.status != DONE:
+        return jsonify(job.to_dict()), 409
+    if job.output is None:
+        return jsonify(job.fields)
+    return output_response(job.output)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """API endpoint to expose request, stage, size and error metrics in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """API endpoint to report decode cache hits, misses and sizes."""
+    return jsonify(decode_cache.stats())
+
 @app.route('/api/help', methods=['GET'])
 def get_help_text():
     """API endpoint to provide the help text content to the frontend."""
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+_HASH_CHUNK = 1 << 20
+
+def content_key(stream, operation):
+    """Hashes an upload's bytes together with the operation run on them.
+
+    The stream is read from the start and rewound afterwards so it can still
+    be decoded on a cache miss.
+    """
+    digest = hashlib.sha256(operation.encode() + b'\0')
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(_HASH_CHUNK), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+class ResultCache:
+    """A content-addressed cache of decode results.
+
+    Results are bytes stored under a key from `content_key`. Recent results
+    live in an in-memory LRU holding at most `max_bytes`; if `disk_dir` is
+    given, results are also written there and the oldest files are removed
+    once the directory holds more than `disk_max_bytes`. Results larger than
+    a tier's whole budget are not kept in that tier.
+    """
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        """Returns the cached result for `key`, or None on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Stores a result in both tiers."""
+        value = bytes(value)
+        with self._lock:
+            self._remember(key, value)
+        self._write_disk(key, value)
+
+    def stats(self):
+        """Returns the hit/miss counters and the size of each tier."""
+        with self._lock:
+            stats = {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+            }
+        if self.disk_dir:
+            files = self._disk_files()
+            stats["disk_entries"] = len(files)
+            stats["disk_bytes"] = sum(size for _, size, _ in files)
+        return stats
+
+    def _remember(self, key, value):
+        if len(value) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old)
+        self._entries[key] = value
+        self._size += len(value)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+            # Refresh the file's age so disk eviction is least-recently-used too
+            os.utime(path)
+        except OSError:
+            return None
+        return value
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir or len(value) > self.disk_max_bytes:
+            return
+        # Write to a temporary name first so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(temp_path, self._disk_path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        self._evict_disk()
+
+    def _disk_files(self):
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                # Removed by another worker's eviction in the meantime
+                continue
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _evict_disk(self):
+        files = sorted(self._disk_files())
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
@@ -0,0 +1,100 @@
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Job states, in the order a job moves through them
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+class Job:
+    """State of one encode or decode job."""
+
+    def __init__(self, operation):
+        self.id = uuid.uuid4().hex
+        self.operation = operation
+        self.status = QUEUED
+        self.progress = 0.0
+        self.error = None
+        self.fields = {}
+        self.output = None
+        self.created = time.time()
+        self.finished = None
+
+    def report(self, progress):
+        """Records how far along the job is, as a fraction between 0 and 1."""
+        self.progress = max(self.progress, min(1.0, progress))
+
+    def to_dict(self):
+        """Returns the JSON-friendly status of the job."""
+        status = {
+            "id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+        }
+        if self.status == DONE:
+            status["result"] = self.fields
+            status["has_output"] = self.output is not None
+        if self.status == FAILED:
+            status["error"] = self.error
+        return status
+
+class JobQueue:
+    """Runs jobs on a local worker pool and keeps their state in memory.
+
+    A task is a callable taking the job and returning (fields, output), where
+    fields is a dict of JSON results and output the digest of an optional PNG
+    kept in the app's output store.
+    Finished jobs are forgotten `ttl` seconds after they complete.
+    """
+
+    def __init__(self, workers, ttl=3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, operation, task):
+        """Queues a task on the worker pool and returns its job straight away."""
+        job = self._add(operation)
+        self._executor.submit(self._run, job, task)
+        return job
+
+    def run_inline(self, operation, task):
+        """Runs a short task on the calling thread and returns its finished job."""
+        job = self._add(operation)
+        self._run(job, task)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with the given id, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _add(self, operation):
+        job = Job(operation)
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        return job
+
+    def _run(self, job, task):
+        job.status = RUNNING
+        try:
+            job.fields, job.output = task(job)
+            job.progress = 1.0
+            job.status = DONE
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        expired = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
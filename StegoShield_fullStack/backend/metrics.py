@@ -0,0 +1,135 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Bucket upper bounds, in seconds, for request and stage durations
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Bucket upper bounds, in bytes, for upload and payload sizes: 1 KiB to 4 GiB in powers of 4
+SIZE_BUCKETS = tuple(float(4 ** n) for n in range(5, 17))
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """A named family of series, one per combination of label values.
+
+    Updates take one lock and touch one dict entry, so they cost about a
+    microsecond and can sit on the hot path of every request.
+    """
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labelvalues, extra=()):
+        pairs = list(zip(self.labelnames, labelvalues)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def render(self):
+        """Returns the family in the Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted((labelvalues, self._snapshot(value)) for labelvalues, value in self._series.items())
+        for labelvalues, value in series:
+            lines.extend(self._render_series(labelvalues, value))
+        return '\n'.join(lines)
+
+    def _snapshot(self, value):
+        return value
+
+    def _render_series(self, labelvalues, value):
+        yield f"{self.name}{self._labels(labelvalues)} {_format_value(value)}"
+
+class Counter(_Metric):
+    """A count that only goes up, such as errors seen."""
+
+    kind = 'counter'
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+class Gauge(Counter):
+    """A value that goes up and down, such as requests in flight."""
+
+    kind = 'gauge'
+
+    def dec(self, *labelvalues, amount=1):
+        self.inc(*labelvalues, amount=-amount)
+
+class Histogram(_Metric):
+    """Counts observations into cumulative buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labelvalues):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                # Per-bucket counts (the last one past every bound), then the sum
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """Observes the seconds spent in the `with` block, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def _snapshot(self, value):
+        return list(value)
+
+    def _render_series(self, labelvalues, value):
+        counts, total = value[:-1], value[-1]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f"{self.name}_bucket{self._labels(labelvalues, [('le', _format_value(bound))])} {cumulative}"
+        yield f"{self.name}_sum{self._labels(labelvalues)} {_format_value(total)}"
+        yield f"{self.name}_count{self._labels(labelvalues)} {cumulative}"
+
+class Registry:
+    """The metric families an app exposes, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self):
+        """Returns every family in the Prometheus text exposition format, ending in a newline."""
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
@@ -0,0 +1,206 @@
+import errno
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+# Bytes copied from a request body into the upload file per write
+_COPY_BYTES = 1 << 20
+
+class Upload:
+    """A file sent in chunks, each written at its offset into a preallocated file.
+
+    `received` holds the byte ranges written so far as sorted, non-touching
+    [start, end) pairs. Once every byte is in, the upload can be finalized,
+    after which it no longer changes and can be opened by any number of
+    encode or decode requests.
+    """
+
+    def __init__(self, path, size, filename, chunk_size):
+        self.id = os.path.splitext(os.path.basename(path))[0]
+        self.path = path
+        self.size = size
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.received = []
+        self.finalized = False
+        self.touched = time.time()
+        self._lock = threading.Lock()
+
+    def write(self, offset, stream, length):
+        """Copies `length` bytes of a chunk from `stream` into the file at `offset`.
+
+        Whatever was written before the stream ended or failed still counts
+        as received, so a client only needs to resend the rest. Raises
+        ValueError if the upload is finalized or the chunk does not fit, and
+        returns the number of bytes written.
+        """
+        if self.finalized:
+            raise ValueError("Upload is already finalized.")
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise ValueError(f"Chunk of {length} bytes at offset {offset} does not fit an upload of {self.size} bytes.")
+        written = 0
+        try:
+            with open(self.path, 'r+b') as f:
+                f.seek(offset)
+                while written < length:
+                    data = stream.read(min(_COPY_BYTES, length - written))
+                    if not data:
+                        break
+                    f.write(data)
+                    written += len(data)
+        finally:
+            self._mark(offset, offset + written)
+        return written
+
+    def _mark(self, start, end):
+        with self._lock:
+            self.touched = time.time()
+            if start >= end:
+                return
+            merged = []
+            for first, last in self.received:
+                if last < start or first > end:
+                    merged.append([first, last])
+                else:
+                    start, end = min(start, first), max(end, last)
+            merged.append([start, end])
+            self.received = sorted(merged)
+
+    def missing(self):
+        """Returns the byte ranges not received yet, as [start, end) pairs."""
+        with self._lock:
+            gaps, position = [], 0
+            for first, last in self.received:
+                if first > position:
+                    gaps.append([position, first])
+                position = last
+            if position < self.size:
+                gaps.append([position, self.size])
+            return gaps
+
+    def finalize(self, sha256=None):
+        """Marks a fully received upload as finished, after checking its SHA-256 hex digest if one is given.
+
+        Raises ValueError if bytes are missing or the digest does not match.
+        """
+        if self.missing():
+            raise ValueError("Upload is incomplete.")
+        if sha256 and not self.finalized:
+            digest = hashlib.sha256()
+            with open(self.path, 'rb') as f:
+                for block in iter(lambda: f.read(_COPY_BYTES), b''):
+                    digest.update(block)
+            if digest.hexdigest() != sha256.lower():
+                raise ValueError("Upload does not match its SHA-256 digest.")
+        self.finalized = True
+        self.touched = time.time()
+
+    def open(self):
+        """Opens the finished file for reading; each caller gets a handle of its own."""
+        self.touched = time.time()
+        return open(self.path, 'rb')
+
+    def to_dict(self):
+        """Returns the JSON-friendly status of the upload."""
+        with self._lock:
+            received = [list(span) for span in self.received]
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "size": self.size,
+            "chunk_size": self.chunk_size,
+            "received": received,
+            "received_bytes": sum(end - start for start, end in received),
+            "missing": self.missing(),
+            "finalized": self.finalized,
+        }
+
+class UploadLimitError(Exception):
+    """Raised when starting an upload would pass the store's limits on pending uploads."""
+
+class UploadStore:
+    """Keeps chunked uploads as files in `directory`.
+
+    Each upload's file is allocated at its full size up front, so a full
+    disk is reported when the upload starts rather than halfway through.
+    That space is bounded: at most `max_pending` uploads, holding at most
+    `max_pending_bytes` between them, may be unfinalized at once. Pending
+    uploads untouched for `pending_ttl` seconds, and finalized ones
+    untouched for `ttl` seconds, are forgotten and their files removed.
+    """
+
+    def __init__(self, directory, max_size, chunk_size, ttl=24 * 3600, max_pending=32,
+                 max_pending_bytes=8 << 30, pending_ttl=3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.pending_ttl = pending_ttl
+        self._uploads = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, size, filename):
+        """Starts an upload of `size` bytes and returns it.
+
+        Raises ValueError if it is too large, and UploadLimitError if the
+        pending uploads already take up the store's limits.
+        """
+        if size < 0 or size > self.max_size:
+            raise ValueError(f"Upload size must be between 0 and {self.max_size} bytes.")
+        upload = Upload(os.path.join(self.directory, f"{uuid.uuid4().hex}.upload"), size, filename, self.chunk_size)
+        # The upload holds its place among the pending ones while its file is allocated
+        with self._lock:
+            self._expire()
+            pending = [other for other in self._uploads.values() if not other.finalized]
+            if len(pending) >= self.max_pending:
+                raise UploadLimitError(f"Too many uploads in progress; at most {self.max_pending} may be pending.")
+            if sum(other.size for other in pending) + size > self.max_pending_bytes:
+                raise UploadLimitError("Uploads in progress take up all the space reserved for uploads.")
+            self._uploads[upload.id] = upload
+        try:
+            with open(upload.path, 'wb') as f:
+                try:
+                    os.posix_fallocate(f.fileno(), 0, size)
+                except (AttributeError, OSError) as e:
+                    # Platforms or filesystems without fallocate get a sparse file instead
+                    if getattr(e, 'errno', None) == errno.ENOSPC:
+                        raise
+                    f.truncate(size)
+        except OSError:
+            self.delete(upload.id)
+            raise
+        return upload
+
+    def get(self, upload_id):
+        """Returns the upload with the given id, or None if it is unknown or expired."""
+        with self._lock:
+            self._expire()
+            return self._uploads.get(upload_id)
+
+    def delete(self, upload_id):
+        """Forgets an upload and removes its file; returns whether it existed."""
+        with self._lock:
+            upload = self._uploads.pop(upload_id, None)
+        if upload is None:
+            return False
+        self._remove(upload)
+        return True
+
+    def _expire(self):
+        now = time.time()
+        expired = [upload_id for upload_id, upload in self._uploads.items()
+                   if upload.touched < now - (self.ttl if upload.finalized else self.pending_ttl)]
+        for upload_id in expired:
+            self._remove(self._uploads.pop(upload_id))
+
+    def _remove(self, upload):
+        # Requests still reading the file keep their open handles
+        try:
+            os.remove(upload.path)
+        except OSError:
+            pass
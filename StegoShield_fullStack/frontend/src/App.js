@@ -260,6 +260,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
   const [result, setResult] = useState(null);
+  const [progress, setProgress] = useState(null);
 
   // State for form inputs
   const [carrierImage, setCarrierImage] = useState(null);
@@ -272,11 +273,17 @@ function App() {
 
   const API_URL = 'http://localhost:5000/api';
 
+  // Files larger than this are sent as resumable chunked uploads, and a
+  // chunk that fails without a server response is retried this many times
+  const CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024;
+  const UPLOAD_RETRIES = 5;
+
   // --- Helper Functions ---
   const resetState = () => {
     setLoading(false);
     setError('');
     setResult(null);
+    setProgress(null);
     setCarrierImage(null);
     setSecretText('');
     setSecretImage(null);
@@ -325,6 +332,68 @@ function App() {
     }
   };
 
+  // Sends a file to the backend in chunks and returns the id of the finished
+  // upload. After a dropped connection the upload resumes from the ranges
+  // the server reports as received.
+  const uploadInChunks = async (file) => {
+    const form = new FormData();
+    form.append('filename', file.name);
+    form.append('size', file.size);
+    let upload = (await axios.post(`${API_URL}/uploads`, form)).data;
+    let failures = 0;
+    while (upload.missing.length > 0) {
+      const [start, end] = upload.missing[0];
+      const stop = Math.min(end, start + upload.chunk_size);
+      try {
+        const response = await axios.put(`${API_URL}/uploads/${upload.id}?offset=${start}`, file.slice(start, stop),
+                                         { headers: { 'Content-Type': 'application/octet-stream' } });
+        upload = response.data;
+        failures = 0;
+        setProgress(upload.received_bytes / upload.size);
+      } catch (err) {
+        // Errors the server answered are final; lost connections are retried
+        if (err.response || ++failures > UPLOAD_RETRIES) throw err;
+        await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+        try {
+          upload = (await axios.get(`${API_URL}/uploads/${upload.id}`)).data;
+        } catch (statusErr) {
+          // Still unreachable; the next pass retries the same chunk
+        }
+      }
+    }
+    await axios.post(`${API_URL}/uploads/${upload.id}/finalize`);
+    return upload.id;
+  };
+
+  // Adds a file to a request, as the id of a chunked upload when it is large
+  const appendFile = async (formData, field, file) => {
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+      formData.append(`${field}_upload`, await uploadInChunks(file));
+    } else {
+      formData.append(field, file);
+    }
+  };
+
+  // Runs an operation as a backend job, polling until it finishes, and
+  // returns the response holding its result image
+  const runJob = async (operation, formData) => {
+    formData.append('operation', operation);
+    let job = (await axios.post(`${API_URL}/jobs`, formData)).data;
+    while (job.status === 'queued' || job.status === 'running') {
+      setProgress(job.progress);
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      job = (await axios.get(`${API_URL}/jobs/${job.id}`)).data;
+    }
+    if (job.status === 'failed') {
+      // Shaped like an axios error so handleApiError can report it
+      const failure = new Error(job.error);
+      failure.response = { data: { error: job.error } };
+      throw failure;
+    }
+    setProgress(1);
+    return axios.get(`${API_URL}/jobs/${job.id}/result`, { responseType: 'blob' });
+  };
+
 
   // --- API Handlers ---
 
@@ -335,7 +404,6 @@ function App() {
       return;
     }
     const formData = new FormData();
-    formData.append('carrier', carrierImage);
     formData.append('message', secretText);
     
     setLoading(true);
@@ -343,6 +411,7 @@ function App() {
     setResult(null);
 
     try {
+      await appendFile(formData, 'carrier', carrierImage);
       const response = await axios.post(`${API_URL}/encode-text`, formData, { responseType: 'blob' });
       const downloadUrl = downloadFile(response, 'encoded_text.png');
       setResult({
@@ -355,6 +424,7 @@ function App() {
       await handleApiError(err);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -365,19 +435,20 @@ function App() {
       return;
     }
     const formData = new FormData();
-    formData.append('encoded', encodedImage);
 
     setLoading(true);
     setError('');
     setResult(null);
 
     try {
+      await appendFile(formData, 'encoded', encodedImage);
       const response = await axios.post(`${API_URL}/decode-text`, formData);
       setResult({ type: 'text', message: response.data.message });
     } catch (err) {
       await handleApiError(err);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
   
@@ -388,15 +459,15 @@ function App() {
       return;
     }
     const formData = new FormData();
-    formData.append('carrier', carrierImage);
-    formData.append('secret', secretImage);
 
     setLoading(true);
     setError('');
     setResult(null);
 
     try {
-      const response = await axios.post(`${API_URL}/encode-image`, formData, { responseType: 'blob' });
+      await appendFile(formData, 'carrier', carrierImage);
+      await appendFile(formData, 'secret', secretImage);
+      const response = await runJob('encode-image', formData);
       const downloadUrl = downloadFile(response, 'encoded_image.png');
        setResult({
         type: 'image-preview',
@@ -408,6 +479,7 @@ function App() {
       await handleApiError(err);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -418,14 +490,14 @@ function App() {
       return;
     }
     const formData = new FormData();
-    formData.append('encoded', encodedImage);
 
     setLoading(true);
     setError('');
     setResult(null);
 
     try {
-      const response = await axios.post(`${API_URL}/decode-image`, formData, { responseType: 'blob' });
+      await appendFile(formData, 'encoded', encodedImage);
+      const response = await runJob('decode-image', formData);
       const extractedUrl = downloadFile(response, 'extracted_image.png');
       setResult({
         type: 'image-preview',
@@ -439,6 +511,7 @@ function App() {
       await handleApiError(err);
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -556,6 +629,7 @@ function App() {
           </div>
           <div className="result-box">
             {loading && <div className="spinner"></div>}
+            {loading && progress !== null && <p className="job-progress">Processing... {Math.round(progress * 100)}%</p>}
             <MessageBox message={error} type="error" />
             {renderResult()}
           </div>
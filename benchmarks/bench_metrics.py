@@ -0,0 +1,135 @@
+"""Benchmark for the overhead of the full-stack backend's Prometheus metrics.
+
+Times each kind of metric update on its own, then sends the same
+encode-text and decode-text requests through the Flask test client,
+alternating request by request between the metrics in place and every
+metric swapped for one that does nothing, and compares the median request
+times. Alternating keeps warm-up and machine noise out of the difference.
+Finally it times a scrape of /api/metrics once every series has data.
+
+Usage: python benchmarks/bench_metrics.py [--megapixels 1] [--requests 500]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'StegoShield_fullStack', 'backend')
+sys.path.insert(0, BACKEND)
+from metrics import Counter, Gauge, Histogram  # noqa: E402
+
+# The app's metric objects, swapped out to measure requests without them
+METRIC_NAMES = ('request_seconds', 'requests_total', 'stage_seconds', 'upload_bytes', 'payload_bytes',
+                'errors_total', 'requests_in_flight')
+
+
+class NullMetric:
+    """Stands in for any metric and records nothing."""
+
+    def _nothing(self, *args, **kwargs):
+        pass
+
+    observe = inc = dec = _nothing
+
+    def time(self, *labelvalues):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def per_call(count, func):
+    """Returns the mean seconds per call over `count` calls."""
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    return (time.perf_counter() - start) / count
+
+
+def time_updates(count):
+    histogram = Histogram('h', "", ('endpoint', 'stage'))
+    counter = Counter('c', "", ('endpoint', 'exception'))
+    gauge = Gauge('g', "", ('endpoint',))
+
+    def timed_block():
+        with histogram.time('handle_encode_text', 'store'):
+            pass
+
+    return {
+        'Histogram.observe': per_call(count, lambda: histogram.observe(0.0123, 'handle_encode_text', 'embed')),
+        'Histogram.time': per_call(count, timed_block),
+        'Counter.inc': per_call(count, lambda: counter.inc('handle_encode_text', 'ValueError')),
+        'Gauge.inc + dec': per_call(count, lambda: (gauge.inc('handle_encode_text'), gauge.dec('handle_encode_text'))),
+    }
+
+
+def compare_requests(app_module, requests, send):
+    """Returns the median seconds of `send()` without and with the app's metrics, alternating between them."""
+    metrics = {name: getattr(app_module, name) for name in METRIC_NAMES}
+    null_metrics = {name: NullMetric() for name in METRIC_NAMES}
+    timings = {False: [], True: []}
+    send()
+    for index in range(2 * requests):
+        enabled = index % 2 == 1
+        for name, metric in (metrics if enabled else null_metrics).items():
+            setattr(app_module, name, metric)
+        start = time.perf_counter()
+        send()
+        timings[enabled].append(time.perf_counter() - start)
+    return statistics.median(timings[False]), statistics.median(timings[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=1)
+    parser.add_argument('--requests', type=int, default=500, help="requests of each kind with and without metrics")
+    parser.add_argument('--updates', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'update':<20} {'ns/call':>9}")
+    for name, seconds in time_updates(args.updates).items():
+        print(f"{name:<20} {seconds * 1e9:>9.0f}")
+
+    # The app creates its upload and output directories in the working directory
+    os.chdir(tempfile.mkdtemp(prefix='stegoshield-bench-metrics-'))
+    import app as app_module
+    client = app_module.app.test_client()
+
+    width = 1024
+    height = max(1, int(args.megapixels * 1e6) // width)
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), "RGB").save(buffer, "PNG")
+    carrier = buffer.getvalue()
+    response = client.post('/api/encode-text', data={'carrier': (io.BytesIO(carrier), 'carrier.png'),
+                                                     'message': 'hello'}, follow_redirects=True)
+    encoded = response.data
+
+    # Decodes of the same upload are cache hits, so they show the fixed per-request cost
+    sends = {
+        'encode-text': lambda: client.post('/api/encode-text', data={'carrier': (io.BytesIO(carrier), 'carrier.png'),
+                                                                     'message': 'hello'}),
+        'decode-text': lambda: client.post('/api/decode-text', data={'encoded': (io.BytesIO(encoded), 'encoded.png')}),
+    }
+
+    print(f"\n{width}x{height} carrier, median of {args.requests} requests each")
+    print(f"{'request':<12} {'off ms':>9} {'on ms':>9} {'overhead us':>12} {'overhead':>9}")
+    for label, send in sends.items():
+        off, on = compare_requests(app_module, args.requests, send)
+        print(f"{label:<12} {off * 1e3:>9.3f} {on * 1e3:>9.3f} {(on - off) * 1e6:>12.1f} {(on - off) / off:>8.2%}")
+
+    scrape = per_call(100, lambda: client.get('/api/metrics'))
+    print(f"\nscrape of /api/metrics: {scrape * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
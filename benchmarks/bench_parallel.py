@@ -0,0 +1,58 @@
+"""Benchmark for the parallel stripe mode of the LSB engine.
+
+Embeds and extracts a full-capacity payload in a synthetic carrier with an
+increasing number of workers and prints the speedup over the serial path.
+
+Usage: python benchmarks/bench_parallel.py [--megapixels 50] [--workers 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from stegoshield import steganography  # noqa: E402
+
+
+def best_of(repeat, func, *args):
+    """Returns the fastest of `repeat` timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=50)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    width = 8192
+    height = int(args.megapixels * 1e6) // width
+    rng = np.random.default_rng(0)
+    carrier = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8), "RGB")
+    num_bits = width * height * 3
+    stream = rng.integers(0, 256, num_bits // 8, dtype=np.uint8).tobytes()
+
+    print(f"carrier {width}x{height} ({width * height / 1e6:.1f} MP), "
+          f"payload {num_bits / 8 / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'embed s':>9} {'speedup':>8} {'extract s':>10} {'speedup':>8}")
+
+    serial = None
+    for workers in args.workers:
+        embed = best_of(args.repeat, steganography._embed_data, carrier, stream, num_bits, workers)
+        extract = best_of(args.repeat, steganography._extract_data, carrier, num_bits, 0, workers)
+        if serial is None:
+            serial = (embed, extract)
+        print(f"{workers:>8} {embed:>9.3f} {serial[0] / embed:>7.2f}x {extract:>10.3f} {serial[1] / extract:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Benchmark for keyed scattering in the LSB engine.
+
+Embeds and extracts a payload that fills a fraction of a synthetic RGB
+carrier's capacity, with and without a key, on the carrier's array so that
+decoding and PNG output are left out. Prints the time each takes.
+
+Usage: python benchmarks/bench_scatter.py [--megapixels 24] [--fill 0.01 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from stegoshield import steganography  # noqa: E402
+
+
+def best_of(repeat, func, *args):
+    """Returns the fastest of `repeat` timed calls, in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--megapixels', type=float, default=24)
+    parser.add_argument('--fill', type=float, nargs='+', default=[0.01, 0.1])
+    parser.add_argument('--key', default='benchmark key')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    width = 6000
+    height = int(args.megapixels * 1e6) // width
+    rng = np.random.default_rng(0)
+    channels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    print(f"carrier {width}x{height} ({width * height / 1e6:.1f} MP), {os.cpu_count()} CPUs")
+    print(f"{'fill':>6} {'payload MB':>11} {'key':>4} {'embed ms':>9} {'extract ms':>11}")
+
+    for fill in args.fill:
+        num_bits = int(channels.size * fill) // 8 * 8
+        # Two payloads in turn, so every embed changes about half the values it visits
+        streams = [rng.integers(0, 256, num_bits // 8, dtype=np.uint8).tobytes() for _ in range(2)]
+        for key in (None, args.key):
+            turn = iter(range(1 << 30))
+
+            def embed():
+                steganography._embed_channels(channels, 'RGB', streams[next(turn) % 2], num_bits, key=key)
+
+            scatter = None if key is None else steganography._Scatter(key, 'RGB', width * height)
+            embed_s = best_of(args.repeat, embed)
+            extract_s = best_of(args.repeat, steganography._extract_data, channels, num_bits, 0, 1, 1, None, scatter)
+            print(f"{fill:>6.0%} {num_bits / 8 / 1e6:>11.2f} {'yes' if key else 'no':>4} "
+                  f"{embed_s * 1e3:>9.1f} {extract_s * 1e3:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Benchmark suite for the public steganography API of the stegoshield package.
+
+Runs encode_message, decode_message, encode_image and decode_image with each
+chosen engine backend over synthetic carriers and payloads. Each case runs in a fresh process and records
+wall time, peak RSS and peak traced allocations. Results are written as
+JSON. When a baseline file is given, the suite compares against it and
+exits with status 1 if any case regressed past the threshold.
+
+Usage: python benchmarks/bench_suite.py [--quick] [--backends numpy python] [--output results.json]
+       [--baseline baseline.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import stegoshield  # noqa: E402
+from stegoshield.backends import available_backends, set_backend  # noqa: E402
+
+OPERATIONS = ['encode_message', 'decode_message', 'encode_image', 'decode_image']
+CARRIER_WIDTH = 1024
+
+# Absolute growth below these is treated as noise when comparing to a baseline
+NOISE_FLOOR = {'seconds': 0.005, 'peak_rss_mb': 2.0, 'peak_alloc_mb': 1.0}
+
+# Bits used by the stream around the body: the 15-byte container header
+STREAM_OVERHEAD_BITS = 120
+
+
+def parse_size(text):
+    """Parses a payload size such as 10, 4k, 1m or 'full'."""
+    text = text.lower()
+    if text == 'full':
+        return text
+    scale = {'k': 1024, 'm': 1024 * 1024}.get(text[-1], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def carrier_size(megapixels):
+    height = max(1, round(megapixels * 1e6 / CARRIER_WIDTH))
+    return CARRIER_WIDTH, height
+
+
+def text_message(payload, capacity_bits):
+    """Returns a random ASCII message of `payload` bytes, or the largest that fits.
+
+    Sizes assume the legacy base64 body, which is the worst case for the
+    compressed payload too since random letters still compress.
+    """
+    if payload == 'full':
+        # The body is base64, 4 characters per 3 message bytes
+        payload = (capacity_bits - STREAM_OVERHEAD_BITS) // 8 // 4 * 3
+    body_bits = math.ceil(payload / 3) * 4 * 8
+    if STREAM_OVERHEAD_BITS + body_bits > capacity_bits:
+        return None
+    letters = np.random.default_rng(0).integers(ord('a'), ord('z') + 1, payload, dtype=np.uint8)
+    return letters.tobytes().decode('ascii')
+
+
+def secret_side(payload, capacity_bits):
+    """Returns the side of a square RGB secret holding about `payload` bytes, or None."""
+    if payload == 'full':
+        side = math.isqrt((capacity_bits - STREAM_OVERHEAD_BITS) // 24)
+    else:
+        side = max(1, math.isqrt(payload // 3))
+
+    def fits(side):
+        header = f"{side}x{side}".encode()
+        return STREAM_OVERHEAD_BITS + 16 + (len(header) + side * side * 3) * 8 <= capacity_bits
+
+    while side > 0 and not fits(side):
+        side -= 1
+    return side or None
+
+
+def prepare_inputs(workdir, megapixels, payload):
+    """Writes the carrier, secret and encoded files a case needs, reusing existing ones.
+
+    Returns a dict of file paths and the message, or None if the payload
+    does not fit the carrier.
+    """
+    width, height = carrier_size(megapixels)
+    capacity_bits = width * height * 3
+    message = text_message(payload, capacity_bits)
+    side = secret_side(payload, capacity_bits)
+    if message is None or side is None:
+        return None
+
+    tag = f"{megapixels}mp_{payload}"
+    paths = {
+        'carrier': os.path.join(workdir, f"carrier_{megapixels}mp.png"),
+        'secret': os.path.join(workdir, f"secret_{side}.png"),
+        'encoded_text': os.path.join(workdir, f"encoded_text_{tag}.png"),
+        'encoded_image': os.path.join(workdir, f"encoded_image_{tag}.png"),
+    }
+    rng = np.random.default_rng(0)
+    if not os.path.exists(paths['carrier']):
+        pixels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        Image.fromarray(pixels, "RGB").save(paths['carrier'], compress_level=1)
+    if not os.path.exists(paths['secret']):
+        pixels = rng.integers(0, 256, (side, side, 3), dtype=np.uint8)
+        Image.fromarray(pixels, "RGB").save(paths['secret'], compress_level=1)
+    if not os.path.exists(paths['encoded_text']):
+        stegoshield.encode_message(paths['carrier'], message).save(paths['encoded_text'], compress_level=1)
+    if not os.path.exists(paths['encoded_image']):
+        stegoshield.encode_image(paths['carrier'], paths['secret']).save(paths['encoded_image'], compress_level=1)
+    return {'paths': paths, 'message': message}
+
+
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def run_case(backend, operation, inputs, repeat):
+    """Runs one case in the current (fresh) process and returns its measurements."""
+    set_backend(backend)
+    paths, message = inputs['paths'], inputs['message']
+    calls = {
+        'encode_message': lambda: stegoshield.encode_message(paths['carrier'], message),
+        'decode_message': lambda: stegoshield.decode_message(paths['encoded_text']),
+        'encode_image': lambda: stegoshield.encode_image(paths['carrier'], paths['secret']),
+        'decode_image': lambda: stegoshield.decode_image(paths['encoded_image']),
+    }
+    call = calls[operation]
+    import_rss = peak_rss_mb()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    rss = peak_rss_mb()
+
+    # Tracing slows everything down, so allocations are measured on a separate call
+    tracemalloc.start()
+    call()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'seconds': min(timings),
+        'peak_rss_mb': round(rss, 1),
+        'rss_over_import_mb': round(rss - import_rss, 1),
+        'peak_alloc_mb': round(alloc_peak / 1e6, 1),
+    }
+
+
+def case_key(case):
+    return f"{case['backend']}/{case['operation']}/{case['megapixels']}mp/{case['payload']}"
+
+
+def compare(results, baseline, threshold):
+    """Returns a line for each case slower or larger than the baseline by more than `threshold`."""
+    previous = {case_key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = previous.get(case_key(case))
+        if not old:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            if case[metric] > old[metric] * (1 + threshold) and case[metric] - old[metric] > floor:
+                regressions.append(f"{case_key(case)}: {metric} {old[metric]:.3f} -> {case[metric]:.3f} "
+                                   f"(+{(case[metric] / max(old[metric], 1e-9) - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', choices=available_backends(), default=['numpy'],
+                        help="engine backends to run (the python one is a slow reference)")
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument('--megapixels', type=float, nargs='+', default=[0.1, 1, 12, 50])
+    parser.add_argument('--payloads', type=parse_size, nargs='+', default=['10', '1k', '64k', 'full'],
+                        help="payload sizes in bytes (suffix k or m), or 'full' for carrier capacity")
+    parser.add_argument('--quick', action='store_true', help="small grid for a fast smoke run")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'stegoshield-bench'),
+                        help="where generated inputs are kept between runs")
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="fraction a metric may grow over the baseline before failing")
+    args = parser.parse_args()
+    payloads = [parse_size(p) if isinstance(p, str) else p for p in args.payloads]
+    if args.quick:
+        args.megapixels, payloads, args.repeat = [0.1, 1], [10, 'full'], 1
+
+    os.makedirs(args.workdir, exist_ok=True)
+    results = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'cases': [],
+    }
+
+    print(f"{'case':<48} {'seconds':>9} {'rss MB':>8} {'alloc MB':>9}")
+    # A fresh process per case keeps peak RSS from one case out of the next
+    context = get_context('spawn')
+    for megapixels in args.megapixels:
+        for payload in payloads:
+            inputs = prepare_inputs(args.workdir, megapixels, payload)
+            if inputs is None:
+                continue
+            for operation in args.operations:
+                for backend in args.backends:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        measured = pool.submit(run_case, backend, operation, inputs, args.repeat).result()
+                    case = {'backend': backend, 'operation': operation, 'megapixels': megapixels,
+                            'payload': payload, **measured}
+                    results['cases'].append(case)
+                    print(f"{case_key(case):<48} {case['seconds']:>9.4f} "
+                          f"{case['peak_rss_mb']:>8.1f} {case['peak_alloc_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.threshold * 100:.0f}% against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""The StegoShield core shared by the desktop, web and full-stack apps.
+
+- stegoshield.steganography: encoding, decoding, probing and PNG output
+- stegoshield.steganalysis: screening any image for LSB steganography
+- stegoshield.backends: the bit-plane kernels the engine runs on
+- stegoshield.outputs: content-addressed storage for generated PNGs
+- stegoshield.constants: format settings that need no heavy imports
+- stegoshield.cli: the command-line tool, run as `python -m stegoshield`
+
+The public API can be imported from here directly. Submodules are only
+imported when one of their names is first used, so `import stegoshield`
+and the constants stay cheap, and NumPy and Pillow load with the engine.
+"""
+import importlib
+
+from .constants import TEXT_TYPE, IMAGE_TYPE, MAX_LSB_DEPTH, PNG_PROFILES
+
+_LAZY = {
+    'steganography': ('encode_message', 'encode_message_to_file', 'decode_message', 'encode_image',
+                      'encode_image_to_file', 'decode_image', 'save_png', 'png_compress_level', 'probe',
+                      'COMPRESSIONS'),
+    'steganalysis': ('analyze',),
+    'backends': ('available_backends', 'set_backend', 'backend_name'),
+    'outputs': ('OutputStore',),
+}
+_MODULE_OF = {name: module for module, names in _LAZY.items() for name in names}
+
+__all__ = ['TEXT_TYPE', 'IMAGE_TYPE', 'MAX_LSB_DEPTH', 'PNG_PROFILES', *_MODULE_OF]
+
+
+def __getattr__(name):
+    if name not in _MODULE_OF:
+        raise AttributeError(f"module 'stegoshield' has no attribute '{name}'")
+    value = getattr(importlib.import_module(f'.{_MODULE_OF[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
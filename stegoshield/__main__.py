@@ -0,0 +1,5 @@
+"""Runs the command-line tool: python -m stegoshield COMMAND PATH [PATH ...]"""
+from .cli import main
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Bit-plane kernels the engine runs on, chosen at runtime.
+
+Every backend is a module with the same two functions:
+
+write_lsbs(target, data, bit_offset=0, lsb_depth=1, progress=None)
+    Writes packed stream bits, from `bit_offset` on, into the low
+    `lsb_depth` bits of every value of `target`, a flat writable array of
+    uint8 or uint16 channel values. Each value takes the next `lsb_depth`
+    bits, most significant first; bits past the end of `data` are written
+    as zeros.
+
+read_lsbs(values, out, lsb_depth=1, progress=None)
+    Packs the low `lsb_depth` bits of every value of the flat array
+    `values`, most significant first, into the writable byte array `out`,
+    stopping when `out` is full.
+
+Both advance `progress`, if given, by the number of values handled, a
+chunk at a time. Backends must give bit-identical results; `python -m
+stegoshield.conformance` checks every available one against the
+pure-Python reference.
+
+The backend is picked on first use: the one named by set_backend() or the
+STEGOSHIELD_BACKEND environment variable, or else the first entry of
+BACKENDS that imports. An accelerated backend whose dependencies are
+missing is therefore skipped without any configuration.
+"""
+import importlib
+import os
+
+# Backend modules by name, in order of preference
+BACKENDS = {
+    'numpy': 'stegoshield.backends.numpy_backend',
+    'python': 'stegoshield.backends.python_backend',
+}
+
+# The backend every other one must agree with
+REFERENCE = 'python'
+
+BACKEND_ENV = 'STEGOSHIELD_BACKEND'
+
+_backend = None
+
+
+def load_backend(name):
+    """Imports a backend by name; raises ValueError for unknown names and ImportError if it is unavailable."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown engine backend '{name}'. Choose one of: {', '.join(BACKENDS)}.")
+    return importlib.import_module(BACKENDS[name])
+
+
+def available_backends():
+    """Returns the names of the backends that can be imported here, in order of preference."""
+    names = []
+    for name in BACKENDS:
+        try:
+            load_backend(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name):
+    """Makes the engine use the named backend from now on, or the default one again for None."""
+    global _backend
+    _backend = None if name is None else load_backend(name)
+
+
+def get_backend():
+    """Returns the backend module in use, picking it on the first call."""
+    global _backend
+    if _backend is None:
+        name = os.environ.get(BACKEND_ENV)
+        _backend = load_backend(name) if name else load_backend(available_backends()[0])
+    return _backend
+
+
+def backend_name():
+    """Returns the name of the backend in use."""
+    module = get_backend().__name__
+    return next(name for name, path in BACKENDS.items() if path == module)
@@ -0,0 +1,40 @@
+"""Bit-plane kernels vectorized with NumPy, a chunk of values at a time."""
+import numpy as np
+
+# Values handled per step, which bounds the temporary bit arrays
+CHUNK_VALUES = 8 << 20
+
+
+def write_lsbs(target, data, bit_offset=0, lsb_depth=1, progress=None):
+    for start in range(0, target.size, CHUNK_VALUES):
+        count = min(CHUNK_VALUES, target.size - start)
+        num_bits = count * lsb_depth
+        first = bit_offset + start * lsb_depth
+        chunk = data[first // 8:(first + num_bits + 7) // 8 + 1]
+        bits = np.unpackbits(chunk)[first % 8:first % 8 + num_bits]
+        if bits.size < num_bits:
+            bits = np.concatenate([bits, np.zeros(num_bits - bits.size, dtype=np.uint8)])
+        if lsb_depth > 1:
+            # Gather each group of `lsb_depth` bits into the low bits of a byte
+            bits = np.packbits(bits.reshape(-1, lsb_depth), axis=1).reshape(-1) >> (8 - lsb_depth)
+        part = target[start:start + count]
+        # Clear the low bit planes for this chunk, then write the payload bits
+        np.bitwise_and(part, part.dtype.type(np.iinfo(part.dtype).max ^ ((1 << lsb_depth) - 1)), out=part)
+        np.bitwise_or(part, bits, out=part, casting='unsafe')
+        if progress is not None:
+            progress.advance(count)
+
+
+def read_lsbs(values, out, lsb_depth=1, progress=None):
+    mask = (1 << lsb_depth) - 1
+    for start in range(0, values.size, CHUNK_VALUES):
+        count = min(CHUNK_VALUES, values.size - start)
+        bits = (values[start:start + count] & mask).astype(np.uint8, copy=False)
+        if lsb_depth > 1:
+            # Spread each value's low bits into `lsb_depth` separate bits
+            bits = np.unpackbits((bits << (8 - lsb_depth)).reshape(-1, 1), axis=1, count=lsb_depth).reshape(-1)
+        first_byte = start * lsb_depth // 8
+        chunk = np.packbits(bits)[:len(out) - first_byte]
+        out[first_byte:first_byte + chunk.size] = chunk
+        if progress is not None:
+            progress.advance(count)
@@ -0,0 +1,52 @@
+"""Bit-plane kernels in plain Python, one bit at a time.
+
+This is the reference the other backends are checked against. It needs
+nothing beyond the buffer protocol, and is far too slow for real carriers.
+"""
+
+# Values handled between progress reports
+CHUNK_VALUES = 1 << 16
+
+
+def _values(array):
+    """Returns a flat memoryview of an array's values, indexable as Python ints."""
+    view = memoryview(array)
+    # NumPy reports explicit byte orders such as '<H', which memoryview cannot index
+    return view.cast('B').cast(view.format.lstrip('<>=!@'))
+
+
+def write_lsbs(target, data, bit_offset=0, lsb_depth=1, progress=None):
+    values = _values(target)
+    data = bytes(data)
+    total_bits = 8 * len(data)
+    keep = ~((1 << lsb_depth) - 1)
+    bit = bit_offset
+    for index in range(len(values)):
+        low = 0
+        for _ in range(lsb_depth):
+            low <<= 1
+            if bit < total_bits:
+                low |= (data[bit >> 3] >> (7 - (bit & 7))) & 1
+            bit += 1
+        values[index] = (values[index] & keep) | low
+        if progress is not None and (index + 1) % CHUNK_VALUES == 0:
+            progress.advance(CHUNK_VALUES)
+    if progress is not None and len(values) % CHUNK_VALUES:
+        progress.advance(len(values) % CHUNK_VALUES)
+
+
+def read_lsbs(values, out, lsb_depth=1, progress=None):
+    values = _values(values)
+    out = _values(out)
+    num_bits = min(len(values) * lsb_depth, 8 * len(out))
+    byte = 0
+    for bit in range(num_bits):
+        value = values[bit // lsb_depth]
+        byte = (byte << 1) | ((value >> (lsb_depth - 1 - bit % lsb_depth)) & 1)
+        if bit % 8 == 7:
+            out[bit >> 3] = byte
+            byte = 0
+    if num_bits % 8:
+        out[num_bits >> 3] = byte << (8 - num_bits % 8)
+    if progress is not None and len(values):
+        progress.advance(len(values))
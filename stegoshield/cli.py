@@ -0,0 +1,251 @@
+"""Runs the StegoShield engine over many files from the command line.
+
+Inputs are files, directories (walked for images), glob patterns, or '-'
+to read one path per line from stdin. The files are processed on a process
+pool, and one JSON object per file is written to stdout as NDJSON, in input
+order with --ordered or else in the order the files finish. Outputs that
+are newer than their inputs are skipped unless --force is given, so an
+interrupted run can simply be repeated. A throughput summary goes to stderr
+at the end.
+
+Usage:
+    python -m stegoshield encode-text PATH [PATH ...] (--message TEXT | --message-file FILE) [--output-dir DIR]
+    python -m stegoshield decode-text PATH [PATH ...] [--output-dir DIR]
+    python -m stegoshield encode-image PATH [PATH ...] --secret IMAGE [--output-dir DIR]
+    python -m stegoshield decode-image PATH [PATH ...] [--output-dir DIR]
+    python -m stegoshield probe PATH [PATH ...]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from PIL import Image
+
+from .constants import MAX_LSB_DEPTH, PNG_PROFILES
+from .steganography import (COMPRESSIONS, decode_image, decode_message, encode_image_to_file,
+                            encode_message_to_file, png_compress_level, probe, save_png)
+
+EXTENSIONS = {'.png', '.bmp', '.tif', '.tiff', '.webp', '.gif', '.jpg', '.jpeg'}
+
+# Files handed to a worker at a time when probing; large enough that the
+# pool's own messaging stays small next to the probing
+CHUNK_SIZE = 64
+
+# Output file name for each command, from the input's name without its extension
+OUTPUT_NAMES = {
+    'encode-text': '{}_encoded.png',
+    'encode-image': '{}_encoded.png',
+    'decode-text': '{}.txt',
+    'decode-image': '{}_secret.png',
+}
+
+# Settings shared by every task, handed to each worker once instead of with every file
+_options = {}
+
+
+def _init_worker(options):
+    _options.update(options)
+
+
+def iter_files(paths, extensions):
+    """Yields every file under the given files and directories whose extension is in `extensions`."""
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in extensions:
+                    yield os.path.join(root, name)
+
+
+def iter_inputs(sources, extensions):
+    """Yields (path, name) for every input file; `name` is its path relative to the directory it was found in."""
+    for source in sources:
+        if source == '-':
+            paths = (line.strip() for line in sys.stdin)
+            yield from ((path, os.path.basename(path)) for path in paths if path)
+        elif any(c in source for c in '*?['):
+            for match in sorted(glob.glob(source, recursive=True)):
+                yield from iter_inputs([match], extensions)
+        elif os.path.isdir(source):
+            for path in iter_files([source], extensions):
+                yield path, os.path.relpath(path, source)
+        else:
+            yield source, os.path.basename(source)
+
+
+def output_path(command, path, name, output_dir):
+    """Returns where a command writes its result for an input, mirroring directory inputs under `output_dir`."""
+    stem = os.path.splitext(name)[0]
+    if output_dir is None:
+        stem = os.path.join(os.path.dirname(path), os.path.basename(stem))
+    else:
+        stem = os.path.join(output_dir, stem)
+    return OUTPUT_NAMES[command].format(stem)
+
+
+def up_to_date(output, inputs):
+    """Returns whether `output` exists and is at least as new as every file in `inputs`."""
+    try:
+        built = os.path.getmtime(output)
+        return all(os.path.getmtime(path) <= built for path in inputs)
+    except OSError:
+        return False
+
+
+def _write_output(output, write):
+    """Calls `write` with a temporary path next to `output`, then moves it into place.
+
+    An interrupted run therefore never leaves a partial file that a re-run
+    would take for an up-to-date one.
+    """
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    partial = output + '.part'
+    try:
+        write(partial)
+        os.replace(partial, output)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _write_text(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def run_task(task):
+    """Runs one command on one file and returns its NDJSON entry; failures get an 'error' entry."""
+    command, path, output = task
+    if output and not _options['force'] and up_to_date(output, [path, *_options['dependencies']]):
+        return {"path": path, "output": output, "skipped": True, "bytes": 0}
+    entry = {"path": path, "bytes": 0}
+    start = time.perf_counter()
+    try:
+        entry["bytes"] = os.path.getsize(path)
+        if command == 'probe':
+            entry.update(probe(path, _options['key']))
+        elif command == 'encode-text':
+            _write_output(output, lambda target: encode_message_to_file(
+                path, _options['message'], target, compression=_options['compression'],
+                lsb_depth=_options['lsb_depth'], compress_level=_options['compress_level'], key=_options['key']))
+        elif command == 'encode-image':
+            _write_output(output, lambda target: encode_image_to_file(
+                path, _options['secret'], target, compression=_options['compression'],
+                lsb_depth=_options['lsb_depth'], compress_level=_options['compress_level'], key=_options['key']))
+        elif command == 'decode-text':
+            message = decode_message(path, key=_options['key'])
+            _write_output(output, lambda target: _write_text(target, message))
+        else:
+            secret = decode_image(path, key=_options['key'])
+            _write_output(output, lambda target: save_png(secret, target, _options['compress_level']))
+        if output:
+            entry["output"] = output
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        entry["error"] = str(e)
+    entry["seconds"] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='stegoshield', description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_command(name, help_text, writes=True):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('paths', nargs='+', help="files, directories, glob patterns, or - for a list on stdin")
+        command.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="processes to run")
+        command.add_argument('--ordered', action='store_true', help="report results in input order")
+        command.add_argument('--extensions', nargs='+', default=sorted(EXTENSIONS),
+                             help="file extensions to process inside directories")
+        command.add_argument('--key', help="password that scatters the payload; decoding needs the same one")
+        if writes:
+            command.add_argument('--output-dir', help="write results here instead of next to each input")
+            command.add_argument('--force', action='store_true', help="redo files whose output is up to date")
+            command.add_argument('--compress-level', default='default',
+                                 help=f"PNG profile ({', '.join(PNG_PROFILES)}) or zlib level 0-9")
+        return command
+
+    for name, help_text in (('encode-text', "hide a message in each image"),
+                            ('encode-image', "hide a secret image in each image")):
+        command = add_command(name, help_text)
+        command.add_argument('--lsb-depth', type=int, choices=range(1, MAX_LSB_DEPTH + 1), default=1,
+                             help="low bits of each channel to use")
+        command.add_argument('--compression', choices=(*COMPRESSIONS, 'none'), default='zlib',
+                             help="codec for the payload, of those installed")
+        if name == 'encode-text':
+            message = command.add_mutually_exclusive_group(required=True)
+            message.add_argument('--message', help="the message to hide")
+            message.add_argument('--message-file', help="a UTF-8 file holding the message")
+        else:
+            command.add_argument('--secret', required=True, help="the image to hide")
+    add_command('decode-text', "extract the message from each image")
+    add_command('decode-image', "extract the secret image from each image")
+    add_command('probe', "check which images carry a payload, without decoding", writes=False)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    extensions = {e.lower() if e.startswith('.') else f".{e.lower()}" for e in args.extensions}
+    writes = args.command != 'probe'
+
+    options = {'force': getattr(args, 'force', False), 'dependencies': [], 'key': args.key or None}
+    if writes:
+        level = args.compress_level
+        options['compress_level'] = int(level) if level.isdigit() else level
+        try:
+            png_compress_level(options['compress_level'])
+        except ValueError as e:
+            parser.error(str(e))
+    if args.command.startswith('encode'):
+        options['lsb_depth'] = args.lsb_depth
+        options['compression'] = None if args.compression == 'none' else args.compression
+    if args.command == 'encode-text':
+        if args.message_file:
+            with open(args.message_file, encoding='utf-8') as f:
+                options['message'] = f.read()
+            options['dependencies'].append(args.message_file)
+        else:
+            options['message'] = args.message
+    elif args.command == 'encode-image':
+        options['secret'] = args.secret
+        options['dependencies'].append(args.secret)
+
+    # A command's own earlier outputs are never taken as inputs when it is re-run
+    own_outputs = OUTPUT_NAMES[args.command].format('') if writes else None
+    tasks = ((args.command, path, output_path(args.command, path, name, args.output_dir) if writes else None)
+             for path, name in iter_inputs(args.paths, extensions)
+             if not (own_outputs and path.endswith(own_outputs)))
+    processed = skipped = failed = 0
+    total_bytes = 0
+
+    # Probing reads only a header, so hand it out in chunks
+    chunk_size = 1 if writes else CHUNK_SIZE
+    start = time.perf_counter()
+    with Pool(args.workers, _init_worker, (options,)) as pool:
+        run = pool.imap if args.ordered else pool.imap_unordered
+        for entry in run(run_task, tasks, chunk_size):
+            skipped += entry.get("skipped", False)
+            processed += not entry.get("skipped", False)
+            failed += "error" in entry
+            total_bytes += entry["bytes"]
+            print(json.dumps(entry), flush=True)
+
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    print(f"{args.command}: {processed} images in {elapsed:.2f}s "
+          f"({processed / elapsed:.1f} images/s, {total_bytes / elapsed / 1e6:.1f} MB/s), "
+          f"{failed} failed, {skipped} up to date.", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Checks that every available engine backend gives bit-identical results.
+
+Each backend's kernels are run against the pure-Python reference on random
+8-bit and 16-bit channel values, at every LSB depth and at bit offsets off
+byte boundaries, with data too short to fill the values. Then
+messages and images are encoded through the public API with each backend,
+from carriers in memory and from PNG files on disk, which go through the
+PNG strip reader and writer and the passthrough of rows past the payload:
+the PNG files must match byte for byte and decode the same everywhere.
+
+Usage: python -m stegoshield.conformance [--backends NAME ...] [--seed N]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from .backends import REFERENCE, available_backends, backend_name, load_backend, set_backend
+from .constants import MAX_LSB_DEPTH
+from .steganography import decode_image, decode_message, encode_image_to_file, encode_message_to_file
+
+# Channel values per kernel case; odd, so the last byte read is a partial one
+KERNEL_VALUES = 1001
+
+# Carrier modes, depths and scatter keys the public API is checked with
+API_CASES = [('RGB', 1, None), ('RGB', 3, None), ('RGBA', 1, None), ('L', 2, None), ('I;16', 4, None),
+             ('RGBA', 1, 'conformance'), ('I;16', 2, b'conformance')]
+
+
+def check_kernels(name, rng):
+    """Compares a backend's write_lsbs and read_lsbs with the reference; returns the failed cases."""
+    backend, reference = load_backend(name), load_backend(REFERENCE)
+    failures = []
+    for dtype in (np.uint8, np.uint16):
+        for lsb_depth in range(1, MAX_LSB_DEPTH + 1):
+            for bit_offset in (0, 3, 13):
+                case = f"{np.dtype(dtype).name} depth {lsb_depth} offset {bit_offset}"
+                values = rng.integers(0, np.iinfo(dtype).max, KERNEL_VALUES, dtype=dtype, endpoint=True)
+                data = rng.integers(0, 256, KERNEL_VALUES * lsb_depth // 16, dtype=np.uint8)
+                expected, written = values.copy(), values.copy()
+                reference.write_lsbs(expected, data, bit_offset, lsb_depth)
+                backend.write_lsbs(written, data, bit_offset, lsb_depth)
+                if not np.array_equal(expected, written):
+                    failures.append(f"write_lsbs {case}")
+                    continue
+                for out_bytes in (KERNEL_VALUES * lsb_depth // 8, -(-KERNEL_VALUES * lsb_depth // 8), 7):
+                    expected_out = np.zeros(out_bytes, dtype=np.uint8)
+                    out = np.zeros(out_bytes, dtype=np.uint8)
+                    reference.read_lsbs(written, expected_out, lsb_depth)
+                    backend.read_lsbs(written, out, lsb_depth)
+                    if not np.array_equal(expected_out, out):
+                        failures.append(f"read_lsbs {case} into {out_bytes} bytes")
+    return failures
+
+
+def _carrier(mode, rng, size=(80, 60)):
+    if mode == 'I;16':
+        return Image.fromarray(rng.integers(0, 65536, size[::-1], dtype=np.uint16))
+    channels = len(Image.new(mode, (1, 1)).getbands())
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], channels), dtype=np.uint8).squeeze(), mode)
+
+
+def _output_bytes(output):
+    if isinstance(output, io.BytesIO):
+        return output.getvalue()
+    with open(output, 'rb') as f:
+        return f.read()
+
+
+def check_api(name, rng):
+    """Encodes and decodes through the public API with a backend and the reference; returns the failed cases."""
+    message = ''.join(chr(c) for c in rng.integers(32, 0x3000, 200))
+    secret = _carrier('RGB', rng, (12, 9))
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='stegoshield-conformance-') as directory:
+        for mode, lsb_depth, key in API_CASES:
+            image = _carrier(mode, rng)
+            carrier_path = os.path.join(directory, 'carrier.png')
+            image.save(carrier_path)
+            for source, carrier in (('memory', image), ('file', carrier_path)):
+                encodes = [('message', lambda out: encode_message_to_file(carrier, message, out, lsb_depth=lsb_depth,
+                                                                          key=key),
+                            decode_message, lambda decoded: decoded == message),
+                           ('image', lambda out: encode_image_to_file(carrier, secret, out, lsb_depth=lsb_depth,
+                                                                      key=key),
+                            decode_image, lambda decoded: np.array_equal(np.asarray(decoded), np.asarray(secret)))]
+                for label, encode, decode, matches in encodes:
+                    case = f"{label} in {mode} from {source} at depth {lsb_depth}{' with a key' if key else ''}"
+                    outputs = {}
+                    for index, backend in enumerate((REFERENCE, name)):
+                        set_backend(backend)
+                        outputs[backend] = (io.BytesIO() if source == 'memory'
+                                            else os.path.join(directory, f'output-{index}.png'))
+                        encode(outputs[backend])
+                    if _output_bytes(outputs[REFERENCE]) != _output_bytes(outputs[name]):
+                        failures.append(f"encoded {case}")
+                        continue
+                    for backend in (REFERENCE, name):
+                        set_backend(backend)
+                        try:
+                            decoded_ok = matches(decode(outputs[name], key=key))
+                        except ValueError:
+                            decoded_ok = False
+                        if not decoded_ok:
+                            failures.append(f"decoded {case} with {backend}")
+    return failures
+
+
+def check_backend(name, seed=0):
+    """Runs every check on one backend and returns the failed cases; the backend in use is left unchanged."""
+    in_use = backend_name()
+    try:
+        return check_kernels(name, np.random.default_rng(seed)) + check_api(name, np.random.default_rng(seed))
+    finally:
+        set_backend(in_use)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', nargs='+', help="backends to check (default: every available one)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    for name in args.backends or available_backends():
+        failures = check_backend(name, args.seed)
+        failed = failed or bool(failures)
+        print(f"{name}: {'ok' if not failures else 'FAILED'}")
+        for failure in failures:
+            print(f"  {failure}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
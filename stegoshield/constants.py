@@ -0,0 +1,17 @@
+"""Settings of the StegoShield format that apps need before the engine is loaded.
+
+Nothing here imports NumPy or Pillow, so apps can build their forms and
+menus from these values while the engine itself is still unloaded.
+"""
+
+# Payload types, stored in the container header (legacy streams keep them
+# as the bit after their 32-bit length prefix)
+TEXT_TYPE = 0
+IMAGE_TYPE = 1
+
+# Low bits per channel the payload may use
+MAX_LSB_DEPTH = 4
+
+# zlib levels for PNG output by profile name: 'fast' for interactive use and
+# 'small' for archival copies. Any level from 0 to 9 may be given instead.
+PNG_PROFILES = {'fast': 1, 'default': 6, 'small': 9}
@@ -0,0 +1,127 @@
+"""Content-addressed storage for generated PNG outputs.
+
+Each output is stored once, under the SHA-256 hex digest of its bytes. The
+digest names the file, serves as its strong ETag and forms its URL, so a
+URL always means the same bytes: responses can be cached as immutable and
+an interrupted download can be resumed with a Range request. Identical
+outputs share one file. Once the directory holds more than `max_bytes`,
+the least recently used files are removed.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# Bytes hashed and copied per read
+_COPY_BYTES = 1 << 20
+
+_DIGEST = re.compile(r'[0-9a-f]{64}')
+
+
+class OutputStore:
+    """Keeps output files in `directory`, named by their SHA-256 digest plus `suffix`."""
+
+    def __init__(self, directory, max_bytes, suffix='.png'):
+        # Absolute, so the paths handed out stay valid whatever resolves them
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def put(self, stream):
+        """Stores the whole of a binary file object and returns its digest; the stream is left at its end."""
+        digest = hashlib.sha256()
+        stream.seek(0)
+        # Copy to a temporary name first so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in iter(lambda: stream.read(_COPY_BYTES), b''):
+                    digest.update(block)
+                    f.write(block)
+            return self._add(temp_path, digest.hexdigest())
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @contextmanager
+    def temp_path(self):
+        """Yields a temporary path in the store to write an output to before `put_file`.
+
+        Whatever is left at the path, such as the partial output of a failed
+        encode, is removed on exit.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix=self.suffix)
+        os.close(fd)
+        try:
+            yield temp_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def put_file(self, path):
+        """Moves a finished file into the store and returns its digest."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_COPY_BYTES), b''):
+                digest.update(block)
+        return self._add(path, digest.hexdigest())
+
+    def path(self, digest):
+        """Returns the file stored under `digest`, or None if it is malformed, unknown or evicted."""
+        if not _DIGEST.fullmatch(digest):
+            return None
+        path = self._path(digest)
+        try:
+            # Refresh the file's age so eviction is least-recently-used
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def _path(self, digest):
+        return os.path.join(self.directory, digest + self.suffix)
+
+    def _add(self, path, digest):
+        target = self._path(digest)
+        if os.path.exists(target):
+            # Same digest, same bytes: keep the stored copy and just mark it used
+            os.utime(target)
+            os.remove(path)
+        else:
+            try:
+                os.replace(path, target)
+            except OSError:
+                # Another filesystem; copy next to the target and rename that into place
+                fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+                os.close(fd)
+                shutil.move(path, temp_path)
+                os.replace(temp_path, target)
+        self._evict(keep=target)
+        return digest
+
+    def _evict(self, keep):
+        with self._lock:
+            files = []
+            for entry in os.scandir(self.directory):
+                if entry.name.startswith('.tmp-') or entry.path == keep:
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in files) + os.path.getsize(keep)
+            for _, size, path in sorted(files):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    # Responses already reading the file keep their open handles
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
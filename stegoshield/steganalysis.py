@@ -0,0 +1,280 @@
+"""Detects LSB steganography in images, whichever tool embedded it.
+
+Three standard attacks are run on every colour channel:
+
+- Chi-square (Westfeld and Pfitzmann): embedding random bits evens out the
+  counts of each pair of values 2k and 2k + 1. The result is the
+  probability that the pairs are as even as embedding makes them, over the
+  whole channel and over growing shares of it from the top, since
+  sequential embedders fill the first rows first.
+- RS analysis (Fridrich, Goljan and Du): compares how flipping LSBs changes
+  the smoothness of small pixel groups in the image and in the image with
+  every LSB flipped, and estimates the share of LSBs that carry a message.
+- Sample pair analysis (Dumitrescu, Wu and Wang): estimates the same share
+  from how pairs of neighbouring values are distributed.
+
+Everything is computed with NumPy over whole channels, or over a random
+sample of row bands for a faster, rougher answer.
+"""
+import math
+import time
+
+import numpy as np
+from PIL import Image
+
+# An estimated embedding rate above this, or a chi-square probability above
+# CHI_SQUARE_THRESHOLD, marks a channel as suspicious
+RATE_THRESHOLD = 0.1
+CHI_SQUARE_THRESHOLD = 0.95
+
+# Shares of a channel, from the top, that the chi-square profile covers
+PROFILE_STEPS = 10
+
+# Rows per band when sampling
+BAND_ROWS = 32
+
+# Value pairs whose expected count is below this are left out of the
+# chi-square statistic, the usual rule for the test to be valid
+_MIN_EXPECTED = 5
+
+# Pixels per RS group, and which of them the mask flips
+_RS_MASK = np.array([0, 1, 1, 0], dtype=bool)
+
+_CHANNEL_NAMES = {'L': ('L',), 'RGB': ('R', 'G', 'B'), 'I;16': ('L',)}
+
+
+def _open(source):
+    """Opens a path, binary file object or PIL image and returns it in a mode the attacks understand."""
+    if not isinstance(source, Image.Image):
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        source = Image.open(source)
+    if source.mode in ('I;16', 'I;16L', 'I;16B', 'I'):
+        return source if source.mode == 'I;16' else source.convert('I;16')
+    if source.mode in ('1', 'L', 'LA', 'La'):
+        return source.convert('L') if source.mode != 'L' else source
+    return source.convert('RGB') if source.mode != 'RGB' else source
+
+
+def _sample_bands(pixels, sample, rng):
+    """Keeps a random `sample` share of BAND_ROWS-row bands, in their original order."""
+    num_bands = -(-pixels.shape[0] // BAND_ROWS)
+    keep = max(1, round(num_bands * sample))
+    if keep >= num_bands:
+        return pixels
+    bands = np.sort(rng.choice(num_bands, keep, replace=False))
+    return np.concatenate([pixels[b * BAND_ROWS:(b + 1) * BAND_ROWS] for b in bands])
+
+
+def _chi_square_survival(statistic, dof):
+    """Returns P(X >= statistic) for a chi-square variable with `dof` degrees of freedom."""
+    a, x = dof / 2, statistic / 2
+    if x <= 0:
+        return 1.0
+    log_front = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower incomplete gamma function
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-12:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_front))
+    # Continued fraction for the upper one (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c, d = 1 / tiny, 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-12:
+            break
+    return min(1.0, h * math.exp(log_front))
+
+
+def _chi_square(histogram):
+    """Returns the chi-square embedding probability for a histogram of values."""
+    even, odd = histogram[0::2], histogram[1::2]
+    expected = (even + odd) / 2
+    used = expected >= _MIN_EXPECTED
+    if used.sum() < 2:
+        return 0.0
+    statistic = float((((even - expected)[used]) ** 2 / expected[used]).sum())
+    return _chi_square_survival(statistic, int(used.sum()) - 1)
+
+
+def chi_square(values, levels=256):
+    """Runs the chi-square attack on a 2-D channel.
+
+    Returns the probability over the whole channel and a profile of the
+    probabilities over the first 1/PROFILE_STEPS, 2/PROFILE_STEPS, ... of
+    its rows.
+    """
+    rows = values.shape[0]
+    edges = [0] + [max(1, round(rows * (i + 1) / PROFILE_STEPS)) for i in range(PROFILE_STEPS)]
+    # One histogram per profile step, then running totals
+    histograms = np.array([np.bincount(values[a:b].reshape(-1), minlength=levels)[:levels]
+                           for a, b in zip(edges, edges[1:])])
+    profile = [round(_chi_square(h), 4) for h in histograms.cumsum(axis=0)]
+    return profile[-1], profile
+
+
+def _smaller_root(a, b, c):
+    """Returns the root of a*z^2 + b*z + c with the smaller magnitude, or None if there is none."""
+    if abs(a) < 1e-12:
+        return -c / b if abs(b) > 1e-12 else None
+    discriminant = b * b - 4 * a * c
+    if discriminant < 0:
+        # Near full embedding the two roots meet and noise can push them apart
+        # into complex values; their shared real part is still the estimate
+        if discriminant < -0.05 * b * b:
+            return None
+        discriminant = 0.0
+    root = math.sqrt(discriminant)
+    return min((-b + root) / (2 * a), (-b - root) / (2 * a), key=abs)
+
+
+def _rs_tables():
+    """Builds the lookup tables for RS analysis of 8-bit channels.
+
+    A group's change in smoothness under a flip is the sum of the changes in
+    its three neighbour differences, and each of those depends on one pair of
+    values. The tables map a pair, read from memory as a little-endian
+    16-bit code, to its change + 2 under F1 and F-1 on the channel and on the
+    channel with every LSB flipped, packed as four 4-bit lanes.
+    """
+    code = np.arange(65536)
+    first, second = code & 255, code >> 8
+    tables = [np.zeros(65536, dtype=np.uint16) for _ in range(3)]
+    flips = [lambda x: x ^ 1, lambda x: ((x + 1) ^ 1) - 1]
+    for lane, (inverted, flip) in enumerate((i, f) for i in (0, 1) for f in flips):
+        a, b = (first ^ 1, second ^ 1) if inverted else (first, second)
+        unchanged = np.abs(b - a)
+        # The mask flips the middle two pixels: the second value of the first
+        # pair, both of the middle pair and the first of the last
+        changes = (np.abs(flip(b) - a), np.abs(flip(b) - flip(a)), np.abs(b - flip(a)))
+        for table, changed in zip(tables, changes):
+            table |= ((changed - unchanged + 2) << (4 * lane)).astype(np.uint16)
+    lanes = (code[:, None] >> (4 * np.arange(4))) & 15
+    # Three pairs of changes + 2 sum to 6 when the smoothness is unchanged
+    return tables, (lanes > 6).astype(np.int64) - (lanes < 6)
+
+
+_RS_TABLES, _RS_SIGNS = _rs_tables()
+
+
+def _rs_counts(groups):
+    """Returns (R_M - S_M, R_-M - S_-M) for an (N, 4) array of pixel groups."""
+    def smoothness(g):
+        return np.abs(np.diff(g, axis=1)).sum(axis=1)
+
+    base = smoothness(groups)
+    flipped = groups.copy()
+    flipped[:, _RS_MASK] ^= 1
+    shifted = groups.copy()
+    # F-1 swaps -1 and 0, 1 and 2, 3 and 4, ...
+    shifted[:, _RS_MASK] = ((shifted[:, _RS_MASK] + 1) ^ 1) - 1
+    differences = []
+    for changed in (smoothness(flipped), smoothness(shifted)):
+        differences.append((np.count_nonzero(changed > base) - np.count_nonzero(changed < base)) / len(groups))
+    return differences
+
+
+def _rs_counts_8bit(values):
+    """Returns the four RS differences of an 8-bit channel from the lookup tables."""
+    flat = np.ascontiguousarray(values).reshape(-1)
+    num_groups = flat.size // len(_RS_MASK)
+    pairs = [np.ndarray((num_groups,), '<u2', flat, offset, (len(_RS_MASK),)) for offset in (0, 1, 2)]
+    total = _RS_TABLES[0][pairs[0]]
+    total += _RS_TABLES[1][pairs[1]]
+    total += _RS_TABLES[2][pairs[2]]
+    return np.bincount(total, minlength=65536) @ _RS_SIGNS / num_groups
+
+
+def rs_analysis(values):
+    """Estimates the share of a 2-D channel's LSBs that carry a message, by RS analysis."""
+    width = values.shape[1] // len(_RS_MASK) * len(_RS_MASK)
+    if width == 0:
+        return None
+    if values.dtype == np.uint8:
+        d0, dn0, d1, dn1 = _rs_counts_8bit(values[:, :width])
+    else:
+        groups = values[:, :width].astype(np.int32).reshape(-1, len(_RS_MASK))
+        d0, dn0 = _rs_counts(groups)
+        d1, dn1 = _rs_counts(groups ^ 1)
+    z = _smaller_root(2 * (d1 + d0), dn0 - dn1 - d1 - 3 * d0, d0 - dn0)
+    if z is None or z == 0.5:
+        return None
+    return z / (z - 0.5)
+
+
+def sample_pair_analysis(values):
+    """Estimates the share of a 2-D channel's LSBs that carry a message, by sample pair analysis."""
+    if values.shape[1] < 2:
+        return None
+    u, v = values[:, :-1], values[:, 1:]
+    v_odd = (v & 1).astype(bool)
+    x = np.count_nonzero((u < v) & ~v_odd) + np.count_nonzero((u > v) & v_odd)
+    y = u.size - np.count_nonzero(u == v) - x
+    k = np.count_nonzero((u >> 1) == (v >> 1))
+    if k == 0:
+        return None
+    beta = _smaller_root(2 * k, 2 * (2 * x - u.size), y - x)
+    return None if beta is None else 2 * beta
+
+
+def analyze(image, sample=None, seed=0):
+    """Screens an image for LSB steganography.
+
+    `image` is a path, binary file object or PIL image. With `sample`
+    between 0 and 1, only that share of row bands is analysed. Returns a
+    dict with each channel's chi-square probability and profile and its RS
+    and SPA rate estimates, the overall 'rate' (the largest estimate), the
+    'suspicious' verdict and the 'seconds' the analysis took.
+    """
+    start = time.perf_counter()
+    img = _open(image)
+    pixels = np.asarray(img)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    if sample is not None:
+        if not 0 < sample <= 1:
+            raise ValueError("Sample must be a share between 0 and 1.")
+        pixels = _sample_bands(pixels, sample, np.random.default_rng(seed))
+    levels = 65536 if img.mode == 'I;16' else 256
+
+    channels = {}
+    for index, name in enumerate(_CHANNEL_NAMES[img.mode]):
+        values = np.ascontiguousarray(pixels[:, :, index])
+        probability, profile = chi_square(values, levels)
+        rs = rs_analysis(values)
+        spa = sample_pair_analysis(values)
+        channels[name] = {
+            "chi_square": round(probability, 4),
+            "chi_square_profile": profile,
+            "rs": None if rs is None else round(float(rs), 4),
+            "spa": None if spa is None else round(float(spa), 4),
+        }
+
+    estimates = [e for c in channels.values() for e in (c["rs"], c["spa"]) if e is not None]
+    rate = max(estimates, default=0.0)
+    chi = max(max(c["chi_square_profile"]) for c in channels.values())
+    return {
+        "width": img.width,
+        "height": img.height,
+        "mode": img.mode,
+        "sampled": 1.0 if sample is None else sample,
+        "channels": channels,
+        "rate": round(max(0.0, min(1.0, rate)), 4),
+        "suspicious": rate > RATE_THRESHOLD or chi > CHI_SQUARE_THRESHOLD,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
@@ -0,0 +1,1330 @@
+import hashlib
+import io
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+import numpy as np
+from PIL import Image
+from base64 import b64encode, b64decode
+
+from .backends import get_backend
+from .constants import TEXT_TYPE, IMAGE_TYPE, MAX_LSB_DEPTH, PNG_PROFILES
+
+try:
+    import lzma
+except ImportError:  # Python built without liblzma
+    lzma = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Container header written at the start of every new payload, one bit per
+# colour value: [Magic] + [Version] + [Type] + [Flags] + [Body Length in
+# bytes] + [CRC32 of Body]. The flags hold the depth minus one in their low
+# two bits and _FLAG_ALPHA when the body also uses the alpha channel, which
+# only images from earlier versions do.
+_MAGIC = b'SGSH'
+_VERSION = 2
+_HEADER = struct.Struct('>4sBBBII')
+_HEADER_BITS = 8 * _HEADER.size
+_FLAGS_BYTE = 6
+_DEPTH_MASK = 0x03
+_FLAG_ALPHA = 0x04
+
+# Images without the magic are read as the legacy format, which starts with
+# a 32-bit length prefix instead: [Depth - 1 (2b)] + [Alpha (1b)] +
+# [Payload Bits (29b)]. Legacy payload lengths are always 1 more than a
+# multiple of 8, which the last byte of the magic never is, so the two
+# formats cannot be confused.
+_PREFIX_BITS = 32
+_ALPHA_FLAG = 1 << 29
+_LENGTH_MASK = _ALPHA_FLAG - 1
+
+# Bytes of a legacy body checked before the rest of it is extracted, enough
+# to cover the longest image header
+_LEGACY_PEEK_BYTES = 24
+_BASE64_BYTES = frozenset(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/=')
+_IMAGE_HEADER_BYTES = frozenset(b'0123456789x;png')
+
+# Formats that can never hold a payload, so decoding does not even start on them
+_LOSSY_FORMATS = {'JPEG', 'MPO'}
+
+# Carrier modes the engine works on natively, as (channels per pixel, colour
+# channels before any alpha). Other modes are converted to the nearest one.
+_MODE_LAYOUTS = {'RGB': (3, 3), 'RGBA': (4, 3), 'L': (1, 1), 'LA': (2, 1), 'I;16': (1, 1)}
+
+# Payloads shorter than this many bits are always handled on the calling thread
+_PARALLEL_MIN_BITS = 8 << 20
+
+# Keyed streams: rounds of the Feistel network that orders the slots, the
+# personalisation string the key is hashed with, and slots placed per step:
+# enough to amortise the per-step overhead, while the index arrays stay a
+# few megabytes that are reused rather than freshly paged in
+_SCATTER_ROUNDS = 4
+_SCATTER_PERSON = b'StegoShield'
+_SCATTER_CHUNK_SLOTS = 1 << 18
+
+# Target size of a strip of carrier rows when streaming an image
+_STRIP_BYTES = 4 << 20
+
+# With several workers, PNG output is deflated in independent blocks of this
+# many input bytes, each primed with the last window of input before it
+_DEFLATE_BLOCK_BYTES = 1 << 20
+_DEFLATE_WINDOW = 32 * 1024
+
+# PNG output at this zlib level and above tries all five row filters
+_FULL_FILTER_LEVEL = 6
+
+# Codec ids for compressed text bodies, by compression name. Codecs whose
+# module is not installed are left out.
+_RAW_CODEC = 0
+_COMPRESSORS = {'zlib': (1, lambda data: zlib.compress(data, 9))}
+_DECOMPRESSORS = {1: zlib.decompress}
+if lzma:
+    _COMPRESSORS['lzma'] = (2, lambda data: lzma.compress(data, preset=9))
+    _DECOMPRESSORS[2] = lzma.decompress
+if zstandard:
+    _COMPRESSORS['zstd'] = (3, lambda data: zstandard.ZstdCompressor(level=19).compress(data))
+    _DECOMPRESSORS[3] = lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)
+
+# Names of the codecs that can compress a payload here, the optional ones
+# only when installed
+COMPRESSIONS = tuple(_COMPRESSORS)
+
+# First byte of a compressed text body. Legacy text bodies are base64, which
+# never contains a zero byte.
+_COMPRESSED_TEXT_MARKER = 0x00
+
+# Header suffix marking an image body stored as a PNG byte stream, and the
+# zlib level it is written with. Higher levels are several times slower for
+# only a few percent less data.
+_PNG_BODY_FORMAT = 'png'
+_PNG_BODY_LEVEL = 3
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Samples per pixel for each PNG colour type
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# --- Payload Layer ---
+# The embedded stream is [Header] + [Body], where the body is a whole number
+# of bytes. The stream is kept packed, 8 bits per byte, from the moment it is
+# built until it is written into the carrier. Legacy streams are
+# [Length (32b)] + [Type (1b)] + [Body] instead.
+#
+# A text body is either the base64 form of the message (legacy) or
+# [0x00] + [Codec (8b)] + [UTF-8 message, compressed by the codec]. An image
+# body is [Header Len (16b)] + [Header] + [Data], where the header is "WxH"
+# followed by raw RGB pixels (legacy) or "WxH;png" followed by a PNG file.
+
+def _check_depth(lsb_depth):
+    if not isinstance(lsb_depth, int) or not 1 <= lsb_depth <= MAX_LSB_DEPTH:
+        raise ValueError(f"LSB depth must be between 1 and {MAX_LSB_DEPTH}.")
+
+def _build_stream(payload_type, *parts, lsb_depth=1):
+    """Packs a payload type and body parts into a stream with a container header.
+
+    Returns the packed stream and the number of bits in it. The alpha flag
+    is left clear; it is set when the stream is embedded, once the carrier's
+    layout is known.
+    """
+    _check_depth(lsb_depth)
+    body = b''.join(parts)
+    stream = bytearray(_HEADER.pack(_MAGIC, _VERSION, payload_type, lsb_depth - 1, len(body), zlib.crc32(body)))
+    stream += body
+    return stream, 8 * len(stream)
+
+def _parse_header(header, label):
+    """Checks a container header and returns (type, lsb_depth, alpha, body_length, crc)."""
+    _, version, payload_type, flags, body_length, crc = _HEADER.unpack(header)
+    if version != _VERSION:
+        raise ValueError(f"Cannot extract {label.lower()}: unsupported StegoShield format version {version}.")
+    if payload_type not in (TEXT_TYPE, IMAGE_TYPE) or flags & ~(_DEPTH_MASK | _FLAG_ALPHA):
+        raise ValueError(f"{label} data is corrupt or incomplete.")
+    return payload_type, (flags & _DEPTH_MASK) + 1, bool(flags & _FLAG_ALPHA), body_length, crc
+
+def _parse_stream(packed):
+    """Splits packed legacy [Type] + [Body] bits into the type bit and body bytes."""
+    data = np.frombuffer(packed, dtype=np.uint8)
+    body = ((data[:-1] << 1) | (data[1:] >> 7)).astype(np.uint8)
+    return int(data[0] >> 7), memoryview(body)
+
+def _plausible_legacy_body(type_bit, head):
+    """Whether the first bytes of a legacy body could begin a real payload.
+
+    Random carriers pass the legacy length checks often enough that their
+    claimed payload is checked this way before all of it is extracted.
+    """
+    head = bytes(head)
+    if type_bit == TEXT_TYPE:
+        if head[:1] == bytes((_COMPRESSED_TEXT_MARKER,)):
+            # Codec ids this format defines, installed or not
+            return len(head) < 2 or head[1] <= 3
+        return set(head) <= _BASE64_BYTES
+    header_len = int.from_bytes(head[:2], 'big')
+    header = head[2:2 + header_len // 8]
+    return (header_len % 8 == 0 and 3 <= header_len // 8 <= _LEGACY_PEEK_BYTES - 2
+            and set(header) <= _IMAGE_HEADER_BYTES)
+
+def _compressor(compression):
+    """Looks up the codec id and compress function for a compression name."""
+    try:
+        return _COMPRESSORS[compression]
+    except KeyError:
+        raise ValueError(f"Unsupported compression '{compression}'. "
+                         f"Available: {', '.join(_COMPRESSORS)}.")
+
+def _text_parts(message, compression='zlib'):
+    """Builds the body for a text payload.
+
+    With a compression name the body holds the compressed UTF-8 message, or
+    the plain UTF-8 message when compressing would not shrink it. With
+    `compression=None` it is the legacy base64 form of the message.
+    """
+    if compression is None:
+        return (b64encode(message.encode()),)
+
+    codec, compress = _compressor(compression)
+    data = message.encode('utf-8')
+    compressed = compress(data)
+    if len(compressed) < len(data):
+        return bytes((_COMPRESSED_TEXT_MARKER, codec)), compressed
+    return bytes((_COMPRESSED_TEXT_MARKER, _RAW_CODEC)), data
+
+def _read_text_body(body):
+    """Rebuilds the message from a text payload body."""
+    if len(body) < 2 or body[0] != _COMPRESSED_TEXT_MARKER:
+        return b64decode(body).decode()
+
+    codec = body[1]
+    if codec != _RAW_CODEC and codec not in _DECOMPRESSORS:
+        raise ValueError("Message was compressed with a codec that is not installed.")
+    try:
+        data = bytes(body[2:])
+        if codec != _RAW_CODEC:
+            data = _DECOMPRESSORS[codec](data)
+        return data.decode('utf-8')
+    except Exception:
+        raise ValueError("Message data is corrupt or incomplete.")
+
+def _image_parts(secret_img, compression='zlib'):
+    """Builds the body for an image payload: [Header Len (16b)] + [Header] + [Data].
+
+    With a compression name the data is the secret image as a PNG file,
+    unless that is no smaller than the raw RGB pixels the legacy body holds.
+    """
+    w, h = secret_img.size
+    header = f"{w}x{h}"
+    data = None
+    if compression is not None:
+        _compressor(compression)
+        buffer = io.BytesIO()
+        secret_img.save(buffer, "PNG", compress_level=_PNG_BODY_LEVEL)
+        if buffer.tell() < w * h * 3:
+            header += f";{_PNG_BODY_FORMAT}"
+            data = buffer.getbuffer()
+    if data is None:
+        data = secret_img.tobytes()
+    header = header.encode('ascii')
+    header_len = (8 * len(header)).to_bytes(2, 'big')
+    return header_len, header, data
+
+def _read_image_body(body):
+    """Rebuilds the secret image from an image payload body."""
+    try:
+        header_len = int.from_bytes(body[0:2], 'big')
+        if header_len % 8:
+            raise ValueError
+        header_end = 2 + header_len // 8
+        raw_header = bytes(body[2:header_end]).decode('ascii')
+        size, _, body_format = raw_header.partition(';')
+        w_str, h_str = size.split('x')
+        w, h = int(w_str), int(h_str)
+        if body_format not in ('', _PNG_BODY_FORMAT):
+            raise ValueError
+    except (ValueError, IndexError, UnicodeDecodeError):
+        raise ValueError("Image header data is corrupt.")
+
+    if body_format == _PNG_BODY_FORMAT:
+        try:
+            secret_img = Image.open(io.BytesIO(body[header_end:]))
+            secret_img.load()
+        except Exception:
+            raise ValueError("Image data is corrupt or incomplete.")
+        if secret_img.size != (w, h):
+            raise ValueError("Image data does not match its header.")
+        return secret_img.convert("RGB")
+
+    expected_pixel_bytes = w * h * 3
+    pixels = body[header_end:header_end + expected_pixel_bytes]
+    if len(pixels) < expected_pixel_bytes:
+        raise ValueError(f"Image pixel data is incomplete. Expected {expected_pixel_bytes * 8} bits, found {len(pixels) * 8}.")
+
+    return Image.frombytes("RGB", (w, h), pixels)
+
+# --- Image Sources ---
+# Wherever the public functions take an image they accept a file path, a
+# seekable binary file object (such as an upload stream or BytesIO) or an
+# already opened PIL image. Outputs accept a path or a writable file object.
+
+def _open_image(source):
+    """Opens a path, binary file object or PIL image as a PIL image."""
+    if isinstance(source, Image.Image):
+        return source
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return Image.open(source)
+
+def _working_mode(img):
+    """Returns the native carrier mode an image is embedded in."""
+    if img.mode in _MODE_LAYOUTS:
+        return img.mode
+    if img.mode == '1':
+        return 'L'
+    if img.mode in ('I', 'I;16L', 'I;16B'):
+        return 'I;16'
+    if img.mode == 'La':
+        return 'LA'
+    if img.mode in ('PA', 'RGBa') or (img.mode == 'P' and 'transparency' in img.info):
+        return 'RGBA'
+    return 'RGB'
+
+def _working_image(img):
+    """Returns an image in its native carrier mode, converting only when it is not one already."""
+    mode = _working_mode(img)
+    return img if img.mode == mode else img.convert(mode)
+
+@contextmanager
+def _open_binary(source, mode='rb'):
+    """Yields a binary file object for a path, or the given file object itself."""
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        with open(source, mode) as fp:
+            yield fp
+    else:
+        if 'r' in mode:
+            source.seek(0)
+        yield source
+
+# --- Strip I/O ---
+# Decoding only needs the pixels the payload occupies, which for a short
+# message is a few rows at the top of the carrier, and encoding only changes
+# those rows. PNG carriers are therefore read and written a strip of rows at
+# a time instead of being decoded whole.
+
+def _png_chunk(tag, data):
+    """Serializes a single PNG chunk."""
+    return len(data).to_bytes(4, 'big') + tag + data + zlib.crc32(data, zlib.crc32(tag)).to_bytes(4, 'big')
+
+class _PngStripReader:
+    """Reads a non-interlaced PNG from the top down, a strip of rows at a time.
+
+    Only the IDAT data the requested rows need is inflated. The filtered rows
+    are wrapped in a small stored-deflate PNG of their own so Pillow can undo
+    the filters; later strips are prefixed with the previous row, unfiltered,
+    so filters that look upwards still see the right data.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+        self.extra_chunks = []
+        self.rows_read = 0
+        self._inflater = zlib.decompressobj()
+        self._pending = b''
+        self._prev_row = None
+
+        if fp.read(8) != _PNG_SIGNATURE:
+            raise ValueError("Not a PNG file.")
+
+        ihdr = None
+        while True:
+            tag, data = self._next_chunk()
+            if tag is None or tag == b'IEND':
+                raise ValueError("PNG file has no image data.")
+            if tag == b'IHDR':
+                ihdr = data
+            elif tag in (b'PLTE', b'tRNS'):
+                self.extra_chunks.append(_png_chunk(tag, data))
+            elif tag == b'IDAT':
+                self._pending = data
+                break
+
+        if ihdr is None:
+            raise ValueError("PNG file has no header.")
+        self.width, self.height, self.depth, self.color, _, _, interlace = struct.unpack('>IIBBBBB', ihdr)
+        if interlace or self.color not in _PNG_CHANNELS:
+            raise ValueError("Interlaced PNG files cannot be read in strips.")
+        self._ihdr_tail = ihdr[8:]
+        self.stride = 1 + (self.width * _PNG_CHANNELS[self.color] * self.depth + 7) // 8
+
+    @property
+    def streamable(self):
+        """Whether strips after the first can be decoded (8-bit samples or 16-bit greyscale)."""
+        return self.depth == 8 or (self.depth == 16 and self.color == 0)
+
+    @property
+    def mode(self):
+        """The native carrier mode this PNG is embedded in."""
+        if self.color == 3:
+            has_alpha = any(chunk[4:8] == b'tRNS' for chunk in self.extra_chunks)
+            return "RGBA" if has_alpha else "RGB"
+        if self.color == 0 and self.depth == 16:
+            return "I;16"
+        return {0: "L", 2: "RGB", 4: "LA", 6: "RGBA"}[self.color]
+
+    @property
+    def native(self):
+        """Whether the PNG's scanlines are laid out exactly as `_PngStripWriter` writes its mode."""
+        return self.streamable and self.color != 3
+    def _next_chunk(self):
+        head = self.fp.read(8)
+        if len(head) < 8:
+            return None, b''
+        data = self.fp.read(int.from_bytes(head[:4], 'big'))
+        self.fp.read(4)  # CRC
+        return head[4:8], data
+
+    def read_filtered(self, num_rows):
+        """Inflates up to `num_rows` scanlines, still filtered, with their filter bytes."""
+        needed = min(num_rows, self.height - self.rows_read) * self.stride
+        raw = bytearray()
+        while len(raw) < needed:
+            if not self._pending:
+                tag, data = self._next_chunk()
+                if tag is None or tag == b'IEND':
+                    break
+                if tag != b'IDAT':
+                    continue
+                self._pending = data
+            raw += self._inflater.decompress(self._pending, needed - len(raw))
+            self._pending = self._inflater.unconsumed_tail
+
+        rows = len(raw) // self.stride
+        self.rows_read += rows
+        del raw[rows * self.stride:]
+        return raw
+
+    def read_strip(self, num_rows):
+        """Decodes the next `num_rows` rows into an image in the PNG's own mode.
+
+        Returns None once no more rows can be read.
+        """
+        if self.rows_read and not self.streamable:
+            raise ValueError("Only 8-bit PNG files can be read past the first strip.")
+
+        filtered = self.read_filtered(num_rows)
+        rows = len(filtered) // self.stride
+        if not rows:
+            return None
+
+        prefix = b'' if self._prev_row is None else b'\x00' + self._prev_row
+        total_rows = rows + (1 if prefix else 0)
+        ihdr = struct.pack('>II', self.width, total_rows) + self._ihdr_tail
+        strip_png = b''.join([
+            _PNG_SIGNATURE,
+            _png_chunk(b'IHDR', ihdr),
+            *self.extra_chunks,
+            _png_chunk(b'IDAT', zlib.compress(prefix + filtered, 0)),
+            _png_chunk(b'IEND', b''),
+        ])
+        strip = Image.open(io.BytesIO(strip_png))
+        strip.load()
+        if prefix:
+            strip = strip.crop((0, 1, self.width, total_rows))
+
+        if self.streamable:
+            last_row = strip.crop((0, rows - 1, self.width, rows))
+            # PNG stores 16-bit samples big-endian
+            self._prev_row = last_row.tobytes('raw', 'I;16B') if strip.mode == 'I;16' else last_row.tobytes()
+        return strip
+
+class _ImageStripReader:
+    """Serves strips from a fully decoded image, for carriers that are not streamable PNGs."""
+
+    streamable = False
+
+    def __init__(self, image):
+        self.image = image
+        self.width, self.height = image.size
+        self.rows_read = 0
+
+    def read_strip(self, num_rows):
+        num_rows = min(num_rows, self.height - self.rows_read)
+        if num_rows <= 0:
+            return None
+        top = self.rows_read
+        self.rows_read += num_rows
+        return self.image.crop((0, top, self.width, top + num_rows))
+
+def _open_png_reader(fp):
+    """Returns a strip reader for a PNG file object, or None if it can't be read in strips."""
+    try:
+        return _PngStripReader(fp)
+    except (ValueError, struct.error):
+        return None
+
+def png_compress_level(compress_level):
+    """Returns the zlib level for a PNG profile name or a level from 0 to 9."""
+    level = PNG_PROFILES.get(compress_level, compress_level)
+    if isinstance(level, bool) or not isinstance(level, int) or not 0 <= level <= 9:
+        raise ValueError(f"Compression level must be one of {', '.join(PNG_PROFILES)} or 0-9.")
+    return level
+
+class _ParallelDeflater:
+    """A zlib compressor that deflates blocks of its input on several threads, like pigz.
+
+    Each block is deflated on its own, primed with the window of input
+    before it and ended on a byte boundary, so the pieces join into one
+    ordinary zlib stream. Has the compress/flush interface of a
+    `zlib.compressobj`; compress returns the finished blocks that are ready,
+    in order, and keeps at most two blocks per worker in flight.
+    """
+
+    def __init__(self, level, workers, strategy=zlib.Z_DEFAULT_STRATEGY):
+        self.level = level
+        self.strategy = strategy
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._window = b''
+        self._adler = zlib.adler32(b'')
+        # zlib header: deflate with a 32 KiB window and the level hint zlib itself uses
+        flevel = 0 if level < 2 else 1 if level < 6 else 2 if level == 6 else 3
+        cmf = 0x78
+        flg = flevel << 6
+        self._header = bytes((cmf, flg + 31 - (cmf * 256 + flg) % 31))
+
+    def _deflate(self, block, window, last):
+        # Negative window bits give a raw deflate stream with no header of its own
+        if window:
+            deflater = zlib.compressobj(self.level, zlib.DEFLATED, -15, 8, self.strategy, window)
+        else:
+            deflater = zlib.compressobj(self.level, zlib.DEFLATED, -15, 8, self.strategy)
+        return deflater.compress(block) + deflater.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+    def _submit(self, block, last=False):
+        self._adler = zlib.adler32(block, self._adler)
+        self._pending.append(self._pool.submit(self._deflate, block, self._window, last))
+        if len(block) < _DEFLATE_WINDOW:
+            block = self._window + block
+        self._window = block[-_DEFLATE_WINDOW:]
+
+    def compress(self, data):
+        self._buffer += data
+        blocks = len(self._buffer) // _DEFLATE_BLOCK_BYTES
+        view = memoryview(self._buffer)
+        for i in range(blocks):
+            self._submit(bytes(view[i * _DEFLATE_BLOCK_BYTES:(i + 1) * _DEFLATE_BLOCK_BYTES]))
+        view.release()
+        del self._buffer[:blocks * _DEFLATE_BLOCK_BYTES]
+
+        out = [self._header]
+        self._header = b''
+        while self._pending and (self._pending[0].done() or len(self._pending) > 2 * self.workers):
+            out.append(self._pending.popleft().result())
+        return b''.join(out)
+
+    def flush(self):
+        self._submit(bytes(self._buffer), last=True)
+        self._buffer = bytearray()
+        out = [self._header] + [future.result() for future in self._pending]
+        self._pending.clear()
+        self._pool.shutdown()
+        return b''.join(out) + self._adler.to_bytes(4, 'big')
+
+class _PngStripWriter:
+    """Writes a PNG in one of the native carrier modes incrementally, a strip of rows at a time.
+
+    `seconds` accumulates the time spent filtering and compressing.
+    """
+
+    # PNG colour type and bit depth for each mode
+    _FORMATS = {"L": (0, 8), "LA": (4, 8), "RGB": (2, 8), "RGBA": (6, 8), "I;16": (0, 16)}
+
+    def __init__(self, fp, width, height, mode, compress_level=6, workers=1):
+        self.fp = fp
+        color, depth = self._FORMATS[mode]
+        self.wide = depth == 16
+        # Bytes per pixel, which is also how far back the Sub filter looks
+        self.channels = _MODE_LAYOUTS[mode][0] * depth // 8
+        self._prev_row = np.zeros(width * self.channels, dtype=np.uint8)
+        self.filters = 3 if compress_level < _FULL_FILTER_LEVEL else 5
+        # Like libpng, favour the short matches filtered rows are made of when filtering fully
+        strategy = zlib.Z_FILTERED if self.filters == 5 else zlib.Z_DEFAULT_STRATEGY
+        if workers > 1:
+            self._deflater = _ParallelDeflater(compress_level, workers, strategy)
+        else:
+            self._deflater = zlib.compressobj(compress_level, zlib.DEFLATED, 15, 8, strategy)
+        self.seconds = 0.0
+
+        fp.write(_PNG_SIGNATURE)
+        fp.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, depth, color, 0, 0, 0)))
+
+    def write_rows(self, rows):
+        """Filters and compresses a strip of pixel rows.
+
+        Each row gets whichever filter leaves the smallest sum of absolute
+        differences, the usual PNG heuristic. Fast levels try None, Sub and
+        Up; higher levels also try Average and Paeth, which cost more time
+        but compress photographs noticeably better.
+        """
+        start = time.perf_counter()
+        if self.wide:
+            rows = rows.astype('>u2').view(np.uint8)
+        data = rows.reshape(len(rows), -1)
+        prev = np.vstack((self._prev_row[None], data[:-1]))
+        bpp = self.channels
+        # Filter types are numbered as in the PNG spec, so a candidate's index is its type byte
+        candidates = np.empty((self.filters,) + data.shape, dtype=np.uint8)
+        candidates[0] = data
+        candidates[1, :, :bpp] = data[:, :bpp]
+        np.subtract(data[:, bpp:], data[:, :-bpp], out=candidates[1, :, bpp:])
+        np.subtract(data, prev, out=candidates[2])
+        if self.filters == 5:
+            left = np.zeros(data.shape, dtype=np.int16)
+            left[:, bpp:] = data[:, :-bpp]
+            up = prev.astype(np.int16)
+            up_left = np.zeros(data.shape, dtype=np.int16)
+            up_left[:, bpp:] = prev[:, :-bpp]
+            np.subtract(data, ((left + up) >> 1).astype(np.uint8), out=candidates[3])
+
+            # Paeth: predict from whichever neighbour is closest to left + up - up_left
+            dist_left = np.abs(up - up_left)
+            dist_up = np.abs(left - up_left)
+            dist_up_left = np.abs(left + up - 2 * up_left)
+            predictor = np.where((dist_left <= dist_up) & (dist_left <= dist_up_left), left,
+                                 np.where(dist_up <= dist_up_left, up, up_left))
+            np.subtract(data, predictor.astype(np.uint8), out=candidates[4])
+
+        costs = np.abs(candidates.view(np.int8), dtype=np.int16).sum(axis=2, dtype=np.int64)
+        choice = costs.argmin(axis=0)
+
+        scanlines = np.empty((len(data), data.shape[1] + 1), dtype=np.uint8)
+        scanlines[:, 0] = choice
+        scanlines[:, 1:] = candidates[choice, np.arange(len(data))]
+        self._prev_row = data[-1].copy()
+        self.seconds += time.perf_counter() - start
+        self.write_filtered(scanlines.tobytes())
+
+    def write_filtered(self, raw):
+        """Compresses scanlines that already carry their filter bytes."""
+        start = time.perf_counter()
+        self._write_idat(self._deflater.compress(raw))
+        self.seconds += time.perf_counter() - start
+
+    def _write_idat(self, data):
+        if data:
+            self.fp.write(_png_chunk(b'IDAT', data))
+
+    def close(self):
+        start = time.perf_counter()
+        self._write_idat(self._deflater.flush())
+        self.fp.write(_png_chunk(b'IEND', b''))
+        self.seconds += time.perf_counter() - start
+
+def _load_rows(source, num_rows, img=None):
+    """Loads at least the first `num_rows` rows of an image in its native carrier mode.
+
+    PNG carriers are decoded only as far as needed; other formats, and
+    requests that cover the whole image, fall back to a full decode. `img`
+    may be the source already opened, to save opening it again.
+    """
+    if img is None:
+        img = _open_image(source)
+    if img.format == "PNG" and num_rows < img.height and not isinstance(source, Image.Image):
+        with _open_binary(source) as fp:
+            reader = _open_png_reader(fp)
+            strip = reader.read_strip(num_rows) if reader else None
+        if strip is not None:
+            # Use the whole image's mode so every strip agrees with it
+            mode = _working_mode(img)
+            return strip if strip.mode == mode else strip.convert(mode)
+    return _working_image(img)
+
+# --- Progress ---
+# The public functions take an optional `progress` callback, which is called
+# with the fraction of the work done, between 0 and 1, as each chunk or strip
+# of pixels is finished. An exception raised by the callback stops the
+# operation and propagates to the caller, which is how callers cancel.
+
+class _Progress:
+    """Adds up units of work finished, possibly on several threads, and reports the fraction done."""
+
+    def __init__(self, callback, total):
+        self.callback = callback
+        self.total = max(1, total)
+        self.done = 0
+        self._lock = threading.Lock()
+
+    def advance(self, amount):
+        if self.callback is None:
+            return
+        with self._lock:
+            self.done += amount
+            fraction = min(1.0, self.done / self.total)
+        self.callback(fraction)
+
+# --- Stage Timings ---
+# The encoders that write PNGs take an optional `timings` dict, into which
+# they add the seconds spent in each stage: 'payload' (building the payload
+# stream), 'decode' (opening and decoding the carrier), 'embed' (writing the
+# bits) and 'png' (filtering and compressing the output). The clock is read
+# twice per stage per strip, which is lost in the time a strip takes.
+
+def _add_time(timings, stage, seconds):
+    """Adds `seconds` to `stage` in an optional `timings` dict."""
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+# --- Bit-plane Engine ---
+# The engine decides which channel values hold which bits of a stream and
+# splits the work into stripes; the backend in use (see stegoshield.backends)
+# moves the bits.
+
+def _stripes(num_bits, workers):
+    """Splits [0, num_bits) into up to `workers` byte-aligned ranges.
+
+    Bit k of the payload always maps to channel slot k, so each range is an
+    independent horizontal stripe of the carrier.
+    """
+    if workers <= 1 or num_bits < _PARALLEL_MIN_BITS:
+        return [(0, num_bits)]
+    size = (num_bits + workers - 1) // workers
+    size = (size + 7) // 8 * 8
+    return [(start, min(start + size, num_bits)) for start in range(0, num_bits, size)]
+
+def _run_stripes(func, stripes):
+    """Runs `func(start, stop)` for every stripe, on a thread pool when there are several.
+
+    The NumPy operations involved release the GIL, so the stripes run on
+    separate cores.
+    """
+    if len(stripes) == 1:
+        func(*stripes[0])
+        return
+    with ThreadPoolExecutor(max_workers=len(stripes)) as pool:
+        for future in [pool.submit(func, start, stop) for start, stop in stripes]:
+            future.result()
+
+def _embed_bits(flat, data, bit_offset=0, workers=1, lsb_depth=1, progress=None):
+    """Writes packed stream bits, from `bit_offset` on, into all of `flat`, split across workers."""
+    write_lsbs = get_backend().write_lsbs
+    _run_stripes(lambda start, stop: write_lsbs(flat[start:stop], data, bit_offset + start * lsb_depth, lsb_depth,
+                                                progress),
+                 _stripes(flat.size, workers))
+
+class _Scatter:
+    """A keyed pseudo-random order of a carrier's colour values.
+
+    Without a key, slot k of the colour plane is colour value k. With one,
+    it is colour value order(k), where `order` is a permutation of all of
+    the carrier's colour values picked by the key: a small unbalanced
+    Feistel network on the next power of two up, applied again to any
+    result past the end (cycle walking). The values behind a run of slots
+    are thus found in time proportional to the run, not to the carrier.
+    The key decides where the bits go; it does not encrypt them.
+    """
+
+    def __init__(self, key, mode, num_pixels):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        if not key:
+            raise ValueError("Key must not be empty.")
+        self.channels, self.colours = _MODE_LAYOUTS[mode]
+        self.num_values = num_pixels * self.colours
+        if self.num_values >= 1 << 32:
+            raise ValueError("Carrier image is too large for a keyed payload.")
+
+        # Each round hashes the low part of a value with a keyed multiply,
+        # adds the hash into the high part, then swaps the two parts round
+        bits = max(2, (self.num_values - 1).bit_length())
+        words = np.frombuffer(hashlib.blake2b(key, digest_size=8 * _SCATTER_ROUNDS,
+                                              person=_SCATTER_PERSON).digest(), dtype='<u4')
+        self.rounds = []
+        for i in range(_SCATTER_ROUNDS):
+            high_bits = bits // 2 if i % 2 == 0 else bits - bits // 2
+            low_bits = bits - high_bits
+            self.rounds.append((np.uint32(low_bits), np.uint32(high_bits), np.uint32((1 << low_bits) - 1),
+                                np.uint32(32 - high_bits), np.uint32(words[2 * i]), np.uint32(words[2 * i + 1] | 1)))
+
+    def _permute(self, order, high, mixed):
+        """Runs the rounds over a uint32 array in place, with `high` and `mixed` as scratch of its size.
+
+        Each round swaps the two parts and the next splits where the swap
+        left them, so the parts stay apart between rounds and are joined
+        only at the end: four array operations a round, none allocating.
+        """
+        low_bits, _, low_mask = self.rounds[0][:3]
+        np.right_shift(order, low_bits, out=high)
+        np.bitwise_and(order, low_mask, out=order)
+        high_part, low_part = high, order
+        for _, high_bits, _, shift, round_key, multiplier in self.rounds:
+            np.bitwise_xor(low_part, round_key, out=mixed)
+            np.multiply(mixed, multiplier, out=mixed)
+            np.right_shift(mixed, shift, out=mixed)
+            np.bitwise_xor(high_part, mixed, out=high_part)
+            high_part, low_part = low_part, high_part
+        np.left_shift(high_part, high_bits, out=high_part)
+        np.bitwise_or(high_part, low_part, out=order)
+
+    def positions(self, first, stop):
+        """Returns where the colour values in slots [first, stop) are in the flat channel array, alpha included."""
+        order = np.arange(first, stop, dtype=np.uint32)
+        high, mixed = np.empty((2, order.size), dtype=np.uint32)
+        self._permute(order, high, mixed)
+        outside = np.flatnonzero(order >= self.num_values)
+        while outside.size:
+            walked = order[outside]
+            self._permute(walked, high[:walked.size], mixed[:walked.size])
+            order[outside] = walked
+            # np.compress is several times faster than indexing with a boolean mask
+            outside = np.compress(walked >= self.num_values, outside)
+        # NumPy indexes with intp, so converting once here saves a conversion per use
+        index = order.astype(np.intp)
+        if self.channels != self.colours:
+            # Colour value v is at v // colours * channels + v % colours, which is
+            # v plus the alpha values of the v // colours pixels before it
+            skipped = index // self.colours
+            skipped *= self.channels - self.colours
+            index += skipped
+        return index
+
+    def embed(self, flat, data, first, stop, bit_offset=0, lsb_depth=1, workers=1, progress=None):
+        """Writes packed stream bits, from `bit_offset` on, into slots [first, stop) of a carrier's flat channels."""
+        write_lsbs = get_backend().write_lsbs
+
+        def embed_run(start, end):
+            for low in range(start, end, _SCATTER_CHUNK_SLOTS):
+                index = self.positions(first + low, first + min(low + _SCATTER_CHUNK_SLOTS, end))
+                values = flat[index]
+                original = values.copy()
+                write_lsbs(values, data, bit_offset + low * lsb_depth, lsb_depth, progress)
+                # Scattered writes are the slowest step, and a value whose low bits
+                # already match (half of them at depth 1) needs none
+                changed = np.flatnonzero(values != original)
+                flat[index[changed]] = values[changed]
+
+        _run_stripes(embed_run, _stripes(stop - first, workers))
+
+class _Layout:
+    """Where the bits of a stream live in a carrier of a given mode.
+
+    A carrier's channel values are numbered in raster order on two planes:
+    the colour plane skips alpha, the full plane does not. The stream's
+    first `head_bits` bits, the container header or the legacy length
+    prefix, always take the lowest bit of the first colour values, so bit k
+    of an RGB carrier's header lands in pixel k // 3, channel k % 3. Without
+    alpha the rest follows on the colour plane, `lsb_depth` bits per value;
+    with it, the rest starts at the next whole pixel and uses every value of
+    the full plane. A keyed stream keeps to the colour plane, and `scatter`
+    moves each of its slots to the colour value the key picks.
+    """
+
+    def __init__(self, mode, lsb_depth=1, alpha=False, head_bits=_HEADER_BITS, scatter=None):
+        self.channels, self.colours = _MODE_LAYOUTS[mode]
+        self.lsb_depth = lsb_depth
+        self.alpha = alpha
+        self.head_bits = head_bits
+        self.scatter = scatter
+
+    @classmethod
+    def for_encoding(cls, mode, lsb_depth=1, scatter=None):
+        """Picks the layout for a new payload, which keeps to the colour plane.
+
+        Alpha is left alone: even a one-step change turns a fully
+        transparent pixel, whose colour is hidden, faintly visible. Layouts
+        with alpha are still read from older images that set the flag.
+        """
+        return cls(mode, lsb_depth, scatter=scatter)
+
+    def segments(self, num_bits):
+        """Lists (full_plane, start, stop, bit_offset, lsb_depth) for each run of values a stream uses."""
+        head_bits = self.head_bits
+        segments = [(False, 0, min(num_bits, head_bits), 0, 1)]
+        if num_bits > head_bits:
+            slots = (num_bits - head_bits + self.lsb_depth - 1) // self.lsb_depth
+            start = -(-head_bits // self.colours) * self.channels if self.alpha else head_bits
+            segments.append((self.alpha, start, start + slots, head_bits, self.lsb_depth))
+        return segments
+
+    def values_for_bits(self, num_bits):
+        """Returns how many channel values a stream of `num_bits` bits is written to."""
+        return sum(stop - start for _, start, stop, _, _ in self.segments(num_bits))
+
+    def pixels_for_bits(self, num_bits):
+        """Returns how many pixels, from the top left, hold the first `num_bits` bits of a stream."""
+        return max(-(-stop // (self.channels if full else self.colours))
+                   for full, _, stop, _, _ in self.segments(num_bits))
+
+    def rows_for_bits(self, num_bits, width):
+        """Returns how many carrier rows hold the first `num_bits` bits of a stream."""
+        return -(-self.pixels_for_bits(num_bits) // width)
+
+    def colour_plane(self, pixels):
+        """Returns the colour values of an (N, channels) pixel array, flat; a copy if it has alpha."""
+        if self.channels == self.colours:
+            return pixels.reshape(-1)
+        return np.ascontiguousarray(pixels[:, :self.colours]).reshape(-1)
+
+    def embed(self, rows, data, first_pixel, num_bits, workers=1, progress=None):
+        """Writes the part of a packed stream that falls within `rows`.
+
+        `rows` is a contiguous array of whole carrier rows starting at pixel
+        `first_pixel`, modified in place. Only streams with a container
+        header are embedded; legacy layouts are read, never written. A keyed
+        stream is spread over the whole carrier, which `rows` must then be.
+        `progress` is advanced by the number of values written.
+        """
+        if self.scatter is not None:
+            flat = rows.reshape(-1)
+            for _, start, stop, bit_offset, lsb_depth in self.segments(num_bits):
+                self.scatter.embed(flat, data, start, stop, bit_offset, lsb_depth, workers, progress)
+            return
+
+        head = data[:_HEADER.size].copy()
+        if self.alpha:
+            head[_FLAGS_BYTE] |= _FLAG_ALPHA
+        pixels = rows.reshape(-1, self.channels)
+        planes = {
+            False: (first_pixel * self.colours, len(pixels) * self.colours),
+            True: (first_pixel * self.channels, len(pixels) * self.channels),
+        }
+
+        # Segments on the copied colour plane come first, so they are written
+        # back before a full-plane segment touches the same pixels
+        colour = None
+        for full, start, stop, bit_offset, lsb_depth in self.segments(num_bits):
+            plane_start, plane_size = planes[full]
+            first, last = max(start, plane_start), min(stop, plane_start + plane_size)
+            if first >= last:
+                continue
+            if full:
+                plane = pixels.reshape(-1)
+            else:
+                if colour is None:
+                    colour = self.colour_plane(pixels)
+                plane = colour
+            if full and colour is not None:
+                self._write_back(pixels, colour)
+                colour = None
+            source = head if bit_offset == 0 else data
+            _embed_bits(plane[first - plane_start:last - plane_start], source,
+                        bit_offset + (first - start) * lsb_depth, workers, lsb_depth, progress)
+        if colour is not None:
+            self._write_back(pixels, colour)
+
+    def _write_back(self, pixels, colour):
+        if self.channels != self.colours:
+            pixels[:, :self.colours] = colour.reshape(-1, self.colours)
+
+def _embed_data(image, data_to_embed, num_bits, workers=1, lsb_depth=1, progress=None, key=None):
+    """Embeds the first `num_bits` bits of a packed byte stream into an image's LSBs.
+
+    The image must be in a native carrier mode and keeps it; see `_Layout`
+    for where the bits go, and `_Scatter` for where they go with a `key`.
+    With `workers` > 1, large payloads are embedded in parallel stripes.
+    """
+    channels = np.array(image)
+    _embed_channels(channels, image.mode, data_to_embed, num_bits, workers, lsb_depth, progress, key)
+    return Image.fromarray(channels)
+
+def _embed_channels(channels, mode, data_to_embed, num_bits, workers=1, lsb_depth=1, progress=None, key=None):
+    """Embeds like `_embed_data`, in place, into the array of a whole carrier in native `mode`."""
+    num_pixels = channels.shape[0] * channels.shape[1]
+    scatter = None if key is None else _Scatter(key, mode, num_pixels)
+    layout = _Layout.for_encoding(mode, lsb_depth, scatter)
+    if layout.pixels_for_bits(num_bits) > num_pixels:
+        raise ValueError("Data is too large to hide in the carrier image.")
+
+    layout.embed(channels, np.frombuffer(data_to_embed, dtype=np.uint8), 0, num_bits, workers,
+                 _Progress(progress, layout.values_for_bits(num_bits)))
+
+def _embed_to_png(carrier, data_to_embed, num_bits, output, workers=1, lsb_depth=1, compress_level=6,
+                  progress=None, key=None, timings=None):
+    """Streams a carrier through the LSB engine into a PNG file, a strip at a time.
+
+    Returns the seconds spent filtering and compressing the output. The
+    output keeps the carrier's native mode. Rows that carry payload are
+    decoded, embedded and re-filtered. For 8-bit and 16-bit greyscale PNG
+    carriers other than paletted ones, the rows after them are copied
+    through as filtered scanlines without being decoded. Other carriers are
+    decoded in full and then written out in strips, as are keyed ones,
+    whose payload reaches every row. Stage times are added to `timings`.
+    """
+    if key is not None:
+        embed_progress = save_progress = None
+        if progress is not None:
+            embed_progress, save_progress = (lambda done: progress(done / 2)), (lambda done: progress(0.5 + done / 2))
+        # The carrier is copied out of PIL once; the bits go into that copy,
+        # which is written out as it is
+        start = time.perf_counter()
+        image = _working_image(_open_image(carrier))
+        channels = np.array(image)
+        _add_time(timings, 'decode', time.perf_counter() - start)
+        start = time.perf_counter()
+        _embed_channels(channels, image.mode, data_to_embed, num_bits, workers, lsb_depth, embed_progress, key)
+        _add_time(timings, 'embed', time.perf_counter() - start)
+        png_seconds = _write_png(channels, output, image.mode, compress_level, workers, save_progress)
+        _add_time(timings, 'png', png_seconds)
+        return png_seconds
+
+    data = np.frombuffer(data_to_embed, dtype=np.uint8)
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        reader = None
+        if not isinstance(carrier, Image.Image):
+            reader = _open_png_reader(stack.enter_context(_open_binary(carrier)))
+        if reader is None or not reader.streamable:
+            image = _working_image(_open_image(carrier))
+            reader = _ImageStripReader(image)
+            mode = image.mode
+        else:
+            mode = reader.mode
+        passthrough = reader.streamable and reader.native
+
+        w, h = reader.width, reader.height
+        layout = _Layout.for_encoding(mode, lsb_depth)
+        if layout.pixels_for_bits(num_bits) > w * h:
+            raise ValueError("Data is too large to hide in the carrier image.")
+
+        payload_rows = layout.rows_for_bits(num_bits, w)
+        strip_rows = max(1, _STRIP_BYTES // (w * layout.channels))
+        rows_done = _Progress(progress, h)
+        _add_time(timings, 'decode', time.perf_counter() - start)
+
+        with _open_binary(output, 'wb') as dst:
+            writer = _PngStripWriter(dst, w, h, mode, compress_level, workers)
+            while reader.rows_read < h:
+                # The first row after the payload is re-filtered against the
+                # modified row above it; everything below passes through.
+                if passthrough and reader.rows_read > payload_rows:
+                    start = time.perf_counter()
+                    filtered = reader.read_filtered(strip_rows)
+                    _add_time(timings, 'decode', time.perf_counter() - start)
+                    if not filtered:
+                        break
+                    writer.write_filtered(filtered)
+                    rows_done.advance(reader.rows_read - rows_done.done)
+                    continue
+
+                num_rows = strip_rows
+                if passthrough:
+                    num_rows = min(num_rows, payload_rows + 1 - reader.rows_read)
+                top = reader.rows_read
+                start = time.perf_counter()
+                strip = reader.read_strip(num_rows)
+                if strip is None:
+                    break
+                rows = np.array(strip.convert(mode) if strip.mode != mode else strip)
+                _add_time(timings, 'decode', time.perf_counter() - start)
+
+                if top < payload_rows:
+                    start = time.perf_counter()
+                    layout.embed(rows, data, top * w, num_bits, workers)
+                    _add_time(timings, 'embed', time.perf_counter() - start)
+                writer.write_rows(rows)
+                rows_done.advance(reader.rows_read - rows_done.done)
+
+            if reader.rows_read < h:
+                raise ValueError("Carrier image data is truncated or corrupt.")
+            writer.close()
+    _add_time(timings, 'png', writer.seconds)
+    return writer.seconds
+
+def _extract_data(image, num_bits, bit_offset=0, workers=1, lsb_depth=1, progress=None, scatter=None):
+    """Extracts `num_bits` bits as a packed byte stream.
+
+    Reading starts at channel value `bit_offset`, or at that slot of
+    `scatter` when the image is the whole carrier of a keyed stream, and
+    takes the low `lsb_depth` bits of each value. `progress` is advanced by
+    the number of values read, a chunk at a time.
+    """
+    flat = np.asarray(image).reshape(-1)
+    num_values = flat.size if scatter is None else scatter.num_values
+    num_bits = max(0, min(num_bits, (num_values - bit_offset) * lsb_depth))
+    num_slots = (num_bits + lsb_depth - 1) // lsb_depth
+
+    packed = bytearray((num_bits + 7) // 8)
+    out = np.frombuffer(packed, dtype=np.uint8)
+    read_lsbs = get_backend().read_lsbs
+
+    def extract(first, stop):
+        # Slot ranges start on multiples of 8 so each one fills whole bytes
+        if scatter is None:
+            read_lsbs(flat[bit_offset + first:bit_offset + stop], out[first * lsb_depth // 8:], lsb_depth, progress)
+            return
+        for low in range(first, stop, _SCATTER_CHUNK_SLOTS):
+            index = scatter.positions(bit_offset + low, bit_offset + min(low + _SCATTER_CHUNK_SLOTS, stop))
+            read_lsbs(flat[index], out[low * lsb_depth // 8:], lsb_depth, progress)
+
+    _run_stripes(extract, _stripes(num_slots, workers))
+    return packed, num_bits
+
+def _extract_body(source, img, layout, num_bits, workers=1, progress=None):
+    """Extracts the bits of a stream that follow its head, as a packed byte stream.
+
+    `img` holds the carrier's top rows; more are loaded from `source` when
+    the stream reaches past them. Returns the packed bits, how many were
+    extracted, and the rows now loaded. For a keyed stream `img` is already
+    the whole carrier, as an array.
+    """
+    full, start, _, _, _ = layout.segments(num_bits)[1]
+    if layout.scatter is not None:
+        plane = img
+    else:
+        if img.height < layout.rows_for_bits(num_bits, img.width):
+            img = _load_rows(source, layout.rows_for_bits(num_bits, img.width))
+        pixels = np.asarray(img).reshape(-1, layout.channels)[:layout.pixels_for_bits(num_bits)]
+        plane = pixels.reshape(-1) if full else layout.colour_plane(pixels)
+    packed, extracted_bits = _extract_data(plane, num_bits - layout.head_bits, bit_offset=start, workers=workers,
+                                           lsb_depth=layout.lsb_depth, progress=progress, scatter=layout.scatter)
+    return packed, extracted_bits, img
+
+def _read_header(image_path, label, key=None):
+    """Reads the header of the payload in an image, decoding only the top rows.
+
+    An image without the container magic is rejected after its first 32
+    colour values, unless they form a plausible legacy length prefix. Lossy
+    formats are rejected without decoding, since their compression destroys
+    any payload. With a `key`, the header is read from the slots the key
+    picks, which takes the whole image.
+    Returns (type, body_length, version, layout, num_bits, crc, img): the
+    version is 1 for legacy payloads, whose crc is None, and img holds the
+    rows loaded so far, or the whole carrier as an array for a keyed payload.
+    """
+    source_img = _open_image(image_path)
+    if source_img.format in _LOSSY_FORMATS:
+        raise ValueError(f"Cannot extract {label.lower()}: {source_img.format} images are lossy "
+                         "and cannot carry a payload.")
+    (w, h), mode = source_img.size, _working_mode(source_img)
+    if key is not None:
+        return _read_keyed_header(image_path, source_img, mode, key, label)
+    not_encoded = f"Cannot extract {label.lower()}: Invalid or not an encoded image."
+
+    layout = _Layout(mode)
+    img = _load_rows(image_path, layout.rows_for_bits(_HEADER_BITS, w), source_img)
+    pixels = np.asarray(img).reshape(-1, layout.channels)
+    head, head_bits = _extract_data(layout.colour_plane(pixels[:layout.pixels_for_bits(_HEADER_BITS)]), _HEADER_BITS)
+    if head_bits < _PREFIX_BITS:
+        raise ValueError(not_encoded)
+    if head[:4] != _MAGIC:
+        return _read_legacy_header(image_path, (w, h), mode, img, head[:4], label)
+    if head_bits < _HEADER_BITS:
+        raise ValueError(not_encoded)
+
+    payload_type, lsb_depth, alpha, body_length, crc = _parse_header(head, label)
+    layout = _Layout(mode, lsb_depth, alpha)
+    num_bits = _HEADER_BITS + 8 * body_length
+    if ((alpha and (lsb_depth > 1 or layout.channels == layout.colours))
+            or layout.pixels_for_bits(num_bits) > w * h):
+        raise ValueError(f"{label} data is corrupt or incomplete.")
+    return payload_type, body_length, _VERSION, layout, num_bits, crc, img
+
+def _read_keyed_header(image_path, source_img, mode, key, label):
+    """Reads the header of a keyed payload, decoding the whole image it is spread over.
+
+    A wrong key finds no container magic, and reads as an image without a
+    payload. Legacy payloads are never keyed. The carrier is converted to an
+    array once, here, and returned in place of the image for the body.
+    """
+    w, h = source_img.size
+    scatter = _Scatter(key, mode, w * h)
+    img = np.asarray(_load_rows(image_path, h, source_img))
+    head, head_bits = _extract_data(img, _HEADER_BITS, scatter=scatter)
+    if head_bits < _HEADER_BITS or head[:4] != _MAGIC:
+        raise ValueError(f"Cannot extract {label.lower()}: Invalid or not an encoded image, or the key is wrong.")
+
+    payload_type, lsb_depth, alpha, body_length, crc = _parse_header(head, label)
+    layout = _Layout(mode, lsb_depth, scatter=scatter)
+    num_bits = _HEADER_BITS + 8 * body_length
+    if alpha or layout.pixels_for_bits(num_bits) > w * h:
+        raise ValueError(f"{label} data is corrupt or incomplete.")
+    return payload_type, body_length, _VERSION, layout, num_bits, crc, img
+
+def _read_legacy_header(image_path, size, mode, img, prefix_bytes, label):
+    """Reads the header of a legacy payload from its 32-bit length prefix and the rows loaded so far.
+
+    The type bit and the first body bytes are checked too, before anything
+    else is extracted.
+    """
+    w, h = size
+    not_encoded = f"Cannot extract {label.lower()}: Invalid or not an encoded image."
+    prefix = int.from_bytes(prefix_bytes, 'big')
+    lsb_depth = (prefix >> 30) + 1
+    alpha = bool(prefix & _ALPHA_FLAG)
+    payload_length = prefix & _LENGTH_MASK
+    layout = _Layout(mode, lsb_depth, alpha, head_bits=_PREFIX_BITS)
+    num_bits = _PREFIX_BITS + payload_length
+    if (payload_length < 1 or (payload_length - 1) % 8
+            or (alpha and (lsb_depth > 1 or layout.channels == layout.colours))
+            or layout.pixels_for_bits(num_bits) > w * h):
+        raise ValueError(not_encoded)
+
+    peek_bits = min(num_bits, _PREFIX_BITS + 1 + 8 * _LEGACY_PEEK_BYTES)
+    packed, _, img = _extract_body(image_path, img, layout, peek_bits)
+    type_bit, head = _parse_stream(packed)
+    if not _plausible_legacy_body(type_bit, head):
+        raise ValueError(not_encoded)
+    return type_bit, (payload_length - 1) // 8, 1, layout, num_bits, None, img
+
+def _read_payload(image_path, label, workers=1, progress=None, key=None):
+    """Reads the payload from an image and returns (type, body).
+
+    Only the rows that hold the header and the payload are decoded, or all
+    of them for a keyed payload.
+    """
+    payload_type, body_length, _, layout, num_bits, crc, img = _read_header(image_path, label, key)
+    values_done = _Progress(progress, layout.values_for_bits(num_bits) - layout.head_bits)
+    packed, extracted_bits, _ = _extract_body(image_path, img, layout, num_bits, workers, values_done)
+    if extracted_bits < num_bits - layout.head_bits:
+        raise ValueError(f"{label} data is corrupt or incomplete.")
+    if crc is None:
+        return _parse_stream(packed)
+
+    # Check the body against the header's CRC
+    if zlib.crc32(packed) != crc:
+        raise ValueError(f"{label} data is corrupt or incomplete.")
+    return payload_type, memoryview(packed)
+
+def encode_message(image_path, message, workers=1, compression='zlib', lsb_depth=1, progress=None, key=None):
+    """Encodes a text message into an image using length prefixing.
+
+    `workers` > 1 embeds large payloads on that many threads. `compression`
+    picks the codec for the message bytes ('zlib', or 'lzma'/'zstd' when
+    installed); None writes the legacy base64 payload. `lsb_depth` is how
+    many low bits of each channel carry the payload, from 1 to 4.
+    `progress` is called with the fraction of the payload embedded so far;
+    raising from it cancels the encode. A `key` (a password string or
+    bytes) scatters the payload over the carrier's colour values in an
+    order only the key reproduces; decoding then needs the same key.
+    """
+    img = _working_image(_open_image(image_path))
+
+    # Payload format: [Header (type 0)] + [Message Content]
+    stream, num_bits = _build_stream(TEXT_TYPE, *_text_parts(message, compression), lsb_depth=lsb_depth)
+
+    return _embed_data(img, stream, num_bits, workers, lsb_depth, progress, key)
+
+def encode_message_to_file(image_path, message, output, workers=1, compression='zlib', lsb_depth=1,
+                           compress_level='default', progress=None, key=None, timings=None):
+    """Encodes a text message into an image and streams the result as a PNG to a path or file object.
+
+    `compress_level` is a PNG profile name ('fast', 'default', 'small') or
+    a zlib level; with `workers` > 1 the output is also deflated on that
+    many threads. `progress` follows the rows written, and `key` works as in
+    `encode_message`. Returns the seconds spent writing the PNG; pass a
+    `timings` dict to also get the seconds spent in each stage.
+    """
+    level = png_compress_level(compress_level)
+    start = time.perf_counter()
+    stream, num_bits = _build_stream(TEXT_TYPE, *_text_parts(message, compression), lsb_depth=lsb_depth)
+    _add_time(timings, 'payload', time.perf_counter() - start)
+    return _embed_to_png(image_path, stream, num_bits, output, workers, lsb_depth, level, progress, key, timings)
+
+def decode_message(image_path, workers=1, progress=None, key=None):
+    """Decodes a text message from an image using length prefixing.
+
+    `progress` is called with the fraction of the payload extracted so far.
+    A message encoded with a `key` is only found with the same key.
+    """
+    type_bit, body = _read_payload(image_path, "Message", workers, progress, key)
+    if type_bit != TEXT_TYPE:
+        raise ValueError("Encoded data is not a text message.")
+
+    return _read_text_body(body)
+
+def encode_image(carrier_path, secret_path, workers=1, compression='zlib', lsb_depth=1, progress=None, key=None):
+    """Encodes an image into another image using length prefixing.
+
+    `workers` > 1 embeds large payloads on that many threads. Unless
+    `compression` is None the secret is stored as a PNG file rather than
+    raw pixels. `lsb_depth` is how many low bits of each channel carry the
+    payload, from 1 to 4. `progress` and `key` work as in `encode_message`.
+    """
+    carrier_img = _working_image(_open_image(carrier_path))
+    secret_img = _open_image(secret_path).convert("RGB")
+
+    # Payload format: [Header (type 1)] + [Header Len (16b)] + [Image Header] + [Image Data]
+    stream, num_bits = _build_stream(IMAGE_TYPE, *_image_parts(secret_img, compression), lsb_depth=lsb_depth)
+
+    return _embed_data(carrier_img, stream, num_bits, workers, lsb_depth, progress, key)
+
+def encode_image_to_file(carrier_path, secret_path, output, workers=1, compression='zlib', lsb_depth=1,
+                         compress_level='default', progress=None, key=None, timings=None):
+    """Encodes an image into another image and streams the result as a PNG to a path or file object.
+
+    Takes the same `compress_level`, `progress`, `key` and `timings` as
+    `encode_message_to_file` and also returns the seconds spent writing the
+    PNG.
+    """
+    level = png_compress_level(compress_level)
+    start = time.perf_counter()
+    secret_img = _open_image(secret_path).convert("RGB")
+    stream, num_bits = _build_stream(IMAGE_TYPE, *_image_parts(secret_img, compression), lsb_depth=lsb_depth)
+    _add_time(timings, 'payload', time.perf_counter() - start)
+    return _embed_to_png(carrier_path, stream, num_bits, output, workers, lsb_depth, level, progress, key, timings)
+
+def decode_image(encoded_path, workers=1, progress=None, key=None):
+    """Decodes an image from another image using length prefixing.
+
+    `progress` and `key` work as in `decode_message`.
+    """
+    type_bit, body = _read_payload(encoded_path, "Image", workers, progress, key)
+    if type_bit != IMAGE_TYPE:
+        raise ValueError("Encoded data is not an image.")
+
+    return _read_image_body(body)
+
+def save_png(image, output, compress_level='default', workers=1, progress=None):
+    """Saves an image as a PNG to a path or file object and returns the seconds it took.
+
+    `compress_level` is a PNG profile name ('fast', 'default', 'small') or
+    a zlib level; `workers` > 1 deflates the output on that many threads.
+    Images not in a native carrier mode are converted to the nearest one.
+    `progress` is called with the fraction of rows written so far.
+    """
+    image = _working_image(image)
+    return _write_png(np.asarray(image), output, image.mode, png_compress_level(compress_level), workers, progress)
+
+def _write_png(rows, output, mode, level, workers=1, progress=None):
+    """Writes an array of pixel rows in native `mode` as a PNG, a strip at a time, and returns the seconds it took."""
+    height, width = rows.shape[:2]
+    with _open_binary(output, 'wb') as dst:
+        writer = _PngStripWriter(dst, width, height, mode, level, workers)
+        strip_rows = max(1, _STRIP_BYTES // (width * writer.channels))
+        rows_done = _Progress(progress, height)
+        for top in range(0, height, strip_rows):
+            writer.write_rows(rows[top:top + strip_rows])
+            rows_done.advance(len(rows[top:top + strip_rows]))
+        writer.close()
+    return writer.seconds
+
+def probe(image_path, key=None):
+    """Checks whether an image carries a StegoShield payload, reading only its header.
+
+    Returns a dict whose 'plausible' entry says whether a payload was
+    found. If one was, the dict also has its 'type' ('text' or 'image'), its
+    body 'size' in bytes, the format 'version' (1 for legacy images),
+    'lsb_depth' and 'alpha'; otherwise it has the 'reason'. The body is not
+    extracted, so a plausible payload may still fail its checksum when
+    decoded. JPEG files are turned away without being decoded. A keyed
+    payload is only found with its `key`, and finding it decodes the whole
+    image.
+    """
+    try:
+        payload_type, body_length, version, layout, _, _, _ = _read_header(image_path, "Payload", key)
+    except ValueError as e:
+        return {"plausible": False, "reason": str(e)}
+    return {
+        "plausible": True,
+        "type": "image" if payload_type == IMAGE_TYPE else "text",
+        "size": body_length,
+        "version": version,
+        "lsb_depth": layout.lsb_depth,
+        "alpha": layout.alpha,
+    }
@@ -0,0 +1,74 @@
+"""The original string-based StegoShield encoder, kept to produce legacy images for the tests.
+
+This is the encoding half of the steganography.py every app shipped before
+payloads were packed, copied unchanged apart from unused imports: [Length (32b)] + [Type (1b)] +
+[Body], one bit per RGB channel. Images it writes must keep decoding with
+the current engine.
+"""
+from PIL import Image
+from base64 import b64encode
+
+def _str_to_binary(s):
+    """Converts a string to its binary representation."""
+    return ''.join(format(ord(c), '08b') for c in s)
+
+def _embed_data(image, data_to_embed):
+    """Embeds a stream of binary data into an image's LSBs."""
+    if len(data_to_embed) > len(image.getdata()) * 3:
+        raise ValueError("Data is too large to hide in the carrier image.")
+
+    data_iter = iter(data_to_embed)
+    new_data = []
+    for pixel in image.getdata():
+        new_pixel = list(pixel)
+        try:
+            for i in range(3):  # For R, G, B channels
+                bit = next(data_iter)
+                new_pixel[i] = new_pixel[i] & ~1 | int(bit)
+        except StopIteration:
+            # No more data to hide
+            new_data.append(tuple(new_pixel))
+            break
+        new_data.append(tuple(new_pixel))
+
+    # Append the rest of the original pixels
+    new_data.extend(image.getdata())
+    # Truncate to the original image size
+    new_data = new_data[:len(image.getdata())]
+
+    image.putdata(new_data)
+    return image
+
+def encode_message(image_path, message):
+    """Encodes a text message into an image using length prefixing."""
+    img = Image.open(image_path).convert("RGB")
+    
+    # Payload format: [Type Bit '0'] + [Message Content]
+    payload_str = b64encode(message.encode()).decode()
+    binary_payload = "0" + _str_to_binary(payload_str)
+
+    # Prefix the payload with its 32-bit length
+    binary_length = f'{len(binary_payload):032b}'
+    data_to_embed = binary_length + binary_payload
+    
+    return _embed_data(img, data_to_embed)
+
+def encode_image(carrier_path, secret_path):
+    """Encodes an image into another image using length prefixing."""
+    carrier_img = Image.open(carrier_path).convert("RGB")
+    secret_img = Image.open(secret_path).convert("RGB")
+    w, h = secret_img.size
+
+    # Payload format: [Type '1'] + [Header Len (16b)] + [Header] + [Pixel Data]
+    header_str = f"{w}x{h}"
+    binary_header = _str_to_binary(header_str)
+    binary_header_len = f'{len(binary_header):016b}'
+    binary_pixels = ''.join(f'{r:08b}{g:08b}{b:08b}' for r, g, b in secret_img.getdata())
+    
+    binary_payload = "1" + binary_header_len + binary_header + binary_pixels
+    
+    # Prefix the payload with its 32-bit length
+    binary_length = f'{len(binary_payload):032b}'
+    data_to_embed = binary_length + binary_payload
+
+    return _embed_data(carrier_img, data_to_embed)
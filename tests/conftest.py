@@ -0,0 +1,27 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The tests import the stegoshield package at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'StegoShield_fullStack', 'backend')
+
+
+@pytest.fixture(scope='session')
+def client(tmp_path_factory):
+    """A test client for the full-stack backend's API."""
+    pytest.importorskip('flask')
+    pytest.importorskip('flask_cors')
+    # The app creates its upload and output directories in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('backend'))
+    sys.path.insert(0, BACKEND)
+    try:
+        app_module = importlib.import_module('app')
+        yield app_module.app.test_client()
+    finally:
+        sys.path.remove(BACKEND)
+        os.chdir(cwd)
@@ -0,0 +1,77 @@
+"""Requests to the full-stack backend's encode, decode and output endpoints."""
+import hashlib
+import io
+
+import numpy as np
+from PIL import Image
+
+
+def _carrier_png(seed=0):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), 'RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _encode_text(client, message='api secret', seed=0, **fields):
+    return client.post('/api/encode-text', data={'message': message, **fields,
+                                                 'carrier': (io.BytesIO(_carrier_png(seed)), 'carrier.png')})
+
+
+def test_encode_redirects_to_output(client):
+    response = _encode_text(client)
+    assert response.status_code == 303
+    assert response.headers['Location'].startswith('/api/outputs/')
+    assert 'Server-Timing' not in response.headers
+
+
+def test_encode_reports_stage_timings_as_json(client):
+    response = _encode_text(client, format='json')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert set(body['timings']) >= {'payload', 'decode', 'embed', 'png', 'store'}
+    assert body['url'] == f"/api/outputs/{body['digest']}.png"
+    stages = [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+    assert sorted(stages) == sorted(body['timings'])
+
+
+def test_server_timing_is_exposed_to_other_origins(client):
+    response = client.post('/api/encode-text?format=json', headers={'Origin': 'http://localhost:3000'},
+                           data={'message': 'api secret', 'carrier': (io.BytesIO(_carrier_png()), 'carrier.png')})
+    assert 'Server-Timing' in response.headers['Access-Control-Expose-Headers']
+    assert client.get(response.get_json()['url']).status_code == 200
+
+
+def _output_url(client):
+    return _encode_text(client, format='json').get_json()['url']
+
+
+def test_output_is_served_with_its_digest_as_etag(client):
+    url = _output_url(client)
+    response = client.get(url)
+    digest = url.rsplit('/', 1)[1][:-len('.png')]
+    assert response.status_code == 200 and response.mimetype == 'image/png'
+    assert response.headers['ETag'] == f'"{digest}"'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert hashlib.sha256(response.data).hexdigest() == digest
+
+
+def test_output_answers_if_none_match_with_304(client):
+    url = _output_url(client)
+    etag = client.get(url).headers['ETag']
+    response = client.get(url, headers={'If-None-Match': etag})
+    assert response.status_code == 304 and not response.data
+
+
+def test_output_answers_range_requests_with_206(client):
+    url = _output_url(client)
+    full = client.get(url).data
+    response = client.get(url, headers={'Range': 'bytes=8-23'})
+    assert response.status_code == 206
+    assert response.data == full[8:24]
+    assert response.headers['Content-Range'] == f'bytes 8-23/{len(full)}'
+
+
+def test_unknown_output_is_not_found(client):
+    assert client.get(f"/api/outputs/{'0' * 64}.png").status_code == 404
+    assert client.get('/api/outputs/not-a-digest.png').status_code == 404
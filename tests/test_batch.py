@@ -0,0 +1,87 @@
+"""Batch endpoints of the full-stack backend, where a failed item must not fail the rest."""
+import base64
+import io
+import json
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stegoshield import decode_message, encode_image, encode_message
+
+
+def _image(seed, size=(96, 64)):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), 'RGB')
+
+
+def _png(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _files(*items):
+    return [(io.BytesIO(data), name) for name, data in items]
+
+
+# A good carrier, one that is not an image, one with a rejected extension, and another good one
+MIXED_CARRIERS = [('a.png', _png(_image(0))), ('broken.png', b'not an image'),
+                  ('notes.txt', b'text'), ('b.png', _png(_image(1)))]
+
+
+def _entries_by_name(entries):
+    assert sorted(entry['index'] for entry in entries) == list(range(len(entries)))
+    return {entry['filename']: entry for entry in entries}
+
+
+def test_encode_zip_reports_failed_items_beside_the_others(client):
+    response = client.post('/api/batch/encode-text', data={'message': 'batch secret',
+                                                          'carriers': _files(*MIXED_CARRIERS)})
+    assert response.status_code == 200 and response.mimetype == 'application/zip'
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    entries = _entries_by_name([json.loads(line) for line in archive.read('manifest.ndjson').splitlines()])
+
+    assert entries['notes.txt']['error'] == "Invalid file type."
+    assert 'error' in entries['broken.png'] and 'output' not in entries['broken.png']
+    for name in ('a.png', 'b.png'):
+        output = Image.open(io.BytesIO(archive.read(entries[name]['output'])))
+        assert decode_message(output) == 'batch secret'
+
+
+def test_encode_ndjson_reports_failed_items_beside_the_others(client):
+    response = client.post('/api/batch/encode-text', data={'message': 'batch secret', 'format': 'ndjson',
+                                                          'carriers': _files(*MIXED_CARRIERS)})
+    assert response.mimetype == 'application/x-ndjson'
+    entries = _entries_by_name([json.loads(line) for line in response.data.splitlines()])
+    assert {name for name, entry in entries.items() if 'error' in entry} == {'broken.png', 'notes.txt'}
+    for name in ('a.png', 'b.png'):
+        output = Image.open(io.BytesIO(base64.b64decode(entries[name]['png'])))
+        assert decode_message(output) == 'batch secret'
+
+
+@pytest.mark.parametrize('output_format', ['ndjson', 'zip'])
+def test_decode_reports_failed_items_beside_the_others(client, output_format):
+    encoded = [('one.png', _png(encode_message(_image(2), 'first'))),
+               ('plain.png', _png(_image(3))),
+               ('two.png', _png(encode_message(_image(4), 'second')))]
+    response = client.post('/api/batch/decode', data={'format': output_format, 'encoded': _files(*encoded)})
+    if output_format == 'zip':
+        lines = zipfile.ZipFile(io.BytesIO(response.data)).read('manifest.ndjson').splitlines()
+    else:
+        lines = response.data.splitlines()
+    entries = _entries_by_name([json.loads(line) for line in lines])
+    assert 'error' in entries['plain.png']
+    assert (entries['one.png']['message'], entries['two.png']['message']) == ('first', 'second')
+
+
+def test_decode_images_into_a_zip(client):
+    secret = _image(5, (12, 9))
+    encoded = [('hidden.png', _png(encode_image(_image(6), secret))), ('broken.png', b'not an image')]
+    response = client.post('/api/batch/decode', data={'type': 'image', 'format': 'zip', 'encoded': _files(*encoded)})
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    entries = _entries_by_name([json.loads(line) for line in archive.read('manifest.ndjson').splitlines()])
+    assert 'error' in entries['broken.png']
+    extracted = Image.open(io.BytesIO(archive.read(entries['hidden.png']['output'])))
+    assert np.array_equal(np.asarray(extracted), np.asarray(secret))
@@ -0,0 +1,83 @@
+"""The decode result cache, on its own and behind the full-stack backend's decode endpoints."""
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+from stegoshield import encode_message
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'StegoShield_fullStack', 'backend'))
+from cache import ResultCache, content_key  # noqa: E402
+
+
+def test_key_depends_on_bytes_and_operation():
+    key = content_key(io.BytesIO(b'upload bytes'), 'decode-text')
+    assert content_key(io.BytesIO(b'upload bytes'), 'decode-text') == key
+    assert content_key(io.BytesIO(b'upload bytez'), 'decode-text') != key
+    assert content_key(io.BytesIO(b'upload bytes'), 'decode-image') != key
+
+
+def test_key_leaves_the_stream_at_its_start():
+    stream = io.BytesIO(b'upload bytes')
+    stream.seek(5)
+    content_key(stream, 'decode-text')
+    assert stream.tell() == 0
+
+
+def test_hit_on_identical_bytes_and_miss_on_changed_ones():
+    cache = ResultCache(1 << 20)
+    cache.put(content_key(io.BytesIO(b'upload bytes'), 'decode-text'), b'result')
+    assert cache.get(content_key(io.BytesIO(b'upload bytes'), 'decode-text')) == b'result'
+    assert cache.get(content_key(io.BytesIO(b'upload bytez'), 'decode-text')) is None
+    assert cache.get(content_key(io.BytesIO(b'upload bytes'), 'decode-text\0key')) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_results_are_evicted_at_capacity():
+    cache = ResultCache(max_bytes=30)
+    for key in 'abc':
+        cache.put(key, key.encode() * 10)
+    cache.get('a')
+    cache.put('d', b'd' * 10)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == [b'a' * 10, b'c' * 10, b'd' * 10]
+    assert cache.stats()['bytes'] == 30
+
+
+def test_results_larger_than_a_tier_skip_it(tmp_path):
+    cache = ResultCache(max_bytes=10, disk_dir=str(tmp_path), disk_max_bytes=100)
+    cache.put('big', b'x' * 50)
+    assert cache.stats()['entries'] == 0 and cache.stats()['disk_entries'] == 1
+    assert cache.get('big') == b'x' * 50 and cache.disk_hits == 1
+
+
+def test_disk_tier_evicts_oldest_files_at_capacity(tmp_path):
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), disk_max_bytes=25)
+    cache.put('a', b'a' * 10)
+    os.utime(tmp_path / 'a', (0, 0))
+    cache.put('b', b'b' * 10)
+    cache.put('c', b'c' * 10)
+    assert sorted(os.listdir(tmp_path)) == ['b', 'c']
+    assert cache.get('a') is None and cache.get('b') == b'b' * 10
+
+
+def test_decode_endpoint_reuses_results_for_identical_uploads(client):
+    rng = np.random.default_rng(3)
+    carrier = Image.fromarray(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), 'RGB')
+    buffer = io.BytesIO()
+    encode_message(carrier, 'cached secret').save(buffer, 'PNG')
+
+    def decode(**fields):
+        response = client.post('/api/decode-text', data={**fields, 'encoded': (io.BytesIO(buffer.getvalue()), 'e.png')})
+        return response.get_json().get('message')
+
+    before = client.get('/api/cache/stats').get_json()
+    assert decode() == 'cached secret'
+    assert decode() == 'cached secret'
+    # A key changes the result, so it is part of the cache key
+    assert decode(key='pw') is None
+    after = client.get('/api/cache/stats').get_json()
+    assert after['hits'] - before['hits'] == 1
+    assert after['misses'] - before['misses'] == 2
@@ -0,0 +1,74 @@
+"""The command-line tool run over directories of images."""
+import json
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stegoshield import cli
+from stegoshield import steganography as st
+
+
+def _run(capsys, *argv):
+    """Runs the tool and returns its exit status and NDJSON entries, keyed by input path."""
+    try:
+        cli.main([*argv, '--workers', '1'])
+        status = 0
+    except SystemExit as e:
+        status = e.code
+    out = capsys.readouterr().out
+    return status, {entry['path']: entry for entry in map(json.loads, out.splitlines())}
+
+
+@pytest.fixture
+def carriers(tmp_path):
+    """A directory of carriers, one of them in a subdirectory, and a file that is not an image."""
+    root = tmp_path / 'carriers'
+    (root / 'nested').mkdir(parents=True)
+    rng = np.random.default_rng(0)
+    for name in ('a.png', 'nested/b.png'):
+        Image.fromarray(rng.integers(0, 256, (48, 64, 3), dtype=np.uint8), 'RGB').save(root / name)
+    (root / 'broken.png').write_bytes(b'not an image')
+    return root
+
+
+def test_encode_and_decode_a_directory(carriers, tmp_path, capsys):
+    encoded, decoded = tmp_path / 'encoded', tmp_path / 'decoded'
+    status, entries = _run(capsys, 'encode-text', str(carriers), '--message', 'cli secret',
+                           '--output-dir', str(encoded))
+    # The broken file fails on its own, and the others are still encoded
+    assert status == 1
+    assert 'error' in entries[str(carriers / 'broken.png')]
+    assert entries[str(carriers / 'nested' / 'b.png')]['output'] == str(encoded / 'nested' / 'b_encoded.png')
+    assert st.decode_message(str(encoded / 'a_encoded.png')) == 'cli secret'
+
+    status, entries = _run(capsys, 'decode-text', str(encoded), '--output-dir', str(decoded))
+    assert status == 0 and len(entries) == 2
+    for name in ('a_encoded.txt', 'nested/b_encoded.txt'):
+        assert (decoded / name).read_text(encoding='utf-8') == 'cli secret'
+
+
+def test_rerun_skips_outputs_that_are_up_to_date(carriers, tmp_path, capsys):
+    encoded = str(tmp_path / 'encoded')
+    _run(capsys, 'encode-text', str(carriers / 'a.png'), '--message', 'cli secret', '--output-dir', encoded)
+    status, entries = _run(capsys, 'encode-text', str(carriers / 'a.png'), '--message', 'cli secret',
+                           '--output-dir', encoded)
+    assert status == 0 and entries[str(carriers / 'a.png')]['skipped']
+
+
+def test_probe_reports_each_file(carriers, tmp_path, capsys):
+    st.encode_message_to_file(str(carriers / 'a.png'), 'cli secret', str(tmp_path / 'encoded.png'), key='pw')
+    status, entries = _run(capsys, 'probe', str(tmp_path / 'encoded.png'), str(carriers / 'nested'),
+                           '--key', 'pw')
+    assert status == 0
+    assert entries[str(tmp_path / 'encoded.png')]['plausible']
+    assert not entries[str(carriers / 'nested' / 'b.png')]['plausible']
+
+
+def test_compression_choices_are_the_installed_codecs(capsys):
+    parser = cli.build_parser()
+    for codec in (*st.COMPRESSIONS, 'none'):
+        assert parser.parse_args(['encode-text', 'x.png', '--message', 'm', '--compression', codec])
+    if 'zstd' not in st.COMPRESSIONS:
+        with pytest.raises(SystemExit):
+            parser.parse_args(['encode-text', 'x.png', '--message', 'm', '--compression', 'zstd'])
@@ -0,0 +1,10 @@
+"""Every available backend must give the same results as the pure-Python reference."""
+import pytest
+
+from stegoshield.backends import available_backends
+from stegoshield.conformance import check_backend
+
+
+@pytest.mark.parametrize('name', available_backends())
+def test_backend_conforms(name):
+    assert check_backend(name) == []
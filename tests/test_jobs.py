@@ -0,0 +1,50 @@
+"""Jobs run end to end through the full-stack backend's API."""
+import io
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stegoshield import decode_message
+
+
+def _carrier_png():
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), 'RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _wait(client, job):
+    deadline = time.monotonic() + 30
+    while job['status'] not in ('done', 'failed') and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(f"/api/jobs/{job['id']}").get_json()
+    return job
+
+
+@pytest.mark.parametrize('threshold', [None, 0], ids=['inline', 'queued'])
+def test_encode_text_job_runs_to_completion(client, threshold):
+    app = client.application
+    previous = app.config['SYNC_JOB_THRESHOLD']
+    if threshold is not None:
+        app.config['SYNC_JOB_THRESHOLD'] = threshold
+    try:
+        response = client.post('/api/jobs', data={'operation': 'encode-text', 'message': 'job secret',
+                                                  'carrier': (io.BytesIO(_carrier_png()), 'carrier.png')})
+    finally:
+        app.config['SYNC_JOB_THRESHOLD'] = previous
+    assert response.status_code in (200, 202)
+    job = _wait(client, response.get_json())
+    assert job['status'] == 'done', job.get('error')
+
+    result = client.get(f"/api/jobs/{job['id']}/result", follow_redirects=True)
+    assert result.status_code == 200
+    assert decode_message(Image.open(io.BytesIO(result.data))) == 'job secret'
+
+    decoded = client.post('/api/jobs', data={'operation': 'decode-text',
+                                             'encoded': (io.BytesIO(result.data), 'encoded.png')})
+    job = _wait(client, decoded.get_json())
+    assert job['status'] == 'done', job.get('error')
+    assert client.get(f"/api/jobs/{job['id']}/result").get_json() == {'message': 'job secret'}
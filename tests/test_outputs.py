@@ -0,0 +1,46 @@
+"""The content-addressed store for generated outputs."""
+import hashlib
+import io
+import os
+
+import pytest
+
+from stegoshield.outputs import OutputStore
+
+
+def test_identical_outputs_share_one_file(tmp_path):
+    store = OutputStore(str(tmp_path / 'outputs'), max_bytes=1 << 20)
+    digest = store.put(io.BytesIO(b'output bytes'))
+    assert store.put(io.BytesIO(b'output bytes')) == digest == hashlib.sha256(b'output bytes').hexdigest()
+    assert os.listdir(store.directory) == [f'{digest}.png']
+
+
+def test_temporary_output_is_moved_into_the_store(tmp_path):
+    store = OutputStore(str(tmp_path / 'outputs'), max_bytes=1 << 20)
+    with store.temp_path() as path:
+        with open(path, 'wb') as f:
+            f.write(b'output bytes')
+        digest = store.put_file(path)
+    with open(store.path(digest), 'rb') as f:
+        assert f.read() == b'output bytes'
+    assert os.listdir(store.directory) == [f'{digest}.png']
+
+
+def test_failed_output_leaves_no_file(tmp_path):
+    store = OutputStore(str(tmp_path / 'outputs'), max_bytes=1 << 20)
+    with pytest.raises(ValueError):
+        with store.temp_path() as path:
+            with open(path, 'wb') as f:
+                f.write(b'partial')
+            raise ValueError("encode failed")
+    assert os.listdir(store.directory) == []
+
+
+def test_least_recently_used_outputs_are_evicted(tmp_path):
+    store = OutputStore(str(tmp_path / 'outputs'), max_bytes=250)
+    old = store.put(io.BytesIO(b'a' * 100))
+    used = store.put(io.BytesIO(b'b' * 100))
+    os.utime(store.path(old), (0, 0))
+    assert store.path(used) is not None
+    store.put(io.BytesIO(b'c' * 100))
+    assert store.path(old) is None and store.path(used) is not None
@@ -0,0 +1,53 @@
+"""Screening images for LSB steganography with chi-square, RS and sample pair analysis."""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stegoshield import analyze, encode_message
+
+# A photograph, which has the LSB structure of a real clean image
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'StegoShield_Desktop', 'sample.webp')
+
+
+@pytest.fixture(scope='module')
+def photo():
+    return Image.open(SAMPLE).convert('RGB')
+
+
+def _random_text(num_chars, seed=1):
+    return np.random.default_rng(seed).bytes(num_chars).hex()[:num_chars]
+
+
+def test_clean_photo_is_not_flagged(photo):
+    result = analyze(photo)
+    assert not result['suspicious']
+    assert result['rate'] < 0.1
+    assert set(result['channels']) == {'R', 'G', 'B'}
+
+
+def test_randomised_low_bits_are_flagged(photo):
+    pixels = np.asarray(photo)
+    pixels = pixels & 0xFE | np.random.default_rng(0).integers(0, 2, pixels.shape, dtype=np.uint8)
+    result = analyze(Image.fromarray(pixels))
+    assert result['suspicious'] and result['rate'] > 0.9
+
+
+@pytest.mark.parametrize('key', [None, 'pw'], ids=['sequential', 'keyed'])
+def test_fully_embedded_photo_is_flagged(photo, key):
+    # Random text stored uncompressed fills most of the carrier's capacity
+    capacity = photo.width * photo.height * 3 // 8
+    result = analyze(encode_message(photo, _random_text(capacity * 2 // 3), compression=None, key=key))
+    assert result['suspicious'] and result['rate'] > 0.5
+
+
+def test_sampled_analysis_agrees_on_a_clean_photo(photo):
+    result = analyze(photo, sample=0.5)
+    assert result['sampled'] == 0.5 and not result['suspicious']
+
+
+@pytest.mark.parametrize('sample', [0, 1.5])
+def test_sample_outside_zero_to_one_is_rejected(photo, sample):
+    with pytest.raises(ValueError, match="Sample"):
+        analyze(photo, sample=sample)
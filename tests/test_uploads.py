@@ -0,0 +1,114 @@
+"""Resumable chunked uploads, through the store and through the full-stack backend's API."""
+import hashlib
+import io
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from stegoshield import decode_message
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'StegoShield_fullStack', 'backend'))
+from uploads import UploadLimitError, UploadStore  # noqa: E402
+
+
+def _carrier_png():
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), 'RGB').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _start(client, data):
+    response = client.post('/api/uploads', data={'filename': 'carrier.png', 'size': len(data)})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def _put(client, upload_id, data, offset):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', data=data[offset:offset + 4096])
+
+
+def test_interrupted_upload_resumes_from_what_is_missing(client):
+    data = _carrier_png()
+    upload = _start(client, data)
+    # The first chunk arrives; then the transfer skips to the last one
+    _put(client, upload['id'], data, 0)
+    status = _put(client, upload['id'], data, len(data) // 4096 * 4096).get_json()
+    assert status['missing'][0][0] == 4096
+
+    for start, end in status['missing']:
+        for offset in range(start, end, 4096):
+            assert _put(client, upload['id'], data, offset).status_code == 200
+    finalized = client.post(f"/api/uploads/{upload['id']}/finalize",
+                            data={'sha256': hashlib.sha256(data).hexdigest()})
+    assert finalized.status_code == 200 and finalized.get_json()['finalized']
+
+    encoded = client.post('/api/encode-text', data={'message': 'uploaded secret', 'carrier_upload': upload['id']},
+                          follow_redirects=True)
+    assert decode_message(Image.open(io.BytesIO(encoded.data))) == 'uploaded secret'
+
+
+def test_finalizing_early_is_a_conflict(client):
+    data = _carrier_png()
+    upload = _start(client, data)
+    _put(client, upload['id'], data, 0)
+    response = client.post(f"/api/uploads/{upload['id']}/finalize")
+    assert response.status_code == 409
+    assert not response.get_json()['finalized']
+
+
+def test_digest_mismatch_is_a_conflict(client):
+    data = _carrier_png()
+    upload = _start(client, data)
+    for offset in range(0, len(data), 4096):
+        _put(client, upload['id'], data, offset)
+    response = client.post(f"/api/uploads/{upload['id']}/finalize", data={'sha256': '0' * 64})
+    assert response.status_code == 409 and 'SHA-256' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('request_for', [
+    lambda client: client.get('/api/uploads/missing'),
+    lambda client: client.put('/api/uploads/missing?offset=0', data=b'x'),
+    lambda client: client.post('/api/uploads/missing/finalize'),
+    lambda client: client.delete('/api/uploads/missing'),
+    lambda client: client.post('/api/decode-text', data={'encoded_upload': 'missing'}),
+], ids=['status', 'chunk', 'finalize', 'delete', 'use'])
+def test_unknown_upload_is_not_found(client, request_for):
+    assert request_for(client).status_code == 404
+
+
+def test_pending_uploads_are_limited(client):
+    store = sys.modules['app'].upload_store
+    previous = store.max_pending
+    store.max_pending = sum(not upload.finalized for upload in store._uploads.values()) + 1
+    try:
+        _start(client, b'x' * 10)
+        response = client.post('/api/uploads', data={'filename': 'carrier.png', 'size': 10})
+        assert response.status_code == 429
+    finally:
+        store.max_pending = previous
+
+
+def test_store_limits_pending_bytes_but_not_finalized_ones(tmp_path):
+    store = UploadStore(str(tmp_path), max_size=100, chunk_size=10, max_pending_bytes=150)
+    first = store.create(100, 'a.png')
+    with pytest.raises(UploadLimitError):
+        store.create(60, 'b.png')
+    first.write(0, io.BytesIO(b'x' * 100), 100)
+    first.finalize()
+    assert store.create(100, 'b.png').size == 100
+    with pytest.raises(ValueError):
+        store.create(101, 'c.png')
+
+
+def test_store_expires_idle_pending_uploads_first(tmp_path):
+    store = UploadStore(str(tmp_path), max_size=100, chunk_size=10, ttl=100, pending_ttl=10)
+    pending, finished = store.create(10, 'a.png'), store.create(0, 'b.png')
+    finished.finalize()
+    for upload in (pending, finished):
+        upload.touched -= 50
+    assert store.get(pending.id) is None and not os.path.exists(pending.path)
+    assert store.get(finished.id) is finished